@@ -1,6 +1,23 @@
-import time, socket, yaml
-from contextlib import closing
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
+import time, socket, threading, yaml, sys, asyncio, argparse, pathlib
+from contextlib import AsyncExitStack, asynccontextmanager, closing
+from types import SimpleNamespace
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import agenda_events
+import session_cache
+import snapshots
+import readiness
+import lowmem
+import memstats
+import netfilter
+import fingerprints
+import retries
+import strategies
+import tracing
+import weeks
+
+# Playwright est importé dans les fonctions qui s’en servent : charger ce module (main.py,
+# démon, bench) ne coûte rien tant qu’aucun export n’est lancé.
+
 
 # =========================
 # Chargement configuration
@@ -25,41 +42,43 @@ def can_tcp_connect(host: str, port: int, timeout=3.0) -> bool:
     except Exception:
         return False
 
-def goto_with_retry(page, url, attempts=3, wait_between=2.0, timeout_ms=30000):
-    last_err = None
-    for i in range(1, attempts+1):
-        print(f"[INFO] Navigation tentative {i}/{attempts} -> {url}")
-        try:
-            page.goto(url, wait_until="load", timeout=timeout_ms)
-            print(f"[INFO] Page chargée: {page.url}")
-            return
-        except Exception as e:
-            last_err = e
-            print(f"[WARN] Échec goto (tentative {i}): {e}")
-            time.sleep(wait_between)
-    raise last_err
-
 def list_frames(page, label="[INFO] Frames"):
     print(label)
     for fr in page.frames:
         print(f"  - name={fr.name!r}  url={fr.url}")
 
-def wait_for_content_loaded(page, name="content", timeout_ms=25000, settle_ms=1500):
-    """Attend que la frame 'content' charge une page ≠ blank, puis laisse settle_ms ms."""
-    t0 = time.time()
-    while (time.time() - t0) * 1000 < timeout_ms:
-        fr = page.frame(name=name)
-        if fr and fr.url and fr.url not in ("about:blank", "/blank.html") and not fr.url.endswith("/blank.html"):
-            page.wait_for_timeout(settle_ms)
-            return fr
-        page.wait_for_timeout(200)
-    list_frames(page, "[ERROR] Frames au moment du timeout")
-    raise RuntimeError(f"La frame '{name}' n'a pas chargé de contenu (timeout).")
+def is_loaded_frame(fr, name):
+    return bool(fr and fr.name == name and fr.url and fr.url not in ("about:blank", "/blank.html")
+                and not fr.url.endswith("/blank.html"))
+
+@tracing.traced("wait_for_content_loaded")
+async def wait_for_content_loaded_async(page, name="content", timeout_ms=25000, ready_opts=None):
+    """
+    Attend (sur événement 'framenavigated') que la frame 'content' charge une page ≠ blank,
+    puis que la frame qui porte la grille (iframe interne de 'content' si présente, cf.
+    agenda_frame) soit stable (cf. readiness) : `grid_selector` y est cherché, pas dans le
+    conteneur.
+    """
+    from playwright.async_api import TimeoutError as PWTimeout
+
+    fr = page.frame(name=name)
+    if not is_loaded_frame(fr, name):
+        try:
+            fr = await page.wait_for_event("framenavigated", predicate=lambda f: is_loaded_frame(f, name),
+                                           timeout=retries.timeout_ms(timeout_ms))
+        except PWTimeout:
+            list_frames(page, "[ERROR] Frames au moment du timeout")
+            raise RuntimeError(f"La frame '{name}' n'a pas chargé de contenu (timeout).")
+    # l’événement load du conteneur attend ses iframes : la frame agenda est alors attachée
+    await fr.wait_for_load_state("load", timeout=retries.timeout_ms(timeout_ms))
+    await readiness.wait_until_stable_async(agenda_frame(fr), label=f"agenda (frame '{name}')", opts=ready_opts)
+    return fr
 
 # ======================================
 # Lancement navigateur (Chrome / proxy)
 # ======================================
-def launch_browser(pw, cfg):
+def browser_launch_options(cfg):
+    """Options de lancement Chromium (canal, proxy, args, headless) dérivées de la conf."""
     channel = "chrome" if cfg.get("use_chrome_channel", False) else None
     proxy_cfg = cfg.get("proxy") or {}
     proxy = None
@@ -74,80 +93,138 @@ def launch_browser(pw, cfg):
         args.append(f'--proxy-pac-url={cfg["proxy_pac_url"]}')
     if cfg.get("proxy_auto_detect"):
         args.append("--proxy-auto-detect")
+    args += lowmem.launch_args(cfg)
 
     headless = bool(cfg.get("headless", True))
-    ignore_https = bool(cfg.get("ignore_https_errors", False))
+    return {"headless": headless, "proxy": proxy, "channel": channel, "args": args}
 
-    print(f"[INFO] Lancement navigateur | channel={channel} proxy={proxy} args={args} headless={headless}")
-    browser = pw.chromium.launch(headless=headless, proxy=proxy, channel=channel, args=args)
-    context = browser.new_context(ignore_https_errors=ignore_https)
-    page = context.new_page()
+async def new_context_async(browser, cfg, storage_state=None, net_filter=None):
+    """
+    Contexte navigateur instrumenté (suivi mutations DOM / XHR pour la détection de stabilité),
+    avec filtrage réseau "navigation" si `net_filter` est fourni.
+    """
+    context = await browser.new_context(ignore_https_errors=bool(cfg.get("ignore_https_errors", False)),
+                                        storage_state=storage_state, **lowmem.context_options(cfg))
+    await context.add_init_script(readiness.INIT_JS)
+    if net_filter:
+        await context.route("**/*", net_filter.handler_async("navigation"))
+        context.on("response", net_filter.on_response)
+    return context
+
+async def open_pass_async(browser, cfg, storage_state=None, net_filter=None, label=""):
+    """Nouveau contexte + premier onglet sur cfg['pass_url'] ; renvoie (context, page)."""
+    context = await new_context_async(browser, cfg, storage_state=storage_state, net_filter=net_filter)
     try:
-        print("[INFO] navigator.onLine =", page.evaluate("navigator.onLine"))
-    except Exception:
-        pass
-    return browser, context, page
+        print(f"[INFO] Ouverture PASS{label}: {cfg['pass_url']}")
+        with retries.stage("pass", cfg):
+            page = await retries.goto_async(await context.new_page(), cfg["pass_url"])
+        try:
+            print("[INFO] navigator.onLine =", await page.evaluate("navigator.onLine"))
+        except Exception:
+            pass
+    except BaseException:
+        await context.close()
+        raise
+    return context, page
+
+@tracing.traced()
+async def launch_browser_async(pw, cfg, storage_state=None, net_filter=None):
+    """
+    Lance Chromium/Chrome et ouvre PASS ; renvoie (browser, context, page, storage_state).
+    Si le lancement OU cette première navigation échoue (Chrome absent, proxy ou TLS refusés
+    par Chromium…), secours WebKit sans session en cache (storage_state renvoyé à None).
+    """
+    opts = browser_launch_options(cfg)
+    print(f"[INFO] Lancement navigateur | channel={opts['channel']} proxy={opts['proxy']} args={opts['args']} headless={opts['headless']}")
+    browser = None
+    try:
+        browser = await pw.chromium.launch(**opts)
+        context, page = await open_pass_async(browser, cfg, storage_state=storage_state, net_filter=net_filter)
+        return browser, context, page, storage_state
+    except Exception as e:
+        print(f"[ERROR] Chromium/Chrome a échoué: {e}")
+        if browser is not None:
+            await browser.close()
 
-def try_webkit_fallback(pw, cfg):
     print("[WARN] Tentative de secours avec WebKit…")
-    headless = bool(cfg.get("headless", True))
-    ignore_https = bool(cfg.get("ignore_https_errors", False))
-    browser = pw.webkit.launch(headless=headless)
-    context = browser.new_context(ignore_https_errors=ignore_https)
-    page = context.new_page()
-    print("[INFO] (WebKit) navigator.onLine =", page.evaluate("navigator.onLine"))
-    return browser, context, page
+    with tracing.span("try_webkit_fallback"):
+        browser = await pw.webkit.launch(headless=opts["headless"])
+        try:
+            context, page = await open_pass_async(browser, cfg, net_filter=net_filter, label=" (WebKit)")
+        except BaseException:
+            await browser.close()
+            raise
+    return browser, context, page, None
 
 # =========================
 # SSO → CAS → Consentement
 # =========================
-def click_sso_button(page):
-    print("[INFO] Attente bouton SSO…")
-    page.wait_for_selector('#remoteAuth .provider', timeout=15000)
+@tracing.traced("click_sso_button")
+async def click_sso_button_async(page, tag="", cfg=None):
+    """
+    Clique le provider SSO. Le provider retenu (index + libellé) est mémorisé par portail :
+    s’il est toujours là au run suivant, il est cliqué sans relire tous les libellés.
+    """
+    print(f"[INFO]{tag} Attente bouton SSO…")
+    await page.wait_for_selector('#remoteAuth .provider', timeout=retries.timeout_ms(15000))
     btns = page.locator('#remoteAuth .provider')
-    count = btns.count()
-    print(f"[DEBUG] Providers trouvés: {count}")
-    clicked = False
+    count = await btns.count()
+    print(f"[DEBUG]{tag} Providers trouvés: {count}")
+
+    cached = strategies.lookup(cfg, "sso_provider")
+    if cached and cached["index"] < count and \
+            (await btns.nth(cached["index"]).inner_text(timeout=retries.timeout_ms(5000))).strip() == cached["text"]:
+        await btns.nth(cached["index"]).click(timeout=retries.timeout_ms(10000))
+        print(f"[INFO]{tag} Clic sur le provider mémorisé: {cached['text']}")
+        await page.wait_for_load_state("load", timeout=retries.timeout_ms(30000))
+        return
+    if cached:
+        tracing.count("strategy.misses")
+
+    chosen = None
     for i in range(count):
-        txt = btns.nth(i).inner_text().strip()
-        print(f"[DEBUG] provider[{i}] = {txt}")
+        txt = (await btns.nth(i).inner_text(timeout=retries.timeout_ms(5000))).strip()
+        print(f"[DEBUG]{tag} provider[{i}] = {txt}")
         if "SSO" in txt.upper():
-            btns.nth(i).click(); clicked = True
-            print("[INFO] Clic sur SSO."); break
-    if not clicked:
-        btns.first.click()
-        print("[WARN] 'SSO' non trouvé explicitement, clic sur le premier provider.")
-    page.wait_for_load_state("load")
-
-def cas_login(page, username, password, consent_choice="remember"):
+            await btns.nth(i).click(timeout=retries.timeout_ms(10000)); chosen = (i, txt)
+            print(f"[INFO]{tag} Clic sur SSO."); break
+    if chosen is None:
+        chosen = (0, (await btns.first.inner_text(timeout=retries.timeout_ms(5000))).strip())
+        await btns.first.click(timeout=retries.timeout_ms(10000))
+        print(f"[WARN]{tag} 'SSO' non trouvé explicitement, clic sur le premier provider.")
+    strategies.remember(cfg, "sso_provider", {"index": chosen[0], "text": chosen[1]})
+    await page.wait_for_load_state("load", timeout=retries.timeout_ms(30000))
+
+CAS_LOGIN_MARKER = "cas.imt-atlantique.fr/cas/login"
+
+@tracing.traced("cas_login")
+async def cas_login_async(page, username, password, consent_choice="remember", tag="",
+                          cas_marker=CAS_LOGIN_MARKER):
     """
     Auth CAS + gestion de la page 'Transmission de données' (Shibboleth) si nécessaire.
     consent_choice: 'remember' | 'once' | 'global'
+    cas_marker: fragment d’URL identifiant la page de login CAS (cfg 'cas_login_url_marker').
     """
-    print("[INFO] Attente page CAS…")
-    page.wait_for_url(lambda u: "cas.imt-atlantique.fr/cas/login" in u, timeout=30000)
-    print(f"[INFO] Sur CAS: {page.url}")
+    print(f"[INFO]{tag} Attente page CAS…")
+    await page.wait_for_url(lambda u: cas_marker in u, timeout=retries.timeout_ms(30000))
+    print(f"[INFO]{tag} Sur CAS: {page.url}")
 
-    page.wait_for_selector("#username", timeout=15000)
-    page.fill("#username", username)
-    page.fill("#password", password)
+    await page.wait_for_selector("#username", timeout=retries.timeout_ms(15000))
+    await page.fill("#username", username, timeout=retries.timeout_ms(10000))
+    await page.fill("#password", password, timeout=retries.timeout_ms(10000))
 
-    if page.locator('button:has-text("Se connecter")').count():
-        page.click('button:has-text("Se connecter")')
+    if await page.locator('button:has-text("Se connecter")').count():
+        await page.click('button:has-text("Se connecter")', timeout=retries.timeout_ms(10000))
     else:
-        page.click('input[type="submit"]')
-
-    page.wait_for_load_state("networkidle")
-    print(f"[INFO] Après soumission CAS, URL: {page.url}")
+        await page.click('input[type="submit"]', timeout=retries.timeout_ms(10000))
+    await page.wait_for_load_state("networkidle", timeout=retries.timeout_ms(30000))
+    print(f"[INFO]{tag} Après soumission CAS, URL: {page.url}")
 
     # Consentement Shibboleth (Transmission de données)
-    def is_consent_page():
-        url = (page.url or "").lower()
-        title = (page.title() or "").strip().lower()
-        return ("/idp/profile/saml2/post/sso" in url) or ("transmission de données" in title) or ("transmission de donnees" in title)
-
-    if is_consent_page():
-        print(f"[INFO] Page de consentement détectée: {page.url}")
+    url = (page.url or "").lower()
+    title = ((await page.title()) or "").strip().lower()
+    if ("/idp/profile/saml2/post/sso" in url) or ("transmission de données" in title) or ("transmission de donnees" in title):
+        print(f"[INFO]{tag} Page de consentement détectée: {page.url}")
         mapping = {
             "once":    '#_shib_idp_doNotRememberConsent',
             "remember":'#_shib_idp_rememberConsent',
@@ -155,258 +232,788 @@ def cas_login(page, username, password, consent_choice="remember"):
         }
         selector = mapping.get(consent_choice, '#_shib_idp_rememberConsent')
         try:
-            if page.locator(selector).count():
-                page.check(selector)
-                print(f"[INFO] Option consentement cochée: {consent_choice}")
+            if await page.locator(selector).count():
+                await page.check(selector)
+                print(f"[INFO]{tag} Option consentement cochée: {consent_choice}")
         except Exception as e:
-            print(f"[WARN] Impossible de cocher l’option {consent_choice}: {e}")
-
-        page.wait_for_selector('input[name="_eventId_proceed"]', timeout=10000)
-        page.click('input[name="_eventId_proceed"]')
-        page.wait_for_load_state("networkidle")
-        print(f"[INFO] Consentement validé, URL: {page.url}")
+            print(f"[WARN]{tag} Impossible de cocher l’option {consent_choice}: {e}")
+        await page.wait_for_selector('input[name="_eventId_proceed"]', timeout=retries.timeout_ms(10000))
+        await page.click('input[name="_eventId_proceed"]', timeout=retries.timeout_ms(10000))
+        await page.wait_for_load_state("networkidle", timeout=retries.timeout_ms(30000))
+        print(f"[INFO]{tag} Consentement validé, URL: {page.url}")
+
+@tracing.traced("is_frameset_ready")
+async def is_frameset_ready_async(page, timeout_ms=6000) -> bool:
+    """Session valide ? → le frameset PASS ('opentop') s’affiche sans passer par le bouton SSO."""
+    t0 = time.time()
+    while (time.time() - t0) * 1000 < timeout_ms:
+        if page.frame(name="opentop"):
+            return True
+        try:
+            if await page.locator('#remoteAuth .provider').count():
+                return False
+        except Exception:
+            pass
+        await page.wait_for_timeout(200)
+    return False
 
 # =========================
 # Clic “Agenda” (opentop)
 # =========================
-def click_agenda_in_opentop(page, agenda_sel='text=Agenda', timeout_ms=8000) -> bool:
+# 1) par rôle (si c'est un lien)
+async def _agenda_role_link(top, agenda_sel, timeout_ms):
+    link = top.get_by_role("link", name="Agenda")
+    if await link.count():
+        await link.first.scroll_into_view_if_needed()
+        await link.first.click(timeout=timeout_ms)
+        return True
+    return False
+
+# 2) par texte → ancêtre <a>
+async def _agenda_ancestor_a(top, agenda_sel, timeout_ms):
+    span = top.locator(agenda_sel).first
+    if await span.count() and await span.evaluate("el => !!el.closest('a')"):
+        await span.evaluate("el => el.closest('a').click()")
+        return True
+    return False
+
+# 3) clic JS direct même si non “visible”
+async def _agenda_js_click(top, agenda_sel, timeout_ms):
+    el = top.locator(agenda_sel).first
+    if await el.count():
+        await el.evaluate("el => el.click()")
+        return True
+    return False
+
+# nom -> (fonction, libellé) ; l’ordre est celui de la chaîne complète
+AGENDA_STRATEGIES = {
+    "role_link": (_agenda_role_link, "via role=link"),
+    "ancestor_a": (_agenda_ancestor_a, "via ancêtre <a>"),
+    "js_click": (_agenda_js_click, "via evaluate(click)"),
+}
+
+@tracing.traced("click_agenda_in_opentop")
+async def click_agenda_in_opentop_async(page, agenda_sel='text=Agenda', timeout_ms=8000, tag="", cfg=None) -> bool:
+    """Essaie la stratégie mémorisée pour ce portail, puis le reste de la chaîne ; mémorise la gagnante."""
     top = page.frame(name="opentop")
     if not top:
-        print("[WARN] Frame 'opentop' introuvable.")
+        print(f"[WARN]{tag} Frame 'opentop' introuvable.")
         return False
 
-    # 1) par rôle (si c'est un lien)
-    try:
-        link = top.get_by_role("link", name="Agenda")
-        if link.count():
-            link.first.scroll_into_view_if_needed()
-            link.first.click(timeout=timeout_ms)
-            print("[INFO] Agenda cliqué via role=link (opentop).")
-            return True
-    except Exception as e:
-        print(f"[DEBUG] get_by_role('Agenda') KO: {e}")
-
-    # 2) par texte → ancêtre <a>
-    try:
-        span = top.locator(agenda_sel).first
-        if span.count():
-            if span.evaluate("el => !!el.closest('a')"):
-                top.evaluate("el => el.closest('a').click()", span.element_handle())
-                print("[INFO] Agenda cliqué via ancêtre <a> (opentop).")
+    for name in strategies.first(cfg, "agenda", list(AGENDA_STRATEGIES)):
+        fn, label = AGENDA_STRATEGIES[name]
+        try:
+            if await fn(top, agenda_sel, timeout_ms):
+                print(f"[INFO]{tag} Agenda cliqué {label} (opentop).")
+                strategies.remember(cfg, "agenda", name)
                 return True
-    except Exception as e:
-        print(f"[DEBUG] Ancêtre <a> KO: {e}")
-
-    # 3) clic JS direct même si non “visible”
-    try:
-        el = top.locator(agenda_sel).first
-        if el.count():
-            top.evaluate("el => el.click()", el.element_handle())
-            print("[INFO] Agenda cliqué via evaluate(click) (opentop).")
-            return True
-    except Exception as e:
-        print(f"[DEBUG] evaluate(click) KO: {e}")
+        except Exception as e:
+            print(f"[DEBUG]{tag} Agenda {label} KO: {e}")
+        tracing.count("strategy.misses")
 
-    print("[WARN] Impossible de cliquer 'Agenda' dans 'opentop'.")
+    print(f"[WARN]{tag} Impossible de cliquer 'Agenda' dans 'opentop'.")
     return False
 
-# =========================
-# Export PDF style “Cmd+P → PDF”
-# =========================
-def export_pdf_like_dialog(page, pdf_path: str):
+@tracing.traced()
+async def open_agenda_async(context, cfg, tag="", resumable=False, page=None):
     """
-    A4, paysage, arrière-plans ON, échelle 100 %, en-têtes/pieds (date, titre, URL, pagination)
+    Login SSO/CAS + navigation Agenda dans le contexte `context` ; renvoie (page, frame 'content'),
+    la page restant ouverte (à fermer par l’appelant).
+    resumable=True : le contexte porte une session en cache, on tente de s’en passer du login.
+    page : onglet déjà ouvert sur cfg['pass_url'] (cf. launch_browser_async), sinon un onglet est ouvert.
     """
-    page.emulate_media(media="print")
+    with retries.stage("pass", cfg):
+        if page is None:
+            page = await retries.goto_async(await context.new_page(), cfg["pass_url"], tag=tag)
+        resumed = resumable and await is_frameset_ready_async(
+            page, timeout_ms=retries.timeout_ms(cfg.get("session_check_ms", 6000)))
+        if resumed:
+            print(f"[INFO]{tag} Session en cache valide : login SSO/CAS ignoré.")
+        elif resumable:
+            print(f"[INFO]{tag} Session en cache refusée → login complet.")
+            session_cache.clear_session(cfg)
+            await context.clear_cookies()
+            page = await retries.goto_async(page, cfg["pass_url"], tag=tag)
+
+    with retries.stage("login", cfg):
+        if not resumed:
+            await click_sso_button_async(page, tag=tag, cfg=cfg)
+            await cas_login_async(page, cfg["username"], cfg["password"],
+                                  consent_choice=cfg.get("consent_choice", "remember"), tag=tag,
+                                  cas_marker=cfg.get("cas_login_url_marker", CAS_LOGIN_MARKER))
+        # Retour PASS (frameset)
+        await page.wait_for_load_state("networkidle", timeout=retries.timeout_ms(30000))
+        print(f"[INFO]{tag} Retour PASS: {page.url}")
+        if not resumed and page.frame(name="opentop"):
+            session_cache.save_session(cfg, await context.storage_state())
+
+    with retries.stage("agenda", cfg):
+        agenda_sel = cfg.get("agenda_link_selector", 'text=Agenda')
+        if not await click_agenda_in_opentop_async(page, agenda_sel=agenda_sel, timeout_ms=8000, tag=tag, cfg=cfg):
+            print(f"[WARN]{tag} Agenda pas cliqué (peut-être déjà affiché).")
+        # Attendre que 'content' charge l’URL réelle
+        ready_opts = readiness.settings(cfg)
+        content_frame = await wait_for_content_loaded_async(page, name="content", timeout_ms=25000,
+                                                            ready_opts=ready_opts)
+    print(f"[INFO]{tag} URL agenda détectée: {content_frame.url}")
+    return page, content_frame
 
-    header_tpl = """
+# =========================
+# Export PDF style “Cmd+P → PDF”
+# =========================
+HEADER_TPL = """
     <div style="width:100%; font-size:9px; color:#444; padding:4px 8px; border-bottom:1px solid #ddd;">
       <span class="date"></span><span style="margin:0 8px;">|</span><span class="title"></span>
     </div>"""
-    footer_tpl = """
+FOOTER_TPL = """
     <div style="width:100%; font-size:9px; color:#444; padding:4px 8px; border-top:1px solid #ddd; display:flex; justify-content:space-between;">
       <span class="url" style="max-width:70%; overflow:hidden; text-overflow:ellipsis; white-space:nowrap;"></span>
       <span>Page <span class="pageNumber"></span>/<span class="totalPages"></span></span>
     </div>"""
 
-    # verrouille la taille si le site n’a pas de @page
-    page.add_style_tag(content="@page { size: A4 landscape; margin: 10mm; }")
-    page.wait_for_load_state("networkidle")
-
-    page.pdf(
-        path=pdf_path,
-        format="A4",
-        landscape=True,
-        print_background=True,
-        scale=1,
-        display_header_footer=True,
-        header_template=header_tpl,
-        footer_template=footer_tpl,
-        margin={"top": "14mm", "bottom": "14mm", "left": "10mm", "right": "10mm"},
-    )
-
-# =========================
-# Orchestration principale
-# =========================
-def export_agenda_pdf(cfg):
-    pass_url   = cfg["pass_url"]
-    username   = cfg["username"]
-    password   = cfg["password"]
-    pdf_out    = cfg.get("pdf_out", "agenda.pdf")
-    agenda_sel = cfg.get("agenda_link_selector", 'text=Agenda')
-    consent    = cfg.get("consent_choice", "remember")
-
-    # Sanity check réseau côté OS
-    print("[INFO] Auto-check réseau…")
-    hosts = ["pass.imt-atlantique.fr", "cas.imt-atlantique.fr"]
-    for h in hosts:
-        print(f"  - Résolution DNS {h}: {'OK' if can_resolve(h) else 'KO'}")
-    print(f"  - TCP {hosts[0]}:443 -> {'OK' if can_tcp_connect(hosts[0], 443) else 'KO'}")
-    print(f"  - TCP {hosts[1]}:443 -> {'OK' if can_tcp_connect(hosts[1], 443) else 'KO'}")
-
-    with sync_playwright() as pw:
-        # Lancement (Chrome canal recommandé)
-        try:
-            browser, context, page = launch_browser(pw, cfg)
-            print(f"[INFO] Ouverture PASS: {pass_url}")
-            goto_with_retry(page, pass_url, attempts=3, wait_between=2.5, timeout_ms=35000)
-        except Exception as e:
-            print(f"[ERROR] Chromium/Chrome a échoué: {e}")
-            # Secours WebKit
-            browser, context, page = try_webkit_fallback(pw, cfg)
-            print(f"[INFO] Ouverture PASS (WebKit): {pass_url}")
-            goto_with_retry(page, pass_url, attempts=2, wait_between=2.0, timeout_ms=35000)
+# A4, paysage, arrière-plans ON, échelle 100 %, en-têtes/pieds (date, titre, URL, pagination)
+PDF_OPTIONS = {
+    "format": "A4",
+    "landscape": True,
+    "print_background": True,
+    "scale": 1,
+    "display_header_footer": True,
+    "header_template": HEADER_TPL,
+    "footer_template": FOOTER_TPL,
+    "margin": {"top": "14mm", "bottom": "14mm", "left": "10mm", "right": "10mm"},
+}
+
+# Rendu "comme à l’écran" (évite @media print qui masque parfois le grid)
+SCREEN_PRINT_CSS = """
+        @page { size: A4 landscape; margin: 10mm; }
+        * { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
+        html, body { background: white !important; }
+    """
 
-        # SSO → CAS
-        click_sso_button(page)
-        cas_login(page, username, password, consent_choice=consent)
+# DOM normalisé de l’agenda : sans scripts/styles ni champs cachés ASP.NET (__VIEWSTATE…),
+# attributs réduits à ceux qui portent le rendu, espaces compactés.
+NORMALIZED_DOM_JS = """
+() => {
+  const keep = new Set(['class', 'colspan', 'rowspan', 'title', 'style']);
+  const root = document.documentElement.cloneNode(true);
+  root.querySelectorAll('script, style, noscript, link, meta, input[type=hidden]').forEach(n => n.remove());
+  root.querySelectorAll('*').forEach(el => {
+    for (const a of Array.from(el.attributes)) if (!keep.has(a.name)) el.removeAttribute(a.name);
+  });
+  return root.outerHTML.replace(/\\s+/g, ' ');
+}
+"""
+
+def agenda_frame(content_frame):
+    """Frame qui porte la grille : iframe interne de 'content' si présente, sinon 'content'."""
+    for fr in content_frame.child_frames:
+        url = (fr.url or "").lower()
+        if url and url not in ("about:blank", "/blank.html") and not url.endswith("/blank.html"):
+            return fr
+    return content_frame
 
-        # Retour PASS (frameset)
-        page.wait_for_load_state("networkidle")
-        print(f"[INFO] Retour PASS: {page.url}")
-        list_frames(page)
+async def agenda_fingerprint_async(content_frame, ready_opts=None):
+    """
+    Empreinte SHA-256 du DOM normalisé de la frame agenda (iframe interne de 'content' si
+    présente), une fois cette frame stable ; None si elle ne l’est pas à la borne max_ms :
+    l’empreinte d’une grille à moitié chargée ne doit être ni comparée ni enregistrée.
+    """
+    frame = agenda_frame(content_frame)
+    try:
+        await readiness.wait_until_stable_async(frame, label="agenda (empreinte)", opts=ready_opts, strict=True)
+    except readiness.NotStable as e:
+        print(f"[WARN] Empreinte agenda non fiable ({e}).")
+        return None
+    return fingerprints.sha256_text(await frame.evaluate(NORMALIZED_DOM_JS))
+
+def pick_inner_frame(p):
+    """Iframe interne "réelle" : 1re frame non vide différente de l’URL parent (ou None)."""
+    parent_url = (p.url or "").lower()
+    candidates = []
+    for fr in p.frames:
+        url = (fr.url or "").lower()
+        if not url:
+            continue
+        if url in ("about:blank", "/blank.html") or url.endswith("/blank.html"):
+            continue
+        if url == parent_url:
+            continue
+        candidates.append(fr)
+    return candidates[0] if candidates else None
+
+def resolve_export_mode(cfg, browser):
+    """
+    export_mode: 'auto' (défaut) | 'context' | 'separate'.
+    page.pdf() n’est disponible qu’en Chromium headless : en mode headed ou après le secours
+    WebKit, 'auto' (et 'context') basculent sur un Chromium headless séparé.
+    En mode basse mémoire, 'separate' n’est retenu que si l’impression en contexte est impossible.
+    """
+    wanted = cfg.get("export_mode", "auto")
+    printable = browser.browser_type.name == "chromium" and bool(cfg.get("headless", True))
+    if wanted == "separate" and printable and lowmem.enabled(cfg):
+        print("[INFO] Mode basse mémoire : impression dans le contexte courant (un seul Chromium).")
+        wanted = "context"
+    if wanted == "separate" or not printable:
+        if wanted == "context":
+            print("[WARN] export_mode=context impossible (navigateur headed ou non-Chromium) → Chromium séparé.")
+        return "separate"
+    return "context"
+
+async def agenda_target_url_async(context, content_url):
+    """URL de l’iframe agenda interne de la page 'content' (ou la page elle-même)."""
+    page_c = await retries.goto_async(await context.new_page(), content_url)
+    await page_c.wait_for_load_state("networkidle", timeout=retries.timeout_ms(30000))
+    inner = pick_inner_frame(page_c)
+    target_url = inner.url if inner else page_c.url
+    await page_c.close()
+    return target_url
+
+@tracing.traced("print_agenda_in_context")
+async def print_agenda_in_context_async(context, content_url, pdf_path, ready_opts=None, net_filter=None,
+                                        target_url=None, monday=None, week_nav=None, tag="", snapshot_opts=None):
+    """
+    Imprime l’agenda depuis un nouvel onglet du contexte `context` (déjà authentifié) : l’iframe
+    interne qui porte l’agenda est ouverte seule, rendue « comme à l’écran », puis exportée en
+    PDF dès qu’elle est stable. Renvoie les octets du PDF (écrit aussi dans pdf_path si fourni).
+    L’onglet imprimé utilise le profil de filtrage "print" (prioritaire sur celui du contexte).
+    target_url : URL de cette iframe si déjà connue (sinon cherchée dans un onglet de plus).
+    monday : imprime la semaine de ce lundi plutôt que celle affichée par défaut (cf. week_navigation).
+    snapshot_opts : réglages snapshots.settings(cfg) ; instantané de l’agenda écrit avant page.pdf().
+    """
+    target_url = target_url or await agenda_target_url_async(context, content_url)
+    week_nav = week_nav or week_nav_settings({})
+    steps = 0
+    if monday is not None:
+        if week_nav.get("param"):
+            target_url = week_agenda_url(target_url, monday, week_nav)
+        else:
+            steps = (monday - current_monday()).days // 7
+
+    page_p = await context.new_page()
+    try:
+        if net_filter:
+            await page_p.route("**/*", net_filter.handler_async("print"))
+        await retries.goto_async(page_p, target_url, tag=tag, hedge=False)
+        if steps:
+            # navigation par clics depuis la semaine affichée (agenda sans paramètre d’URL)
+            selector = week_nav["next_selector"] if steps > 0 else week_nav["prev_selector"]
+            for _ in range(abs(steps)):
+                await readiness.wait_until_stable_async(page_p, label=f"agenda{tag} (navigation)", opts=ready_opts)
+                await page_p.click(selector, timeout=retries.timeout_ms(10000))
+            print(f"[INFO]{tag} Agenda déplacé de {steps:+d} semaine(s).")
+        await page_p.emulate_media(media="screen")
+        await page_p.add_style_tag(content=SCREEN_PRINT_CSS)
+        await readiness.wait_until_stable_async(page_p, label=f"agenda{tag} (impression)", opts=ready_opts)
+        if monday is not None:
+            await check_week_shown_async(page_p, monday, week_nav, tag=tag)
+        await snapshots.capture_async(page_p, snapshot_opts, pdf_path, monday=monday, tag=tag)
+        with tracing.span("page.pdf"):
+            pdf_bytes = await page_p.pdf(path=pdf_path, **PDF_OPTIONS)
+    finally:
+        await page_p.close()  # libère le renderer au plus tôt, même en cas d’échec
+    tracing.add_bytes("agenda_pdf", len(pdf_bytes))
+    return pdf_bytes
+
+async def export_pdf_via_headless_chromium_async(pw, content_url, pdf_path, storage_state,
+                                                 ignore_https_errors, ready_opts=None, net_filter=None,
+                                                 cfg=None):
+    """
+    Ouvre un Chromium headless séparé, y reprend la session (storage_state) et imprime l’agenda
+    (cf. print_agenda_in_context_async). cfg : réglages low_memory et snapshot éventuels.
+    """
+    browser_h = await pw.chromium.launch(headless=True, args=lowmem.launch_args(cfg))
+    try:
+        ctx_h = await new_context_async(browser_h, {**(cfg or {}), "ignore_https_errors": ignore_https_errors},
+                                        storage_state=storage_state, net_filter=net_filter)
+        return await print_agenda_in_context_async(ctx_h, content_url, pdf_path, ready_opts=ready_opts,
+                                                   net_filter=net_filter, snapshot_opts=snapshots.settings(cfg))
+    finally:
+        await browser_h.close()
+
+# ==================================================
+# Mode batch (cohorte) : 1 Chromium, N contextes isolés
+# ==================================================
+@tracing.traced()
+async def export_in_context_async(context, cfg, tag="", resumable=False, net_filter=None):
+    """Login SSO/CAS + navigation Agenda + impression, le tout dans un contexte isolé."""
+    page, content_frame = await open_agenda_async(context, cfg, tag=tag, resumable=resumable)
+    content_url = content_frame.url
+    await page.close()
+    pdf_out = cfg.get("pdf_out", "agenda.pdf")
+    with retries.stage("print", cfg):
+        await print_agenda_in_context_async(context, content_url, pdf_out, ready_opts=readiness.settings(cfg),
+                                            net_filter=net_filter, tag=tag, snapshot_opts=snapshots.settings(cfg))
+    print(f"[INFO]{tag} PDF sauvegardé: {pdf_out}")
+    return pdf_out
 
-        # Clic “Agenda” dans 'opentop'
-        clicked = click_agenda_in_opentop(page, agenda_sel=agenda_sel, timeout_ms=8000)
-        if not clicked:
-            print("[WARN] Agenda pas cliqué (peut-être déjà affiché).")
+async def export_agenda_pdf_batch_async(cfg, profiles, concurrency=2):
+    """
+    Exporte l’agenda de plusieurs profils (identifiants + annotation optionnelle) dans un seul
+    Chromium : un contexte isolé par profil, au plus `concurrency` exports simultanés.
+    """
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+    from playwright.async_api import async_playwright
+    async with lowmem.watchdog(cfg), async_playwright() as pw:
+        opts = browser_launch_options(cfg)
+        print(f"[INFO] Batch: {len(profiles)} profil(s), concurrence={concurrency}, headless={opts['headless']}")
+        browser = await pw.chromium.launch(**opts)
+
+        async def run_one(idx, profile):
+            pcfg = {**cfg, **{k: v for k, v in profile.items() if k != "annot"}}
+            # le pdf_out de conf.yaml est commun à tous : un fichier distinct par profil
+            pcfg["pdf_out"] = profile.get("pdf_out") or f"agenda_{idx}.pdf"
+            tag = f"[{pcfg.get('username') or idx}]"
+            async with sem:
+                t0 = time.time()
+                state = session_cache.load_session(pcfg)
+                net = netfilter.from_cfg(pcfg)
+                context = await new_context_async(browser, pcfg, storage_state=state, net_filter=net)
+                try:
+                    pdf = await export_in_context_async(context, pcfg, tag=tag, resumable=bool(state), net_filter=net)
+                    if net:
+                        net.report(tag)
+                    out = None
+                    if profile.get("annot"):
+                        import refactor_pdf
+                        out = await asyncio.to_thread(refactor_pdf.annotate_from_cfg, profile["annot"], pdf)
+                    return {"profile": idx, "ok": True, "pdf": pdf, "output": out,
+                            "seconds": round(time.time() - t0, 2)}
+                except Exception as e:
+                    print(f"[ERROR]{tag} Export échoué: {e}")
+                    return {"profile": idx, "ok": False, "error": str(e),
+                            "seconds": round(time.time() - t0, 2)}
+                finally:
+                    await context.close()
+
+        results = await asyncio.gather(*(run_one(i, p) for i, p in enumerate(profiles)))
+        await browser.close()
+    return list(results)
+
+def export_agenda_pdf_batch(cfg, profiles, concurrency=2):
+    """Point d’entrée synchrone du mode batch."""
+    return asyncio.run(export_agenda_pdf_batch_async(cfg, profiles, concurrency=concurrency))
+
+# ==================================================
+# Orchestration : pré-vol réseau et préchargements en parallèle
+# ==================================================
+def _probe(fn, *args):
+    """
+    Future de fn(*args) exécutée dans un thread démon : un DNS ou un TCP suspendu n’est attendu
+    ni par l’annulation du pré-vol, ni par asyncio.run (qui attendrait son exécuteur par défaut),
+    ni à la sortie du processus.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
 
-        # Attendre que 'content' charge l’URL réelle
-        content_frame = wait_for_content_loaded(page, name="content", timeout_ms=25000, settle_ms=1500)
-        content_url = content_frame.url
-        print(f"[INFO] URL agenda détectée: {content_url}")
-
-        # Onglet dédié pour export
-        # (NOUVEAU) Export via un Chromium headless séparé (avec les mêmes cookies)
-        state = get_storage_state(context)
-        export_pdf_via_headless_chromium(
-            pw,
-            content_url=content_url,
-            pdf_path=pdf_out,
-            storage_state=state,
-            ignore_https_errors=bool(cfg.get("ignore_https_errors", False)),
-            settle_seconds=5,  # ou 6-8s si besoin
-        )
-        print(f"[INFO] PDF sauvegardé: {pdf_out}")
-        context.close()
-        browser.close()
+    def resolve(result):
+        if not fut.done():
+            fut.set_result(result)
 
-    return pdf_out
-def export_pdf_via_headless_chromium(
-    pw,
-    content_url: str,
-    pdf_path: str,
-    storage_state: dict,
-    ignore_https_errors: bool,
-    settle_seconds: int = 5
-):
-    """
-    Ouvre Chromium headless, réutilise la session, trouve l'iframe interne qui contient l'agenda,
-    bascule dessus et exporte un PDF fidèle (couleurs + paysage). Ajoute un délai de stabilisation.
-    """
-    browser_h = pw.chromium.launch(headless=True)
-    ctx_h = browser_h.new_context(ignore_https_errors=ignore_https_errors, storage_state=storage_state)
-    page_h = ctx_h.new_page()
-
-    # 1) Charger la page 'content' (peut encore contenir un iframe agenda)
-    page_h.goto(content_url, wait_until="load", timeout=45000)
-    page_h.wait_for_load_state("networkidle")
-
-    # 2) Chercher une iframe interne "réelle"
-    def pick_inner_frame(p):
-        # écarte about:blank/blank.html, garde la 1re frame non vide différente de l’URL parent
-        parent_url = (p.url or "").lower()
-        candidates = []
-        for fr in p.frames:
-            url = (fr.url or "").lower()
-            if not url:
-                continue
-            if url in ("about:blank", "/blank.html") or url.endswith("/blank.html"):
-                continue
-            if url == parent_url:
-                continue
-            candidates.append(fr)
-        return candidates[0] if candidates else None
-
-    inner = pick_inner_frame(page_h)
-    if inner:
-        target_url = inner.url
-    else:
-        # Pas d’iframe détectée : on tente quand même la page courante
-        target_url = page_h.url
+    def run():
+        try:
+            result = fn(*args)
+        except Exception:
+            result = False
+        try:
+            loop.call_soon_threadsafe(resolve, result)
+        except RuntimeError:
+            pass  # boucle déjà fermée : le pré-vol a été abandonné
+    threading.Thread(target=run, name="preflight", daemon=True).start()
+    return fut
 
-    # 3) Ouvrir directement l’URL "agenda" (hors conteneur) dans un onglet headless propre
-    page_h2 = ctx_h.new_page()
-    page_h2.goto(target_url, wait_until="load", timeout=45000)
-    page_h2.wait_for_load_state("networkidle")
+async def preflight_checks_async(cfg):
+    """
+    Sanity check réseau côté OS (DNS + TCP 443) des hôtes PASS/CAS, purement informatif : tous
+    les tests en parallèle, bornés par le plus lent (TCP : cfg 'preflight_timeout_s', 3 s).
+    """
+    hosts = cfg.get("preflight_hosts", ["pass.imt-atlantique.fr", "cas.imt-atlantique.fr"])
+    timeout = float(cfg.get("preflight_timeout_s", 3.0))
+    with tracing.span("preflight", hosts=len(hosts)):
+        dns = asyncio.gather(*(_probe(can_resolve, h) for h in hosts))
+        tcp = asyncio.gather(*(_probe(can_tcp_connect, h, 443, timeout) for h in hosts))
+        dns, tcp = await asyncio.gather(dns, tcp)
+    print("[INFO] Auto-check réseau : " + ", ".join(
+        f"{h} DNS {'OK' if d else 'KO'} / TCP 443 {'OK' if t else 'KO'}" for h, d, t in zip(hosts, dns, tcp)))
+    return dict(zip(hosts, zip(dns, tcp)))
+
+def preload_annotation(annot_cfg):
+    """Charge police et signature de l’annotation (caches du processus) pendant que l’agenda se charge."""
+    import refactor_pdf
+    with tracing.span("preload_annotation"):
+        refactor_pdf.preload(annot_cfg)
+
+@asynccontextmanager
+async def agenda_session_async(cfg, preload=None, warm=None):
+    """
+    Navigateur lancé, login fait et agenda ouvert, le temps du bloc `async with` :
+    fournit un namespace (pw, browser, context, page, content_frame, net, warm), sous la
+    surveillance mémoire du mode basse mémoire (lowmem) s’il est activé.
+    warm : (pw, browser) déjà démarrés (navigateur chaud du démon) : seul un contexte est ouvert
+    puis fermé, sans secours WebKit ; sinon Playwright et le navigateur sont lancés ici.
+    Le pré-vol DNS/TCP tourne pendant le lancement du navigateur (il n’est attendu qu’en cas
+    d’échec de navigation, pour le diagnostic) ; police et signature de `preload` sont chargées
+    pendant le login et le chargement de l’agenda.
+    """
+    preflight = asyncio.create_task(preflight_checks_async(cfg))
+    warmup = asyncio.create_task(asyncio.to_thread(preload_annotation, preload)) if preload else None
 
-    # 4) Rendu "comme à l’écran" (évite @media print qui masque parfois le grid)
-    page_h2.emulate_media(media="screen")
-    page_h2.add_style_tag(content="""
-        @page { size: A4 landscape; margin: 10mm; }
-        * { -webkit-print-color-adjust: exact; print-color-adjust: exact; }
-        html, body { background: white !important; }
-    """)
+    cached_state = session_cache.load_session(cfg)
+    net = netfilter.from_cfg(cfg)
+    try:
+        async with lowmem.watchdog(cfg), AsyncExitStack() as stack:
+            try:
+                if warm:
+                    pw, browser = warm
+                    context, page = await open_pass_async(browser, cfg, storage_state=cached_state,
+                                                          net_filter=net, label=" (navigateur chaud)")
+                else:
+                    from playwright.async_api import async_playwright
+                    pw = await stack.enter_async_context(async_playwright())
+                    browser, context, page, cached_state = await launch_browser_async(
+                        pw, cfg, storage_state=cached_state, net_filter=net)
+            except Exception:
+                await preflight  # diagnostic réseau avant de propager l’échec
+                raise
+            try:
+                try:
+                    page, content_frame = await open_agenda_async(context, cfg, resumable=bool(cached_state),
+                                                                  page=page)
+                except Exception:
+                    await preflight
+                    raise
+                yield SimpleNamespace(pw=pw, browser=browser, context=context, page=page,
+                                      content_frame=content_frame, net=net, warm=bool(warm))
+            finally:
+                if browser.is_connected():  # déjà fermé si le mode basse mémoire l’a libéré
+                    await context.close()
+                    if not warm:
+                        await browser.close()
+    finally:
+        if warmup:
+            try:
+                await warmup
+            except Exception as e:
+                print(f"[WARN] Préchargement annotation: {e}")
+        if not preflight.done():
+            preflight.cancel()  # réseau lent : les sondes (threads démons) ne retiennent pas l’export
+
+def export_agenda_pdf(cfg, in_memory=False, skip_if=None, preload=None):
+    """
+    Workflow complet d’export. Renvoie le chemin du PDF écrit (cfg 'pdf_out'),
+    ou directement ses octets si in_memory=True (aucun fichier sur disque).
+    skip_if(empreinte_agenda) -> bool : si vrai, l’impression est sautée et None est renvoyé.
+    preload : conf d’annotation dont police et signature sont chargées pendant l’export.
+    Enveloppe synchrone de export_agenda_pdf_async.
+    """
+    return asyncio.run(export_agenda_pdf_async(cfg, in_memory=in_memory, skip_if=skip_if, preload=preload))
 
-    # 5) Tempo de stabilisation
-    print(f"[INFO] Attente {settle_seconds}s pour stabilisation de l'agenda…")
-    page_h2.wait_for_timeout(settle_seconds * 1000)
+def export_agenda_pdf_bytes(cfg):
+    """API bibliothèque : exporte l’agenda et renvoie les octets du PDF (pas de fichier temporaire)."""
+    return export_agenda_pdf(cfg, in_memory=True)
 
-    # 6) Export PDF (A4 paysage, arrière-plan, 100 %, en-têtes/pieds)
-    header_tpl = """
-    <div style="width:100%; font-size:9px; color:#444; padding:4px 8px; border-bottom:1px solid #ddd;">
-      <span class="date"></span><span style="margin:0 8px;">|</span><span class="title"></span>
-    </div>"""
-    footer_tpl = """
-    <div style="width:100%; font-size:9px; color:#444; padding:4px 8px; border-top:1px solid #ddd; display:flex; justify-content:space-between;">
-      <span class="url" style="max-width:70%; overflow:hidden; text-overflow:ellipsis; white-space:nowrap;"></span>
-      <span>Page <span class="pageNumber"></span>/<span class="totalPages"></span></span>
-    </div>"""
+@tracing.traced("export_agenda_pdf")
+async def export_agenda_pdf_async(cfg, in_memory=False, skip_if=None, preload=None, warm=None):
+    """
+    Export complet (mêmes retours qu’export_agenda_pdf). warm : (pw, browser) du navigateur
+    chaud du démon, réutilisé au lieu d’en lancer un (cf. agenda_session_async).
+    """
+    pdf_out = None if in_memory else cfg.get("pdf_out", "agenda.pdf")
+    async with agenda_session_async(cfg, preload, warm=warm) as s:
+        content_url = s.content_frame.url
+
+        ready_opts = readiness.settings(cfg)
+        if skip_if:
+            agenda_fp = await agenda_fingerprint_async(s.content_frame, ready_opts=ready_opts)
+            if agenda_fp is None:
+                # skip_if non appelé : aucune empreinte enregistrée, le prochain run recomparera
+                print("[INFO] Impression sans comparaison à l’export précédent.")
+            else:
+                print(f"[INFO] Empreinte agenda: {agenda_fp[:16]}…")
+                if skip_if(agenda_fp):
+                    tracing.count("cache.unchanged")
+                    print("[INFO] Agenda inchangé : impression sautée.")
+                    return None
+        low_memory = lowmem.enabled(cfg)
+        # basse mémoire : l’URL de l’iframe agenda est déjà connue, pas d’onglet de plus pour la chercher
+        target_url = agenda_frame(s.content_frame).url if low_memory else None
+        await s.page.close()
+
+        # Impression : dans le contexte déjà authentifié si possible, sinon Chromium headless séparé
+        mode = resolve_export_mode(cfg, s.browser)
+        t0 = time.time()
+        with memstats.RssSampler() as rss, retries.stage("print", cfg):
+            if mode == "context":
+                pdf_bytes = await print_agenda_in_context_async(s.context, content_url, pdf_out,
+                                                                ready_opts=ready_opts, net_filter=s.net,
+                                                                target_url=target_url,
+                                                                snapshot_opts=snapshots.settings(cfg))
+            else:
+                storage_state = await s.context.storage_state()
+                if low_memory and not s.warm:
+                    # jamais deux navigateurs vivants à la fois : le premier est fermé avant l’impression
+                    await s.context.close()
+                    await s.browser.close()
+                pdf_bytes = await export_pdf_via_headless_chromium_async(
+                    s.pw, content_url, pdf_out, storage_state=storage_state,
+                    ignore_https_errors=bool(cfg.get("ignore_https_errors", False)),
+                    ready_opts=ready_opts, net_filter=s.net, cfg=cfg)
+        print(f"[INFO] Impression (mode={mode}): {time.time() - t0:.2f} s, "
+              f"pic RSS python+navigateurs = {rss.peak_mb:.0f} Mo")
+        print(f"[INFO] PDF sauvegardé: {pdf_out}" if pdf_out else f"[INFO] PDF en mémoire: {len(pdf_bytes)} octets")
+        if s.net:
+            s.net.report()
+    return pdf_bytes if in_memory else pdf_out
+
+# ==================================================
+# Créneaux structurés (rendu natif, sans impression)
+# ==================================================
+@tracing.traced("export_agenda_events")
+async def export_agenda_events_async(cfg, skip_if=None, preload=None):
+    """
+    Variante sans impression : les créneaux sont lus dans le DOM de la frame agenda
+    (cf. agenda_events) et renvoyés sous forme de liste, pour refactor_pdf.render_week_pdf.
+    skip_if(empreinte des créneaux) -> bool : si vrai, None est renvoyé.
+    Lève ValueError sans sélecteurs events configurés, agenda_events.ExtractionError si
+    l’extraction est vide ou partielle (jamais de semaine incomplète certifiée).
+    """
+    agenda_events.check_configured(cfg)  # avant tout login
+    async with agenda_session_async(cfg, preload) as s:
+        frame = agenda_frame(s.content_frame)
+        with retries.stage("agenda", cfg):
+            try:
+                await readiness.wait_until_stable_async(frame, label="agenda (créneaux)",
+                                                        opts=readiness.settings(cfg), strict=True)
+            except readiness.NotStable as e:
+                raise agenda_events.ExtractionError(f"Agenda instable, créneaux non lus: {e}") from e
+            events = await agenda_events.extract_async(frame, cfg)
+        print(f"[INFO] {len(events)} créneau(x) lu(s) dans l’agenda.")
+        if skip_if:
+            events_fp = agenda_events.fingerprint(events)
+            print(f"[INFO] Empreinte créneaux: {events_fp[:16]}…")
+            if skip_if(events_fp):
+                tracing.count("cache.unchanged")
+                print("[INFO] Agenda inchangé : rendu sauté.")
+                return None
+        if s.net:
+            s.net.report()
+    return events
+
+def export_agenda_events(cfg, skip_if=None, preload=None):
+    """Enveloppe synchrone de export_agenda_events_async."""
+    return asyncio.run(export_agenda_events_async(cfg, skip_if=skip_if, preload=preload))
+
+# ==================================================
+# Plusieurs semaines : 1 login, N onglets du même contexte
+# ==================================================
+# Aucun réglage par défaut : un paramètre d’URL ignoré par PASS imprimerait N fois la semaine
+# courante, puis main.py l’estampillerait S36, S37… Navigation et contrôle sont à configurer.
+WEEK_NAV_DEFAULTS = {
+    "param": None,             # paramètre d’URL de l’agenda recevant un jour de la semaine voulue
+    "format": "%d/%m/%Y",
+    "next_selector": None,     # si param: null → navigation par clics depuis la semaine affichée
+    "prev_selector": None,
+    "label_selector": None,    # élément portant les dates de la semaine affichée (ex. en-tête), vérifié
+}
+
+def week_nav_settings(cfg):
+    return {**WEEK_NAV_DEFAULTS, **(cfg.get("week_navigation") or {})}
+
+def week_agenda_url(url, monday, week_nav):
+    """URL de l’agenda positionnée sur la semaine de `monday` (paramètre d’URL week_navigation.param)."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query[week_nav["param"]] = monday.strftime(week_nav["format"])
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+async def check_week_shown_async(page, monday, week_nav, tag=""):
+    """Lève RuntimeError si les dates de week_navigation.label_selector ne sont pas celles de `monday`."""
+    selector = week_nav.get("label_selector")
+    if not selector:
+        raise ValueError("week_navigation.label_selector: élément affichant les dates de la semaine, requis "
+                         "pour vérifier la navigation.")
+    text = (await page.inner_text(selector, timeout=retries.timeout_ms(10000))).strip()
+    if not weeks.shows_week(text, monday):
+        raise RuntimeError(f"Semaine affichée {text[:80]!r} ≠ semaine du {monday:%d/%m/%Y} demandée "
+                           f"(navigation week_navigation sans effet ?).")
+    print(f"[INFO]{tag} Semaine affichée vérifiée: {text[:80]!r}")
+
+def current_monday():
+    """Lundi de la semaine affichée par défaut par l’agenda (semaine courante, Europe/Paris)."""
+    return weeks.monday_now_paris()
+
+def week_pdf_out(cfg, monday):
+    """agenda.pdf → agenda_2025-S36.pdf"""
+    p = pathlib.Path(cfg.get("pdf_out", "agenda.pdf"))
+    year, week, _ = monday.isocalendar()
+    return str(p.with_name(f"{p.stem}_{year}-S{week:02d}{p.suffix}"))
+
+async def export_agenda_weeks_async(cfg, mondays, concurrency=3, in_memory=False):
+    """
+    Exporte plusieurs semaines avec un seul login : la session est ouverte une fois (cf.
+    agenda_session_async : pré-vol, secours WebKit, surveillance mémoire), puis chaque semaine
+    est imprimée dans son propre onglet du même contexte (au plus `concurrency` à la fois).
+    Renvoie un bilan par semaine : {monday, year, week, ok, pdf (chemin ou octets) | error}.
+    """
+    week_nav = week_nav_settings(cfg)
+    if not week_nav.get("param") and not (week_nav.get("next_selector") and week_nav.get("prev_selector")):
+        raise ValueError("week_navigation: renseigner 'param' ou 'next_selector' + 'prev_selector'.")
+    if not week_nav.get("label_selector"):
+        raise ValueError("week_navigation: renseigner 'label_selector' (dates de la semaine affichée), "
+                         "sans quoi une navigation sans effet passerait inaperçue.")
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+    print(f"[INFO] Export de {len(mondays)} semaine(s), concurrence={concurrency}")
+    async with agenda_session_async(cfg) as s:
+        content_url = s.content_frame.url
+        await s.page.close()
+        with retries.stage("agenda", cfg):
+            target_url = await agenda_target_url_async(s.context, content_url)
+        ready_opts = readiness.settings(cfg)
+
+        async def run_one(monday):
+            year, week, _ = monday.isocalendar()
+            tag = f"[S{week:02d}]"
+            pdf_out = None if in_memory else week_pdf_out(cfg, monday)
+            async with sem:
+                t0 = time.time()
+                try:
+                    with retries.stage("print", cfg):
+                        pdf_bytes = await print_agenda_in_context_async(
+                            s.context, content_url, pdf_out, ready_opts=ready_opts, net_filter=s.net,
+                            target_url=target_url, monday=monday, week_nav=week_nav, tag=tag,
+                            snapshot_opts=snapshots.settings(cfg))
+                    print(f"[INFO]{tag} PDF {'en mémoire' if in_memory else 'sauvegardé: ' + pdf_out}")
+                    return {"monday": monday, "year": year, "week": week, "ok": True,
+                            "pdf": pdf_bytes if in_memory else pdf_out, "seconds": round(time.time() - t0, 2)}
+                except Exception as e:
+                    print(f"[ERROR]{tag} Impression échouée: {e}")
+                    return {"monday": monday, "year": year, "week": week, "ok": False, "error": str(e),
+                            "seconds": round(time.time() - t0, 2)}
+
+        results = await asyncio.gather(*(run_one(m) for m in mondays))
+        if s.net:
+            s.net.report()
+    return list(results)
+
+def export_agenda_weeks(cfg, mondays, concurrency=3, in_memory=False):
+    """Point d’entrée synchrone de l’export multi-semaines."""
+    return asyncio.run(export_agenda_weeks_async(cfg, mondays, concurrency=concurrency, in_memory=in_memory))
+
+# ==================================================
+# Ré-impression hors ligne d’un instantané (cf. snapshots)
+# ==================================================
+@tracing.traced("reprint_snapshot")
+async def reprint_snapshot_async(cfg, snapshot_path, pdf_path=None):
+    """
+    Ré-imprime un instantané de l’agenda dans un Chromium headless local, sans aucun accès
+    réseau : même rendu écran et mêmes réglages page.pdf() que l’export (surchargés par
+    snapshot.pdf_options / snapshot.extra_css). Renvoie les octets du PDF (écrit aussi dans
+    pdf_path si fourni).
+    """
+    snap = snapshots.load(snapshot_path)
+    opts = snapshots.settings(cfg)
+    from playwright.async_api import async_playwright
+    async with lowmem.watchdog(cfg), async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=True, args=lowmem.launch_args(cfg))
+        try:
+            context = await new_context_async(browser, cfg)
+            offline = snapshots.offline_handler_async(snap)
+            await context.route("**/*", offline)
+            page = await context.new_page()
+            if snap.viewport:
+                await page.set_viewport_size(snap.viewport)
+            # HTML : servi sous l’URL d’origine (en-têtes/pieds identiques) ; MHTML : fichier local
+            await page.goto(snap.url if snap.format == "html" else snap.path.as_uri(), wait_until="load")
+            await page.emulate_media(media="screen")
+            await page.add_style_tag(content=SCREEN_PRINT_CSS + (opts["extra_css"] or ""))
+            await readiness.wait_until_stable_async(page, label="instantané (impression)",
+                                                    opts=readiness.settings(cfg))
+            with tracing.span("page.pdf"):
+                pdf_bytes = await page.pdf(path=pdf_path, **{**PDF_OPTIONS, **(opts["pdf_options"] or {})})
+        finally:
+            await browser.close()
+    tracing.add_bytes("agenda_pdf", len(pdf_bytes))
+    print(f"[INFO] Ré-impression hors ligne de {snap.path.name} (S{snap.week:02d}) : "
+          f"{offline.blocked[0]} requête(s) réseau bloquée(s).")
+    return pdf_bytes
+
+def reprint_snapshot(cfg, snapshot_path, pdf_path=None):
+    """Enveloppe synchrone de reprint_snapshot_async."""
+    return asyncio.run(reprint_snapshot_async(cfg, snapshot_path, pdf_path=pdf_path))
 
-    page_h2.pdf(
-        path=pdf_path,
-        format="A4",
-        landscape=True,
-        print_background=True,
-        scale=1,
-        display_header_footer=True,
-        header_template=header_tpl,
-        footer_template=footer_tpl,
-        margin={"top": "14mm", "bottom": "14mm", "left": "10mm", "right": "10mm"},
-    )
-
-    ctx_h.close()
-    browser_h.close()
-def get_storage_state(context):
-    """
-    Récupère l'état (cookies, localStorage) du contexte courant pour le réutiliser
-    dans le Chromium headless d'export.
-    """
-    return context.storage_state()
 # =========================
 # Main
 # =========================
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Export PDF de l’agenda PASS")
+    ap.add_argument("config", nargs="?", default="conf.yaml")
+    ap.add_argument("--batch", metavar="PROFILES_YAML",
+                    help="fichier YAML listant les profils (clé 'profiles') à exporter dans un seul Chromium")
+    ap.add_argument("--weeks", metavar="SEMAINES",
+                    help="semaines ISO à exporter avec un seul login, ex. 36-40 ou 2025-W50-2026-W02")
+    ap.add_argument("--concurrency", type=int, default=None,
+                    help="nombre max d’exports (batch) ou de semaines (--weeks) imprimés simultanément")
+    ap.add_argument("--events", metavar="FICHIER",
+                    help="sans impression : écrit les créneaux de la semaine en JSON ou ICS (selon l’extension)")
+    ap.add_argument("--reprint", metavar="INSTANTANÉ",
+                    help="ré-imprime hors ligne un instantané d’agenda (.html/.mhtml), sans login ni réseau")
+    ap.add_argument("--pdf-out", metavar="FICHIER",
+                    help="avec --reprint : PDF à écrire (défaut : celui de l’export d’origine)")
+    return ap.parse_args(argv)
+
+def main():
+    args = parse_args()
+    cfg = load_cfg(args.config)
+    if args.batch:
+        batch = load_cfg(args.batch)
+        concurrency = args.concurrency or batch.get("concurrency", 2)
+        tracing.start("export_batch", cfg)
+        results = export_agenda_pdf_batch(cfg, batch.get("profiles") or [], concurrency=concurrency)
+        ok = sum(1 for r in results if r["ok"])
+        tracing.count("batch.failures", len(results) - ok)
+        tracing.finish(ok=ok == len(results))
+        for r in results:
+            print(f"  - profil {r['profile']}: {'OK' if r['ok'] else 'KO'} ({r['seconds']}s) {r.get('output') or r.get('pdf') or r.get('error')}")
+        print(f"✅ Batch terminé: {ok}/{len(results)} export(s) OK")
+        sys.exit(0 if ok == len(results) else 1)
+
+    if args.weeks:
+        mondays = weeks.parse_weeks(args.weeks)
+        tracing.start("export_weeks", cfg)
+        results = export_agenda_weeks(cfg, mondays, concurrency=args.concurrency or cfg.get("week_concurrency", 3))
+        ok = sum(1 for r in results if r["ok"])
+        tracing.finish(ok=ok == len(results))
+        for r in results:
+            print(f"  - {r['year']}-S{r['week']:02d}: {'OK' if r['ok'] else 'KO'} ({r['seconds']}s) {r.get('pdf') or r.get('error')}")
+        print(f"✅ Semaines exportées: {ok}/{len(results)}")
+        sys.exit(0 if ok == len(results) else 1)
+
+    if args.reprint:
+        pdf_out = args.pdf_out or snapshots.load(args.reprint).pdf
+        tracing.start("reprint", cfg)
+        reprint_snapshot(cfg, args.reprint, pdf_out)
+        tracing.finish(ok=True)
+        print(f"✅ PDF ré-imprimé hors ligne: {pdf_out}")
+        return
+
+    if args.events:
+        tracing.start("export_events", cfg)
+        try:
+            events = export_agenda_events(cfg)
+        except Exception as e:
+            tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+            raise
+        tracing.finish(ok=True)
+        print(f"✅ {len(events)} créneau(x) → {agenda_events.write(args.events, events, current_monday())}")
+        return
+
+    tracing.start("export", cfg)
+    try:
+        out = export_agenda_pdf(cfg)
+    except Exception as e:
+        tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+        raise
+    tracing.finish(ok=True)
+    print(f"✅ PDF final: {out}")
+
 if __name__ == "__main__":
-    cfg = load_cfg("conf.yaml")
-    out = export_agenda_pdf(cfg)
-    print(f"✅ PDF final: {out}")
\ No newline at end of file
+    main()
\ No newline at end of file
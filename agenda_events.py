@@ -0,0 +1,201 @@
+"""
+Créneaux de l’agenda lus dans le DOM de la frame agenda, sous forme compacte :
+    {"day": 0..6 (lundi = 0), "start": "08:00", "end": "10:00", "title": "...", "room": "..."}
+et exports JSON / ICS des mêmes données (cf. refactor_pdf.render_week_pdf pour le PDF).
+
+Le jour d’un créneau est celui de l’en-tête de colonne qui le surplombe (position à l’écran),
+ce qui couvre aussi bien une grille <table> qu’un calendrier en positionnement absolu.
+
+Pas de sélecteurs par défaut : le PDF rendu porte la certification et la signature, une
+extraction vide ou partielle produirait une fausse attestation. Les sélecteurs sont donc à
+régler sur l’agenda réel, et l’extraction lève ExtractionError si elle ne trouve aucun créneau
+ou n’en reconnaît pas un.
+
+Conf (conf.yaml) :
+    events:
+      event_selector: null                      # un élément par créneau (pass_stub : "#grid td.slot")
+      day_header_selector: null                 # en-têtes de colonnes (pass_stub : "#grid thead th")
+      text_pattern: null                        # regex (groupes start, end, title, room) ; défaut ci-dessous
+"""
+import datetime as dt
+import hashlib, json, pathlib, re
+
+import fingerprints
+
+DEFAULTS = {
+    "event_selector": None,
+    "day_header_selector": None,
+    "text_pattern": None,
+}
+
+# "08:00-10:00 Réseaux (B01-102)", "8h00 – 10h00 Réseaux", …
+TEXT_PATTERN = (r"(?P<start>\d{1,2}[:hH]\d{2})\s*[-–à]\s*(?P<end>\d{1,2}[:hH]\d{2})\s*"
+                r"(?P<title>.*?)\s*(?:\((?P<room>[^()]*)\))?\s*$")
+
+DAYS = ["lundi", "mardi", "mercredi", "jeudi", "vendredi", "samedi", "dimanche"]
+
+EXTRACT_JS = """
+({ eventSel, headerSel }) => {
+  const norm = s => (s || '').replace(/\\s+/g, ' ').trim();
+  const cols = Array.from(document.querySelectorAll(headerSel)).map(th => {
+    const r = th.getBoundingClientRect();
+    return { text: norm(th.textContent).toLowerCase(), left: r.left, right: r.right };
+  });
+  return Array.from(document.querySelectorAll(eventSel)).map(el => {
+    const r = el.getBoundingClientRect();
+    const x = r.left + r.width / 2;
+    const col = cols.find(c => x >= c.left && x < c.right);
+    return { text: norm(el.innerText || el.textContent), header: col ? col.text : null };
+  });
+}
+"""
+
+class ExtractionError(RuntimeError):
+    pass
+
+def settings(cfg):
+    return {**DEFAULTS, **((cfg or {}).get("events") or {})}
+
+def check_configured(cfg):
+    """Lève ValueError si events.event_selector / events.day_header_selector ne sont pas réglés."""
+    opts = settings(cfg)
+    missing = [k for k in ("event_selector", "day_header_selector") if not opts.get(k)]
+    if missing:
+        raise ValueError(f"events: renseigner {' et '.join(missing)} (sélecteurs vérifiés sur l’agenda réel) "
+                         f"avant le rendu natif ou --events.")
+    return opts
+
+def _args(opts):
+    return {"eventSel": opts["event_selector"], "headerSel": opts["day_header_selector"]}
+
+def day_index(header):
+    """Index du jour (lundi = 0) d’après le texte d’en-tête ("Lundi 12/09", "lun.", …)."""
+    for i, name in enumerate(DAYS):
+        if header and re.search(rf"\b{name[:3]}", header):
+            return i
+    return None
+
+def _hhmm(value):
+    h, m = re.split(r"[:hH]", value)
+    return f"{int(h):02d}:{int(m):02d}"
+
+def parse_slot(text, header, pattern=TEXT_PATTERN):
+    """Créneau normalisé, ou None si le texte ou le jour ne sont pas reconnus."""
+    m = re.match(pattern, text or "")
+    day = day_index(header)
+    if not m or day is None:
+        return None
+    groups = m.groupdict()
+    return {
+        "day": day,
+        "start": _hhmm(groups["start"]),
+        "end": _hhmm(groups["end"]),
+        "title": (groups.get("title") or "").strip(),
+        "room": (groups.get("room") or "").strip(),
+    }
+
+def normalize(raw, opts):
+    """Créneaux triés ; ExtractionError si aucun élément trouvé ou si l’un n’est pas reconnu."""
+    if not raw:
+        raise ExtractionError(f"Aucun créneau trouvé ({opts['event_selector']!r}) : sélecteur à revoir, "
+                              f"ou semaine vide à exporter par impression.")
+    events, skipped = [], []
+    for item in raw:
+        ev = parse_slot(item["text"], item["header"], opts["text_pattern"] or TEXT_PATTERN)
+        if ev is None:
+            skipped.append(item)
+        else:
+            events.append(ev)
+    if skipped:
+        sample = "; ".join(f"{it['text'][:60]!r} (colonne {it['header']!r})" for it in skipped[:3])
+        raise ExtractionError(f"{len(skipped)}/{len(raw)} élément(s) d’agenda non reconnu(s) "
+                              f"(cf. events.text_pattern / day_header_selector) : {sample}")
+    return sorted(events, key=lambda e: (e["day"], e["start"], e["title"]))
+
+def extract(frame, cfg=None):
+    opts = check_configured(cfg)
+    return normalize(frame.evaluate(EXTRACT_JS, _args(opts)), opts)
+
+async def extract_async(frame, cfg=None):
+    opts = check_configured(cfg)
+    return normalize(await frame.evaluate(EXTRACT_JS, _args(opts)), opts)
+
+def fingerprint(events):
+    """Empreinte des créneaux (insensible à la mise en page de l’agenda)."""
+    return fingerprints.sha256_text(json.dumps(events, sort_keys=True, ensure_ascii=False))
+
+# =========================
+# Exports
+# =========================
+def _when(monday, ev, key):
+    h, m = (int(x) for x in ev[key].split(":"))
+    return dt.datetime.combine(monday + dt.timedelta(days=ev["day"]), dt.time(h, m))
+
+def to_json(events, monday):
+    return json.dumps({"week_start": monday.isoformat(), "events": events}, indent=2, ensure_ascii=False)
+
+def _ics_text(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _fold(line):
+    """Repli des lignes ICS à 75 octets (RFC 5545 §3.1)."""
+    data = line.encode("utf-8")
+    out = []
+    while len(data) > 75:
+        cut = 75 if not out else 74
+        while cut and (data[cut] & 0xC0) == 0x80:  # ne pas couper un caractère UTF-8
+            cut -= 1
+        out.append(data[:cut])
+        data = data[cut:]
+    out.append(data)
+    return b"\r\n ".join(out).decode("utf-8")
+
+# Définition du fuseau référencé par TZID (obligatoire, RFC 5545 §3.6.5) : règles UE depuis 1996
+TZID = "Europe/Paris"
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TZID}",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "TZNAME:CEST",
+    "DTSTART:19810329T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "TZNAME:CET",
+    "DTSTART:19961027T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+def to_ics(events, monday):
+    stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//autotimetable//agenda PASS//FR", "CALSCALE:GREGORIAN"]
+    lines += VTIMEZONE
+    for ev in events:
+        start, end = _when(monday, ev, "start"), _when(monday, ev, "end")
+        uid = hashlib.sha1(f"{start.isoformat()}|{ev['title']}|{ev['room']}".encode("utf-8")).hexdigest()
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{uid}@autotimetable",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;TZID={TZID}:{start:%Y%m%dT%H%M%S}",
+            f"DTEND;TZID={TZID}:{end:%Y%m%dT%H%M%S}",
+            f"SUMMARY:{_ics_text(ev['title'])}",
+        ]
+        if ev["room"]:
+            lines.append(f"LOCATION:{_ics_text(ev['room'])}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+def write(path, events, monday):
+    """Écrit les créneaux en JSON ou en ICS selon l’extension de `path`."""
+    path = pathlib.Path(path)
+    text = to_ics(events, monday) if path.suffix.lower() == ".ics" else to_json(events, monday)
+    path.write_text(text, encoding="utf-8", newline="")
+    return path
@@ -0,0 +1,224 @@
+"""
+Cache disque des ressources statiques de PASS (CSS, JS, images, polices du frameset et de
+l’agenda), servi depuis l’interception de routes de netfilter : les routes Playwright
+désactivent le cache HTTP du navigateur, et un profil persistant (user-data-dir) mêlerait
+ces ressources aux cookies de session.
+
+Ne sont gardées que les réponses GET 200 de types statiques, sans Set-Cookie ni
+Cache-Control no-store/private ; sont écrits le corps et les en-têtes de réponse utiles au
+rejeu (Content-Type, CORS, validateurs et fraîcheur), jamais d’en-têtes de requête ni de
+cookies. Une entrée est servie telle quelle tant qu’elle est fraîche au sens du serveur
+(max-age, Expires, sinon 10 % de l’âge du Last-Modified), au plus max_age_h ; au-delà, elle
+est revalidée (If-None-Match / If-Modified-Since) et un 304 la resservira.
+Taille plafonnée : les entrées les moins récemment servies sont évincées en premier.
+
+    cache = asset_cache.from_cfg(cfg)
+    entry = cache.lookup(request)          # Entry (fresh, headers, body) ou None
+    cache.store(request, status, headers, body)   # après route.fetch()
+
+Conf (conf.yaml) :
+    asset_cache:
+      enabled: false
+      path: ~/.cache/autotimetable/assets
+      max_mb: 50
+      max_age_h: 168           # plafond de fraîcheur (le max-age du serveur s’applique en deçà)
+      resource_types: [stylesheet, script, image, font]
+"""
+import hashlib, json, os, pathlib, re, time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+import tracing
+
+DEFAULTS = {
+    "enabled": False,
+    "path": "~/.cache/autotimetable/assets",
+    "max_mb": 50,
+    "max_age_h": 168,
+    "resource_types": ["stylesheet", "script", "image", "font"],
+}
+NO_STORE = re.compile(r"no-store|private", re.IGNORECASE)
+NO_CACHE = re.compile(r"no-cache", re.IGNORECASE)
+MAX_AGE = re.compile(r"(?:^|[,\s])max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+# en-têtes de réponse rejoués sur un hit (jamais Content-Length/Encoding : le corps stocké est décodé)
+REPLAYED_HEADERS = (
+    "content-type", "cache-control", "etag", "last-modified", "expires", "date", "content-language",
+    "access-control-allow-origin", "access-control-allow-credentials", "access-control-expose-headers",
+    "timing-allow-origin", "cross-origin-resource-policy",
+)
+
+def _http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+def freshness_s(headers):
+    """Durée de fraîcheur (s) annoncée par le serveur, comme un cache HTTP privé (RFC 9111 §4.2)."""
+    cc = headers.get("cache-control", "")
+    if NO_CACHE.search(cc):
+        return 0
+    m = MAX_AGE.search(cc)
+    if m:
+        lifetime = int(m.group(1))
+    else:
+        date = _http_date(headers.get("date")) or time.time()
+        expires = _http_date(headers.get("expires"))
+        modified = _http_date(headers.get("last-modified"))
+        if expires is not None:
+            lifetime = expires - date
+        elif modified is not None:
+            lifetime = 0.1 * (date - modified)  # heuristique
+        else:
+            lifetime = 0
+    try:
+        lifetime -= int(headers.get("age") or 0)
+    except ValueError:
+        pass
+    return max(0, lifetime)
+
+@dataclass
+class Entry:
+    headers: dict
+    body: bytes
+    fresh: bool
+
+    def validators(self):
+        """En-têtes de requête conditionnelle pour revalider l’entrée (vide si aucun validateur)."""
+        v = {}
+        if self.headers.get("etag"):
+            v["if-none-match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            v["if-modified-since"] = self.headers["last-modified"]
+        return v
+
+class AssetCache:
+    def __init__(self, opts=None):
+        opts = {**DEFAULTS, **(opts or {})}
+        self.root = pathlib.Path(os.path.expanduser(opts["path"]))
+        self.max_bytes = int(float(opts["max_mb"]) * 1024 * 1024)
+        self.max_age_s = float(opts["max_age_h"]) * 3600
+        self.types = set(opts["resource_types"] or [])
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._size = None
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / f"{key}.body", self.root / f"{key}.json"
+
+    # -------- décision --------
+    def cacheable(self, request):
+        return request.method == "GET" and request.resource_type in self.types
+
+    def lookup(self, request):
+        """
+        Entrée en cache (fraîche, ou périmée mais revalidable), ou None. Rien n’est compté ici :
+        l’appelant signale hit() / revalidated() / miss() selon ce qu’il a servi.
+        """
+        body_path, meta_path = self._paths(request.url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            headers = meta["headers"]
+            age = time.time() - meta["stored"]
+            fresh = age <= min(meta["lifetime"], self.max_age_s)
+            entry = Entry(headers=headers, body=body_path.read_bytes(), fresh=fresh)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not entry.fresh and not entry.validators():
+            return None
+        return entry
+
+    def hit(self, request, entry):
+        body_path, _ = self._paths(request.url)
+        try:
+            os.utime(body_path)  # récence pour l’éviction
+        except OSError:
+            pass
+        self.hits += 1
+        self.bytes_saved += len(entry.body)
+
+    def revalidated(self, request, entry, headers):
+        """304 reçu : l’entrée repart pour une durée de fraîcheur (en-têtes mis à jour) ; compte un hit."""
+        entry.headers = {**entry.headers, **self._replayed(headers)}
+        _, meta_path = self._paths(request.url)
+        self._write_meta(meta_path, request.url, entry.headers, freshness_s({**entry.headers, **headers}))
+        self.hit(request, entry)
+        return entry
+
+    def miss(self):
+        self.misses += 1
+
+    @staticmethod
+    def _replayed(headers):
+        return {k: v for k, v in headers.items() if k.lower() in REPLAYED_HEADERS}
+
+    def _write_meta(self, meta_path, url, headers, lifetime):
+        meta_path.write_text(json.dumps({
+            "url": url,
+            "headers": headers,
+            "lifetime": lifetime,
+            "stored": time.time(),
+        }), encoding="utf-8")
+
+    def store(self, request, status, headers, body):
+        """
+        Garde la réponse si elle s’y prête (200, ni cookie ni no-store/private, et fraîche un
+        moment ou revalidable).
+        """
+        if status != 200 or "set-cookie" in headers or NO_STORE.search(headers.get("cache-control", "")):
+            return False
+        if len(body) > self.max_bytes:
+            return False
+        replayed = self._replayed(headers)
+        lifetime = freshness_s(headers)
+        if not lifetime and not ("etag" in replayed or "last-modified" in replayed):
+            return False  # ni fraîcheur ni validateur : jamais resservable
+        self.root.mkdir(parents=True, exist_ok=True)
+        body_path, meta_path = self._paths(request.url)
+        tmp = body_path.with_suffix(".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, body_path)
+        self._write_meta(meta_path, request.url, replayed, lifetime)
+        self._size = (self._size if self._size is not None else self.disk_bytes()) + len(body)
+        if self._size > self.max_bytes:
+            self.evict()
+        return True
+
+    # -------- taille / éviction --------
+    def disk_bytes(self):
+        return sum(p.stat().st_size for p in self.root.glob("*.body")) if self.root.exists() else 0
+
+    def evict(self):
+        """Supprime les entrées les moins récemment servies jusqu’à repasser sous 90 % du plafond."""
+        entries = sorted(((p.stat().st_mtime, p.stat().st_size, p) for p in self.root.glob("*.body")),
+                         key=lambda e: e[0])
+        size = sum(e[1] for e in entries)
+        evicted = 0
+        for _, nbytes, body_path in entries:
+            if size <= self.max_bytes * 0.9:
+                break
+            body_path.unlink(missing_ok=True)
+            body_path.with_suffix(".json").unlink(missing_ok=True)
+            size -= nbytes
+            evicted += 1
+        self._size = size
+        tracing.count("asset_cache.evicted", evicted)
+
+    # -------- bilan --------
+    def report(self, tag=""):
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        tracing.count("asset_cache.hits", self.hits)
+        tracing.count("asset_cache.misses", self.misses)
+        tracing.add_bytes("asset_cache_saved", self.bytes_saved)
+        print(f"[INFO]{tag} Cache ressources: {self.hits}/{total} servies localement ({ratio:.0%}), "
+              f"{self.bytes_saved / 1024:.0f} Ko économisés")
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": round(ratio, 3),
+                "bytes_saved": self.bytes_saved}
+
+def from_cfg(cfg):
+    """Cache configuré (clé 'asset_cache'), ou None s’il est désactivé."""
+    opts = (cfg or {}).get("asset_cache") or {}
+    return AssetCache(opts) if opts.get("enabled", DEFAULTS["enabled"]) else None
@@ -0,0 +1,212 @@
+"""
+Benchmark hors ligne de l’annotation (annotate_pdf / make_overlay), sans navigateur.
+
+Des agendas synthétiques A4 paysage (comme page.pdf) de 1, 10, 100 et 1000 pages sont
+générés avec reportlab, en trois variantes :
+  - base14  : polices standard non embarquées, texte et grille seuls ;
+  - fonts   : police TTF embarquée (DejaVu, sous-ensemble) ;
+  - images  : police embarquée + une image raster par page (logo/bandeau).
+Chaque cas (pages × variante × signature × mode) tourne dans un interpréteur neuf (spawn), à
+froid (caches d’overlay et de signature vides, police déjà chargée) : latence, pages/s, hausse
+du pic RSS pendant l’annotation et taille de sortie. Un processus par run : la hausse RSS ne
+dépend ni de l’ordre des cas ni de ce que l’allocateur a gardé des cas précédents.
+L’overlay va sur la 2ᵉ page : à 1 page, seul le coût de lecture/réécriture est mesuré.
+
+    python bench_annotate.py --runs 3 --out bench_annotate.json
+    python bench_annotate.py --pages 1,100 --modes full,incremental --baseline bench_annotate.json
+"""
+import argparse, gc, io, json, multiprocessing, pathlib, random, statistics, sys, tempfile, time, zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import memstats
+import refactor_pdf
+
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+PAGES = [1, 10, 100, 1000]
+VARIANTS = ["base14", "fonts", "images"]
+SIGNATURES = {"none": None, "small": (300, 120, 14), "large": (1600, 640, 60)}  # (px l, px h, pt)
+MODES = ["full", "incremental", "optimize"]
+METRICS = ["latency_s", "pages_per_s", "rss_delta_mb", "output_bytes"]
+
+# ---------- PDF synthétiques ----------
+def _png(width, height, seed, alpha=False, density=1.0):
+    """
+    PNG bruité : density=1 pour un bandeau photo (peu compressible), faible avec alpha pour une
+    signature scannée (traits épars sur fond transparent).
+    """
+    rnd = random.Random(seed)
+    channels = 4 if alpha else 3
+    blank = bytes(channels)
+
+    def pixel():
+        return bytes(rnd.getrandbits(8) for _ in range(channels)) if rnd.random() < density else blank
+
+    raw = b"".join(b"\x00" + b"".join(pixel() for _ in range(width)) for _ in range(height))
+    def chunk(tag, data):
+        return (len(data).to_bytes(4, "big") + tag + data
+                + zlib.crc32(tag + data).to_bytes(4, "big"))
+    ihdr = width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, 6 if alpha else 2, 0, 0, 0])
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 6))
+            + chunk(b"IEND", b""))
+
+def synthetic_agenda(path, pages, variant, seed=0):
+    """Agenda factice : en-tête/pied comme page.pdf, grille 5 jours × 11 h, créneaux texte."""
+    rnd = random.Random(seed)
+    font = refactor_pdf.register_font() if variant in ("fonts", "images") else "Helvetica"
+    banner = ImageReader(io.BytesIO(_png(400, 60, seed))) if variant == "images" else None
+    w, h = landscape(A4)
+    c = canvas.Canvas(str(path), pagesize=(w, h))
+    days = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi"]
+    for n in range(pages):
+        c.setFont(font, 8)
+        c.drawString(28, h - 20, f"Agenda PASS — page {n + 1}/{pages}")
+        c.drawRightString(w - 28, 14, time.strftime("%d/%m/%Y %H:%M"))
+        if banner:
+            c.drawImage(banner, w - 228, h - 40, width=200, height=30)
+        left, top, col, row = 60, h - 60, (w - 90) / 5, (h - 110) / 11
+        for d, name in enumerate(days):
+            c.drawCentredString(left + (d + 0.5) * col, top + 6, name)
+            for r in range(11):
+                c.rect(left + d * col, top - (r + 1) * row, col, row, stroke=1, fill=0)
+                if rnd.random() < 0.35:
+                    c.drawString(left + d * col + 3, top - r * row - 10,
+                                 f"{8 + r:02d}:00 Cours {rnd.randint(1, 99)} (B0{rnd.randint(1, 9)}-{rnd.randint(100, 300)})")
+        c.showPage()
+    c.save()
+    return path
+
+# ---------- mesures ----------
+def clear_caches():
+    refactor_pdf.overlay_page.cache_clear()
+    refactor_pdf._signature_reader.cache_clear()
+
+def run_case(src, pages, signature, mode, out_dir):
+    """Un run, dans le processus courant (cf. run_case_isolated)."""
+    clear_caches()
+    refactor_pdf.register_font()  # hors mesure : déjà chargée pendant l’export dans le pipeline
+    out = pathlib.Path(out_dir) / f"out_{mode}.pdf"
+    sig_path, sig_h = signature if signature else (None, 14)
+    gc.collect()
+    rss_start = memstats.tree_rss_bytes()
+    t0 = time.perf_counter()
+    with memstats.RssSampler(interval=0.02) as rss:
+        refactor_pdf.annotate_pdf(str(src), str(out), "Certifie sur l’honneur avoir été présent(e)",
+                                  "Test Bench", signature_path=sig_path, signature_height_pt=sig_h,
+                                  incremental=mode == "incremental")
+        if mode == "optimize":
+            refactor_pdf.optimize_pdf(out)
+    latency = time.perf_counter() - t0
+    return {
+        "latency_s": round(latency, 4),
+        "pages_per_s": round(pages / latency, 1),
+        "rss_delta_mb": round(max(0, rss.peak - rss_start) / memstats.MB, 1),
+        "output_bytes": out.stat().st_size,
+    }
+
+def run_case_isolated(src, pages, signature, mode, out_dir):
+    """run_case dans un interpréteur neuf : RSS de départ comparable d’un cas et d’un run à l’autre."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, str(src), pages, signature, mode, str(out_dir)).result()
+
+def summarize(runs):
+    summary = {}
+    for k in METRICS:
+        vals = sorted(r[k] for r in runs)
+        summary[k] = {"median": round(statistics.median(vals), 4), "max": round(vals[-1], 4)}
+    return summary
+
+def compare(cases, baseline, tolerance, min_latency_s=0.02, min_rss_mb=16):
+    """
+    Régressions par cas : latence / RSS / taille en hausse, ou débit en baisse, au-delà de
+    tolerance ; les écarts de latence < min_latency_s et de RSS < min_rss_mb sont du bruit.
+    """
+    regressions = []
+    for key, cur in cases.items():
+        ref = ((baseline.get("cases") or {}).get(key) or {}).get("summary")
+        if not ref:
+            continue
+        for k in METRICS:
+            a, b = ref[k]["median"], cur["summary"][k]["median"]
+            lat_a, lat_b = ref["latency_s"]["median"], cur["summary"]["latency_s"]["median"]
+            if k == "pages_per_s":
+                worse = b < a * (1 - tolerance) and lat_b - lat_a > min_latency_s
+            else:
+                slack = {"latency_s": min_latency_s, "rss_delta_mb": min_rss_mb}.get(k, 0)
+                worse = b > a * (1 + tolerance) and b - a > slack
+            if worse:
+                regressions.append(f"{key} {k}: {a} → {b}")
+    return regressions
+
+def _csv(allowed, cast=str):
+    """type= argparse : liste séparée par des virgules, restreinte à `allowed` (erreur d’usage sinon)."""
+    def parse(value):
+        try:
+            items = [cast(v) for v in value.split(",") if v]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"liste invalide: {value!r}")
+        unknown = [v for v in items if v not in allowed]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"valeurs inconnues: {unknown} (choix: {allowed})")
+        return items
+    return parse
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark annotation PDF (hors ligne)")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--pages", type=_csv(PAGES, int), default=",".join(map(str, PAGES)))
+    ap.add_argument("--variants", type=_csv(VARIANTS), default=",".join(VARIANTS))
+    ap.add_argument("--signatures", type=_csv(list(SIGNATURES)), default=",".join(SIGNATURES))
+    ap.add_argument("--modes", type=_csv(MODES), default=",".join(MODES))
+    ap.add_argument("--out", help="rapport JSON")
+    ap.add_argument("--baseline", help="rapport JSON de référence")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="régression tolérée (0.2 = +20 %%)")
+    args = ap.parse_args()
+
+    pages_list, variants, signatures, modes = args.pages, args.variants, args.signatures, args.modes
+
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        sig_files = {}
+        for name, spec in SIGNATURES.items():
+            if spec and name in signatures:
+                p = tmp / f"sig_{name}.png"
+                p.write_bytes(_png(spec[0], spec[1], seed=1, alpha=True, density=0.08))
+                sig_files[name] = (str(p), spec[2])
+        for pages in pages_list:
+            for variant in variants:
+                src = synthetic_agenda(tmp / f"agenda_{pages}_{variant}.pdf", pages, variant)
+                for sig in signatures:
+                    for mode in modes:
+                        key = f"{pages}p/{variant}/sig-{sig}/{mode}"
+                        runs = [run_case_isolated(src, pages, sig_files.get(sig), mode, tmp)
+                                for _ in range(args.runs)]
+                        cases[key] = {"input_bytes": src.stat().st_size, "runs": runs, "summary": summarize(runs)}
+                        s = cases[key]["summary"]
+                        print(f"[BENCH] {key}: {s['latency_s']['median'] * 1000:.1f} ms, "
+                              f"{s['pages_per_s']['median']:.0f} p/s, +{s['rss_delta_mb']['median']} Mo RSS, "
+                              f"{cases[key]['input_bytes']} → {s['output_bytes']['median']:.0f} o")
+
+    report = {
+        "bench": "annotate",
+        "params": {"runs": args.runs, "pages": pages_list, "variants": variants,
+                   "signatures": signatures, "modes": modes},
+        "cases": cases,
+    }
+    if args.out:
+        pathlib.Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(cases, baseline, args.tolerance)
+        for r in regressions:
+            print(f"[REGRESSION] {r}")
+        if regressions:
+            sys.exit(1)
+        print("[BENCH] Aucune régression par rapport à la référence.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark de bout en bout de l’export, hors ligne, contre le serveur local pass_stub.
+
+Chaque run exécute export_agenda_pdf() complet (lancement navigateur, SSO, CAS, consentement,
+frameset, Agenda, impression). Les durées par étape sont déduites des horodatages des pages
+servies par le stub ; le pic RSS couvre python + driver Playwright + Chromium.
+
+    python bench_export.py --runs 5 --delay-ms 50 --out bench_export.json
+    python bench_export.py --runs 5 --baseline bench_export.json   # code retour 1 si régression
+"""
+import argparse, importlib.util, json, pathlib, statistics, sys, tempfile, time
+
+import memstats
+import pass_stub
+import readiness
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent
+
+# étape -> (hit de début, hit de fin) ; None = début / fin du run
+STAGES = [
+    ("launch+goto", None, "login"),
+    ("sso", "login", "cas"),
+    ("cas", "cas", "consent"),
+    ("consent", "consent", "frameset"),
+    ("agenda", "frameset", "week"),
+    ("print", "week", None),
+]
+
+def load_exporter():
+    spec = importlib.util.spec_from_file_location("dev_pdf_edt", BASE_DIR / "Dev-PDF_EDT.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def stage_timings(state, t_start, t_end):
+    marks = {}
+    for name in {m for _, a, b in STAGES for m in (a, b) if m}:
+        marks[name] = state.first_hit(name)
+    out = {}
+    for stage, a, b in STAGES:
+        ta = t_start if a is None else marks.get(a)
+        tb = t_end if b is None else marks.get(b)
+        out[stage] = round(tb - ta, 4) if ta is not None and tb is not None else None
+    out["total"] = round(t_end - t_start, 4)
+    return out
+
+def run_once(exporter, state, cfg):
+    state.reset()
+    readiness.WAITS.clear()
+    t0 = time.perf_counter()
+    with memstats.RssSampler(interval=0.1) as rss:
+        exporter.export_agenda_pdf(cfg)
+    t1 = time.perf_counter()
+    res = stage_timings(state, t0, t1)
+    res["peak_rss_mb"] = round(rss.peak_mb, 1)
+    res["pdf_bytes"] = pathlib.Path(cfg["pdf_out"]).stat().st_size
+    res["readiness_ms"] = round(sum(ms for _, ms, _ in readiness.WAITS))
+    res["readiness_timeouts"] = [label for label, _, ok in readiness.WAITS if not ok]
+    return res
+
+def summarize(runs):
+    keys = [s for s, _, _ in STAGES] + ["total", "readiness_ms", "peak_rss_mb", "pdf_bytes"]
+    summary = {}
+    for k in keys:
+        vals = sorted(r[k] for r in runs if r.get(k) is not None)
+        if not vals:
+            continue
+        summary[k] = {
+            "median": round(statistics.median(vals), 4),
+            "p90": round(vals[min(len(vals) - 1, int(0.9 * len(vals)))], 4),
+            "max": round(vals[-1], 4),
+        }
+    return summary
+
+def compare(summary, baseline, tolerance, min_abs=0.05):
+    """Liste des régressions : médiane > baseline × (1 + tolerance) et écart > min_abs."""
+    regressions = []
+    for k, cur in summary.items():
+        ref = (baseline.get("summary") or {}).get(k)
+        if not ref:
+            continue
+        slack = min_abs if k not in ("peak_rss_mb", "pdf_bytes") else 0
+        if cur["median"] > ref["median"] * (1 + tolerance) and cur["median"] - ref["median"] > slack:
+            regressions.append(f"{k}: {ref['median']} → {cur['median']}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark export PASS (serveur local)")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--delay-ms", type=int, default=0, help="latence ajoutée à chaque réponse du stub")
+    ap.add_argument("--xhr-delay-ms", type=int, default=300, help="latence de la requête des créneaux")
+    ap.add_argument("--config", help="conf YAML fusionnée au-dessus de la conf stub (readiness, export_mode…)")
+    ap.add_argument("--out", help="rapport JSON")
+    ap.add_argument("--baseline", help="rapport JSON de référence")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="régression tolérée (0.2 = +20 %%)")
+    args = ap.parse_args()
+
+    exporter = load_exporter()
+    server, state, base_url = pass_stub.start_stub(delay_ms=args.delay_ms, xhr_delay_ms=args.xhr_delay_ms)
+    overrides = exporter.load_cfg(args.config) if args.config else {}
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = pass_stub.stub_export_cfg(base_url, pdf_out=str(pathlib.Path(tmp) / "agenda.pdf"), **overrides)
+        for i in range(1, args.runs + 1):
+            res = run_once(exporter, state, cfg)
+            runs.append(res)
+            print(f"[BENCH] run {i}/{args.runs}: total={res['total']:.2f}s rss={res['peak_rss_mb']} Mo "
+                  f"readiness={res['readiness_ms']}ms " + " ".join(f"{s}={res[s]}" for s, _, _ in STAGES))
+    server.shutdown()
+
+    # une attente qui atteint max_ms mesure la borne, pas l’agenda : résultats inexploitables
+    timeouts = sorted({label for r in runs for label in r["readiness_timeouts"]})
+    if timeouts:
+        print(f"[ERROR] Stabilité jamais atteinte ({', '.join(timeouts)}) : grid_selector ne correspond "
+              "pas à la grille du stub, le benchmark mesurerait readiness.max_ms.")
+        sys.exit(2)
+
+    report = {
+        "bench": "export",
+        "params": {"runs": args.runs, "delay_ms": args.delay_ms, "xhr_delay_ms": args.xhr_delay_ms,
+                   "config": overrides},
+        "runs": runs,
+        "summary": summarize(runs),
+    }
+    print(json.dumps(report["summary"], indent=2))
+    if args.out:
+        pathlib.Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(pathlib.Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report["summary"], baseline, args.tolerance)
+        for r in regressions:
+            print(f"[REGRESSION] {r}")
+        if regressions:
+            sys.exit(1)
+        print("[BENCH] Aucune régression par rapport à la référence.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Mode service : Playwright + Chromium gardés chauds, export hebdomadaire planifié et
+jobs à la demande via un petit endpoint HTTP local.
+
+    python daemon.py                       # utilise conf.yaml / conf_annot.yaml
+    curl -X POST localhost:8766/jobs       # export immédiat (corps JSON optionnel: {"force": true})
+    curl localhost:8766/status
+
+Conf (conf.yaml) :
+    daemon:
+      host: 127.0.0.1
+      port: 8766
+      weekday: 1               # jour ISO de l’export hebdo (1 = lundi)
+      at: "07:30"              # heure locale Europe/Paris
+      max_browser_age_h: 24    # recyclage du navigateur au-delà…
+      max_browser_rss_mb: 700  # … ou si l’arbre de processus dépasse ce RSS
+      max_jobs_per_browser: 50
+      idle_close_min: 30       # ferme le navigateur après cette inactivité (relancé à la demande)
+      retry_base_min: 10       # export hebdo en échec : nouvel essai après 10 min, puis 20, 40…
+      retry_max_min: 360       # … plafonné à 6 h (mot de passe erroné, panne PASS : pas de rafale CAS)
+"""
+import datetime as dt
+import asyncio, itertools, json, pathlib, queue, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+import main as workflow
+import memstats
+import tracing
+
+DEFAULTS = {
+    "host": "127.0.0.1",
+    "port": 8766,
+    "weekday": 1,
+    "at": "07:30",
+    "max_browser_age_h": 24,
+    "max_browser_rss_mb": 700,
+    "max_jobs_per_browser": 50,
+    "idle_close_min": 30,
+    "retry_base_min": 10,
+    "retry_max_min": 360,
+    "state_file": ".daemon_state.json",
+}
+
+# =========================
+# Navigateur chaud
+# =========================
+class WarmBrowser:
+    """
+    Playwright (API async) + Chromium réutilisés d’un job à l’autre, chaque export ouvrant son
+    propre contexte (cf. agenda_session_async). Playwright est lié à la boucle asyncio qui l’a
+    démarré : cet objet n’est utilisé que par la boucle du thread worker.
+    """
+    def __init__(self, exporter, cfg, settings):
+        self.exporter = exporter
+        self.cfg = cfg
+        self.settings = settings
+        self.pw = None
+        self.browser = None
+        self.launched_at = None
+        self.last_used = None
+        self.jobs = 0
+
+    async def get(self):
+        reason = self.recycle_reason()
+        if reason:
+            print(f"[INFO] Recyclage du navigateur ({reason}).")
+            await self.close_browser()
+        if self.pw is None:
+            from playwright.async_api import async_playwright
+            self.pw = await async_playwright().start()
+        if self.browser is None:
+            opts = self.exporter.browser_launch_options(self.cfg)
+            self.browser = await self.pw.chromium.launch(**opts)
+            self.launched_at = time.time()
+            self.jobs = 0
+            print(f"[INFO] Navigateur chaud lancé (headless={opts['headless']}).")
+        self.last_used = time.time()
+        self.jobs += 1
+        return self.pw, self.browser
+
+    def recycle_reason(self):
+        if self.browser is None:
+            return None
+        if not self.browser.is_connected():
+            return "déconnecté"
+        age_h = (time.time() - self.launched_at) / 3600
+        if age_h > float(self.settings["max_browser_age_h"]):
+            return f"âge {age_h:.1f} h"
+        rss_mb = memstats.tree_rss_bytes() / memstats.MB
+        if rss_mb > float(self.settings["max_browser_rss_mb"]):
+            return f"RSS {rss_mb:.0f} Mo"
+        if self.jobs >= int(self.settings["max_jobs_per_browser"]):
+            return f"{self.jobs} jobs"
+        return None
+
+    async def close_if_idle(self):
+        idle = float(self.settings["idle_close_min"]) * 60
+        if self.browser is not None and self.last_used and time.time() - self.last_used > idle:
+            print("[INFO] Navigateur inactif : fermeture.")
+            await self.close_browser()
+
+    async def close_browser(self):
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception as e:
+                print(f"[WARN] Fermeture navigateur: {e}")
+            self.browser = None
+
+    async def stop(self):
+        await self.close_browser()
+        if self.pw is not None:
+            await self.pw.stop()
+            self.pw = None
+
+    def status(self):
+        return {
+            "running": self.browser is not None,
+            "age_s": round(time.time() - self.launched_at, 1) if self.browser is not None else None,
+            "jobs": self.jobs,
+            "tree_rss_mb": round(memstats.tree_rss_bytes() / memstats.MB, 1),
+        }
+
+# =========================
+# Service
+# =========================
+class Daemon:
+    def __init__(self, conf_pass, conf_annot):
+        self.conf_pass = conf_pass
+        self.conf_annot = conf_annot
+        self.settings = {**DEFAULTS, **(conf_pass.get("daemon") or {})}
+        self.exporter = workflow.load_exporter()
+        self.annotator = workflow.load_annotator()
+        self.warm = WarmBrowser(self.exporter, conf_pass, self.settings)
+        self.loop = None  # boucle asyncio du thread worker (cf. worker)
+        self.queue = queue.Queue()
+        self.history = []
+        self.ids = itertools.count(1)
+        self.stop_event = threading.Event()
+        self.state_path = pathlib.Path(self.settings["state_file"])
+        self.state = self._load_state()
+
+    # -------- état persistant (dernière semaine exportée « 2025-W42 », échecs de la semaine en cours) --------
+    def _load_state(self):
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"last_week": None}
+
+    def _save_state(self):
+        self.state_path.write_text(json.dumps(self.state), encoding="utf-8")
+
+    # -------- jobs --------
+    def submit(self, kind="on_demand", force=False):
+        job = {"id": next(self.ids), "kind": kind, "force": bool(force), "status": "queued",
+               "queued_at": time.time()}
+        self.history.append(job)
+        self.history[:] = self.history[-100:]
+        self.queue.put(job)
+        print(f"[INFO] Job {job['id']} ({kind}) en file.")
+        return job
+
+    def _export(self, conf_pass, skip_if):
+        return self.loop.run_until_complete(self._export_async(conf_pass, skip_if))
+
+    async def _export_async(self, conf_pass, skip_if):
+        warm = await self.warm.get()
+        return await self.exporter.export_agenda_pdf_async(conf_pass, in_memory=True, skip_if=skip_if, warm=warm)
+
+    def _run(self, job):
+        job.update(status="running", started_at=time.time())
+        tracing.start(f"daemon_{job['kind']}", self.conf_pass)
+        try:
+            out = workflow.run_pipeline(self.conf_pass, self.conf_annot, force=job["force"], export=self._export)
+            job.update(status="done", output=str(out))
+            tracing.finish(ok=True)
+        except Exception as e:
+            job.update(status="failed", error=f"{type(e).__name__}: {e}")
+            tracing.finish(ok=False, error=job["error"])
+            print(f"[ERROR] Job {job['id']} en échec: {job['error']}")
+            # un navigateur dans un état douteux est relancé au prochain job
+            self.loop.run_until_complete(self.warm.close_browser())
+        job["seconds"] = round(time.time() - job["started_at"], 2)
+        if job["kind"] == "weekly":
+            if job["status"] == "done":
+                self.state["last_week"] = self._week_key()
+                self.state.pop("weekly_failures", None)
+            else:
+                self._record_failure()
+            self._save_state()
+
+    # -------- échecs de l’export hebdo : backoff exponentiel plafonné --------
+    def _week_key(self, now=None):
+        now = now or dt.datetime.now(self.annotator.TZ)
+        year, week, _ = now.date().isocalendar()
+        return f"{year}-W{week:02d}"
+
+    def _record_failure(self):
+        key = self._week_key()
+        failures = self.state.get("weekly_failures") or {}
+        count = failures.get("count", 0) + 1 if failures.get("week") == key else 1
+        self.state["weekly_failures"] = {"week": key, "count": count, "last_at": time.time()}
+        print(f"[WARN] Export hebdo {key} en échec ({count} fois) : nouvel essai dans "
+              f"{self.retry_delay_s(count) / 60:.0f} min.")
+
+    def retry_delay_s(self, count):
+        base = float(self.settings["retry_base_min"]) * 60
+        return min(base * 2 ** (count - 1), float(self.settings["retry_max_min"]) * 60)
+
+    def next_weekly_retry(self, now=None):
+        """Horodatage avant lequel l’export hebdo ne doit pas être retenté (None si pas d’échec cette semaine)."""
+        failures = self.state.get("weekly_failures") or {}
+        if failures.get("week") != self._week_key(now):
+            return None
+        return failures["last_at"] + self.retry_delay_s(failures["count"])
+
+    def worker(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    job = self.queue.get(timeout=30)
+                except queue.Empty:
+                    self.loop.run_until_complete(self.warm.close_if_idle())
+                    continue
+                self._run(job)
+            self.loop.run_until_complete(self.warm.stop())
+        finally:
+            self.loop.close()
+
+    # -------- planification hebdomadaire (Europe/Paris, semaine ISO) --------
+    def weekly_due(self, now=None):
+        now = now or dt.datetime.now(self.annotator.TZ)
+        hh, mm = (int(x) for x in str(self.settings["at"]).split(":"))
+        slot_reached = (now.isoweekday(), now.hour, now.minute) >= (int(self.settings["weekday"]), hh, mm)
+        pending = any(j["kind"] == "weekly" and j["status"] in ("queued", "running") for j in self.history)
+        retry_at = self.next_weekly_retry(now)
+        backing_off = retry_at is not None and now.timestamp() < retry_at
+        return slot_reached and self.state.get("last_week") != self._week_key(now) and not pending and not backing_off
+
+    def scheduler(self):
+        while True:
+            if self.weekly_due():
+                self.submit("weekly")
+            if self.stop_event.wait(30):
+                break
+
+    # -------- endpoint HTTP local --------
+    def http_handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                pass
+
+            def _json(self, payload, status=200):
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/status":
+                    return self._json({
+                        "browser": daemon.warm.status(),
+                        "queue": daemon.queue.qsize(),
+                        "last_week": daemon.state.get("last_week"),
+                        "weekly_failures": daemon.state.get("weekly_failures"),
+                        "jobs": daemon.history[-20:],
+                    })
+                self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                if self.path.rstrip("/") != "/jobs":
+                    return self._json({"error": "not found"}, 404)
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self._json({"error": "JSON invalide"}, 400)
+                if not isinstance(body, dict):
+                    return self._json({"error": "le corps JSON doit être un objet"}, 400)
+                self._json(daemon.submit("on_demand", force=body.get("force", False)), 202)
+
+        return Handler
+
+    def serve(self):
+        threading.Thread(target=self.worker, name="daemon-worker", daemon=True).start()
+        threading.Thread(target=self.scheduler, name="daemon-scheduler", daemon=True).start()
+        server = ThreadingHTTPServer((self.settings["host"], int(self.settings["port"])), self.http_handler())
+        print(f"[INFO] Démon prêt : http://{self.settings['host']}:{server.server_address[1]} "
+              f"(export hebdo jour {self.settings['weekday']} à {self.settings['at']})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[INFO] Arrêt demandé.")
+        finally:
+            server.server_close()
+            self.stop_event.set()
+
+def main():
+    if not workflow.CONF_PASS.exists() or not workflow.CONF_ANNOT.exists():
+        print("❌ conf.yaml / conf_annot.yaml absents : lancer d’abord main.py pour les créer.")
+        sys.exit(1)
+    with open(workflow.CONF_PASS, "r", encoding="utf-8") as f:
+        conf_pass = yaml.safe_load(f)
+    with open(workflow.CONF_ANNOT, "r", encoding="utf-8") as f:
+        conf_annot = yaml.safe_load(f)
+    Daemon(conf_pass, conf_annot).serve()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Empreintes des sorties (cache adressé par contenu).
+
+Pour chaque PDF final de ./sorties on retient :
+  - l’empreinte de l’agenda (DOM normalisé de la frame agenda, calculée par l’export),
+  - l’empreinte de la conf d’annotation (conf_annot + PNG de signature + semaine).
+Si les deux sont identiques au run précédent et que le fichier existe encore,
+l’impression et l’annotation sont inutiles.
+
+Module volontairement léger (stdlib seule) : il doit pouvoir être consulté avant
+tout import lourd.
+"""
+import hashlib, json, pathlib, time
+
+STORE_NAME = ".fingerprints.json"
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def file_digest(path):
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+def config_fingerprint(annot_cfg, week):
+    """Empreinte de tout ce qui influence l’annotation (hors contenu de l’agenda)."""
+    payload = {
+        "cfg": {k: annot_cfg[k] for k in sorted(annot_cfg) if k != "input_pdf"},
+        "signature": file_digest(annot_cfg["signature_image"]) if annot_cfg.get("signature_image") else None,
+        "week": week,
+    }
+    return sha256_text(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str))
+
+def _store_path(out_dir):
+    return pathlib.Path(out_dir) / STORE_NAME
+
+def load_store(out_dir):
+    try:
+        return json.loads(_store_path(out_dir).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def lookup(out_pdf):
+    """Empreintes enregistrées pour le PDF de sortie `out_pdf` (ou None)."""
+    out_pdf = pathlib.Path(out_pdf)
+    return load_store(out_pdf.parent).get(out_pdf.name)
+
+def record(out_pdf, **fingerprints):
+    out_pdf = pathlib.Path(out_pdf)
+    store = load_store(out_pdf.parent)
+    store[out_pdf.name] = {**fingerprints, "saved_at": time.time()}
+    path = _store_path(out_pdf.parent)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(store, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+def matches(out_pdf, **fingerprints):
+    """Vrai si `out_pdf` existe et a été produit avec exactement ces empreintes."""
+    prev = lookup(out_pdf)
+    if not prev or not pathlib.Path(out_pdf).exists():
+        return False
+    return all(prev.get(k) == v for k, v in fingerprints.items())
@@ -0,0 +1,75 @@
+"""
+Budget de démarrage du chemin « rien à faire » de main.py (semaine déjà traitée).
+
+    python import_budget.py                      # code 1 si le budget est dépassé
+    python import_budget.py --budget-ms 100 --runs 7
+
+Dans un interpréteur neuf : import de main, lecture des arguments et des deux confs YAML
+(comme main.main()) puis existing_output() sur une sortie factice déjà enregistrée. On retient le meilleur temps mur des runs (démarrage de Python compris)
+et on vérifie qu’aucun module lourd n’a été chargé en route.
+"""
+import argparse, json, pathlib, subprocess, sys, tempfile, time
+
+import fingerprints
+import weeks
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent
+HEAVY = ["playwright", "pypdf", "reportlab", "tkinter", "psutil", "PIL", "tracing"]  # tracing : tire inspect
+
+PROBE = """
+import json, sys
+sys.path.insert(0, {base!r})
+import main
+main.parse_args([])
+with open({conf_pass!r}, encoding="utf-8") as f:
+    conf_pass = main.yaml.safe_load(f)
+with open({conf_annot!r}, encoding="utf-8") as f:
+    conf_annot = main.yaml.safe_load(f)
+out = main.existing_output(conf_pass or {{}}, conf_annot)
+print(json.dumps({{"done": bool(out), "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def fake_output(tmp):
+    """Confs YAML + PDF de la semaine courante, avec son empreinte enregistrée ; renvoie (conf_pass, conf_annot)."""
+    annot = {"nom": "Budget", "prenom": "Test", "site_lettre": "B", "output_dir": str(tmp)}
+    week = weeks.iso_week_now_paris()
+    out_pdf = weeks.output_path(annot, week)
+    out_pdf.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    fingerprints.record(out_pdf, agenda=None, annot=fingerprints.config_fingerprint(annot, week))
+    conf_pass, conf_annot = tmp / "conf.yaml", tmp / "conf_annot.yaml"
+    conf_pass.write_text("pass_url: https://pass.example/\nfast_path: {enabled: true}\n", encoding="utf-8")
+    conf_annot.write_text(json.dumps(annot), encoding="utf-8")  # JSON : sous-ensemble de YAML
+    return str(conf_pass), str(conf_annot)
+
+def measure(confs, runs):
+    conf_pass, conf_annot = confs
+    code = PROBE.format(base=str(BASE_DIR), conf_pass=conf_pass, conf_annot=conf_annot, heavy=HEAVY)
+    best, probe = None, None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        elapsed = (time.perf_counter() - t0) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+        probe = json.loads(res.stdout.strip().splitlines()[-1])
+    return best, probe
+
+def main():
+    ap = argparse.ArgumentParser(description="Budget de démarrage du chemin « rien à faire »")
+    ap.add_argument("--budget-ms", type=float, default=100)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        best, probe = measure(fake_output(pathlib.Path(tmp)), args.runs)
+
+    ok = probe["done"] and not probe["heavy"] and best <= args.budget_ms
+    print(f"[INFO] Chemin « rien à faire » : {best:.0f} ms (meilleur de {args.runs}, budget {args.budget_ms:.0f} ms)")
+    if not probe["done"]:
+        print("[ERROR] La sortie factice n’a pas été reconnue comme déjà produite.")
+    if probe["heavy"]:
+        print(f"[ERROR] Modules lourds importés : {', '.join(probe['heavy'])}")
+    print("✅ Budget respecté" if ok else "❌ Budget dépassé")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
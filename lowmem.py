@@ -0,0 +1,131 @@
+"""
+Mode basse mémoire (conteneurs de 512 Mo) : un seul Chromium, arguments de lancement
+allégés, viewport réduit à l’échelle 1, onglets fermés dès qu’ils ne servent plus, et
+surveillance de la mémoire telle que la voit l’OOM killer (memstats.charged_bytes) :
+consommation du cgroup dans un conteneur limité, sinon PSS de l’arbre python + driver +
+Chromium. La RSS cumulée compterait les pages partagées par chaque processus Chromium et
+déclencherait l’abandon bien avant la vraie limite.
+
+Au-delà de rss_limit_mb, l’export en cours est annulé proprement (contexte et navigateur
+fermés, trace écrite) et RssLimitExceeded est levée, plutôt que de laisser l’OOM killer
+tuer le processus.
+
+    async with lowmem.watchdog(cfg):
+        ...                                   # export async
+
+Conf (conf.yaml) :
+    low_memory:
+      enabled: false
+      rss_limit_mb: 420        # abandon de l’export au-delà (cgroup ou PSS, cf. plus haut)
+      warn_ratio: 0.8          # avertissement (une fois) au-delà de 80 % de la limite
+      sample_ms: 250
+      viewport: {width: 1280, height: 720}
+      extra_args: []           # ajoutés aux arguments Chromium ci-dessous
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import memstats
+import tracing
+
+DEFAULTS = {
+    "enabled": False,
+    "rss_limit_mb": 420,
+    "warn_ratio": 0.8,
+    "sample_ms": 250,
+    "viewport": {"width": 1280, "height": 720},
+    "extra_args": [],
+}
+
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",          # /dev/shm minuscule dans les conteneurs
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--mute-audio",
+    "--renderer-process-limit=2",
+    "--disable-features=site-per-process,Translate,BackForwardCache,MediaRouter,OptimizationHints",
+    "--js-flags=--max-old-space-size=128",
+]
+
+class RssLimitExceeded(MemoryError):
+    pass
+
+def settings(cfg):
+    return {**DEFAULTS, **((cfg or {}).get("low_memory") or {})}
+
+def enabled(cfg):
+    return bool(settings(cfg)["enabled"])
+
+def launch_args(cfg):
+    """Arguments Chromium supplémentaires (vide hors mode basse mémoire)."""
+    st = settings(cfg)
+    return CHROMIUM_ARGS + list(st["extra_args"] or []) if st["enabled"] else []
+
+def context_options(cfg):
+    """Options de browser.new_context() (vide hors mode basse mémoire)."""
+    st = settings(cfg)
+    if not st["enabled"]:
+        return {}
+    return {"viewport": dict(st["viewport"]), "device_scale_factor": 1,
+            "reduced_motion": "reduce", "service_workers": "block"}
+
+class Watchdog(memstats.RssSampler):
+    """
+    RssSampler de memstats.charged_bytes qui journalise le franchissement du seuil d’alerte
+    et appelle on_limit() (une fois, depuis le thread d’échantillonnage) au-delà de la limite.
+    """
+    def __init__(self, limit_mb, warn_ratio=0.8, interval=0.25, on_limit=None):
+        super().__init__(interval=interval, measure=memstats.charged_bytes)
+        self.limit = float(limit_mb) * memstats.MB
+        self.warn_at = self.limit * float(warn_ratio)
+        self.on_limit = on_limit
+        self.warned = False
+        self.tripped = False
+
+    def sample(self):
+        rss = super().sample()
+        if not self.warned and rss > self.warn_at:
+            self.warned = True
+            tracing.count("lowmem.warnings")
+            print(f"[WARN] Mémoire python+navigateur {rss / memstats.MB:.0f} Mo "
+                  f"(limite {self.limit / memstats.MB:.0f} Mo).")
+        if not self.tripped and rss > self.limit:
+            self.tripped = True
+            tracing.count("lowmem.aborts")
+            print(f"[ERROR] Mémoire {rss / memstats.MB:.0f} Mo > {self.limit / memstats.MB:.0f} Mo : "
+                  f"abandon propre de l’export.")
+            if self.on_limit:
+                self.on_limit()
+        return rss
+
+@asynccontextmanager
+async def watchdog(cfg):
+    """
+    Surveille le bloc (mode basse mémoire seulement) : au-delà de la limite, la tâche courante
+    est annulée — les `finally` ferment contexte et navigateur — puis RssLimitExceeded est levée.
+    """
+    st = settings(cfg)
+    if not st["enabled"]:
+        yield None
+        return
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    wd = Watchdog(st["rss_limit_mb"], st["warn_ratio"], interval=float(st["sample_ms"]) / 1000,
+                  on_limit=lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        with wd:
+            yield wd
+    except asyncio.CancelledError:
+        if not wd.tripped:
+            raise
+        if hasattr(task, "uncancel"):  # Python ≥ 3.11 : l’annulation venait de nous
+            task.uncancel()
+        raise RssLimitExceeded(f"Pic mémoire {wd.peak_mb:.0f} Mo au-delà de low_memory.rss_limit_mb "
+                               f"({st['rss_limit_mb']} Mo).") from None
+    finally:
+        print(f"[INFO] Mode basse mémoire : pic mémoire python+navigateur = {wd.peak_mb:.0f} Mo")
@@ -1,16 +1,25 @@
-import subprocess
 import sys
+import time
 import pathlib
+import argparse
+import importlib.util
 import yaml
-import tkinter as tk
-from tkinter import simpledialog, filedialog, messagebox
+
+import fingerprints
+import weeks
 
 BASE_DIR = pathlib.Path(__file__).resolve().parent
 CONF_PASS = BASE_DIR / "conf.yaml"
 CONF_ANNOT = BASE_DIR / "conf_annot.yaml"
 
+FAST_PATH_DEFAULTS = {"enabled": True, "max_age_h": 6}
+
 def ask_user_inputs():
     """Ouvre des boîtes de dialogue Tkinter pour remplir les configs YAML."""
+    # import local : le démon et les serveurs sans affichage n’ont pas besoin de Tk
+    import tkinter as tk
+    from tkinter import simpledialog, filedialog, messagebox
+
     root = tk.Tk()
     root.withdraw()  # on cache la fenêtre principale
 
@@ -80,32 +89,195 @@ def ask_user_inputs():
         "Vos paramètres ont été sauvegardés.\nRelancez l'application pour exécuter le workflow."
     )
 
-def run_script(script, args=None):
-    """Exécute un script Python séparé avec subprocess"""
-    cmd = [sys.executable, str(script)]
-    if args:
-        cmd.extend(args)
-    print(f"[INFO] Lancement: {' '.join(map(str, cmd))}")
-    result = subprocess.run(cmd)
-    if result.returncode != 0:
-        print(f"❌ Erreur à l'exécution de {script}")
-        sys.exit(result.returncode)
+def load_module(script, name):
+    """Importe un script du projet comme module (Dev-PDF_EDT.py n’est pas importable par son nom)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, BASE_DIR / script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(name, None)  # pas de module à moitié initialisé en cache
+        raise
+    return module
+
+def load_exporter():
+    return load_module("Dev-PDF_EDT.py", "dev_pdf_edt")
+
+def load_annotator():
+    return load_module("refactor_pdf.py", "refactor_pdf")  # adapte si ton fichier a un autre nom
+
+def existing_output(conf_pass, conf_annot):
+    """
+    Sortie de la semaine si elle existe déjà avec la conf d’annotation actuelle (nom attendu
+    + empreinte enregistrée) et a été vérifiée il y a moins de fast_path.max_age_h heures ;
+    sinon None. N’importe ni Playwright, ni pypdf, ni reportlab : c’est tout le travail d’une
+    invocation planifiée quand la semaine est déjà faite.
+    """
+    opts = {**FAST_PATH_DEFAULTS, **(conf_pass.get("fast_path") or {})}
+    if not opts["enabled"]:
+        return None
+    week = weeks.iso_week_now_paris()
+    out_pdf = weeks.output_path(conf_annot, week)
+    if not fingerprints.matches(out_pdf, annot=fingerprints.config_fingerprint(conf_annot, week)):
+        return None
+    checked_at = (fingerprints.lookup(out_pdf) or {}).get("saved_at", 0)
+    if opts["max_age_h"] is not None and time.time() - checked_at > float(opts["max_age_h"]) * 3600:
+        return None  # assez ancien pour revérifier l’agenda
+    return out_pdf
+
+def run_pipeline(conf_pass, conf_annot, force=False, export=None):
+    """
+    Export + annotation dans le même processus : le PDF exporté passe en mémoire à l’annotation.
+    Si l’agenda (DOM normalisé) et la conf d’annotation n’ont pas changé depuis le dernier run,
+    l’impression et l’annotation sont sautées et la sortie existante est réutilisée (sauf force=True).
+    export(conf_pass, skip_if) remplace l’export par défaut (ex. navigateur chaud du démon).
+    conf_pass["render"] == "native" (export par défaut seulement) : pas d’impression Chromium,
+    les créneaux lus dans l’agenda sont dessinés avec la certification en un seul rendu.
+    """
+    exporter = load_exporter()
+    annotator = load_annotator()
+    week = annotator.iso_week_now_paris()
+    out_pdf = annotator.output_path(conf_annot, week)
+    annot_fp = fingerprints.config_fingerprint(conf_annot, week)
+    seen = {}
+
+    def unchanged(agenda_fp):
+        seen["agenda"] = agenda_fp
+        return not force and fingerprints.matches(out_pdf, agenda=agenda_fp, annot=annot_fp)
+
+    if export is None and conf_pass.get("render") == "native":
+        events = exporter.export_agenda_events(conf_pass, skip_if=unchanged, preload=conf_annot)
+        if events is None:
+            print(f"[INFO] Agenda et conf inchangés : sortie existante réutilisée ({out_pdf.name}).")
+            fingerprints.record(out_pdf, agenda=seen.get("agenda"), annot=annot_fp)  # date de vérification
+            return out_pdf
+        out = annotator.render_from_cfg(conf_annot, events, annotator.monday_now_paris(), week=week)
+        fingerprints.record(out, agenda=seen.get("agenda"), annot=annot_fp)
+        return out
+
+    if export is None:
+        pdf_bytes = exporter.export_agenda_pdf(conf_pass, in_memory=True, skip_if=unchanged, preload=conf_annot)
+    else:
+        pdf_bytes = export(conf_pass, unchanged)
+    if pdf_bytes is None:
+        print(f"[INFO] Agenda et conf inchangés : sortie existante réutilisée ({out_pdf.name}).")
+        fingerprints.record(out_pdf, agenda=seen.get("agenda"), annot=annot_fp)  # date de vérification
+        return out_pdf
+    out = annotator.annotate_from_cfg(conf_annot, input_pdf=pdf_bytes, week=week)
+    fingerprints.record(out, agenda=seen.get("agenda"), annot=annot_fp)
+    return out
+
+def run_weeks_pipeline(conf_pass, conf_annot, weeks_spec, concurrency=None):
+    """
+    Rattrapage de plusieurs semaines : un seul login, une impression par semaine, puis annotation
+    de chacune avec son propre numéro S et sa date (vendredi de la semaine, au plus aujourd’hui).
+    Renvoie la liste des PDF annotés et la liste des semaines en échec.
+    """
+    exporter = load_exporter()
+    annotator = load_annotator()
+    # les PDF annotés ne portent que le numéro S : 2025-W36 et 2026-W36 s’écraseraient
+    mondays = weeks.check_distinct_week_numbers(annotator.parse_weeks(weeks_spec))
+    concurrency = concurrency or conf_pass.get("week_concurrency", 3)
+    outputs, failed = [], []
+    for res in exporter.export_agenda_weeks(conf_pass, mondays, concurrency=concurrency, in_memory=True):
+        if not res["ok"]:
+            failed.append(f"{res['year']}-S{res['week']:02d}: {res['error']}")
+            continue
+        out = annotator.annotate_from_cfg(conf_annot, input_pdf=res["pdf"], week=res["week"],
+                                          date=annotator.attestation_date(res["monday"]))
+        # pas d’empreinte d’agenda ici : le prochain run normal de cette semaine réimprimera
+        fingerprints.record(out, agenda=None, annot=fingerprints.config_fingerprint(conf_annot, res["week"]))
+        outputs.append(out)
+    return outputs, failed
+
+def run_reprint_pipeline(conf_pass, conf_annot, snapshot_path):
+    """
+    Ré-impression hors ligne d’un instantané d’agenda (cf. snapshots) puis annotation pour la
+    semaine de l’instantané : ni login SSO/CAS ni requête vers PASS.
+    """
+    import snapshots  # import local : inutile au chemin « rien à faire »
+    exporter = load_exporter()
+    annotator = load_annotator()
+    snap = snapshots.load(snapshot_path)
+    pdf_bytes = exporter.reprint_snapshot(conf_pass, snapshot_path)
+    out = annotator.annotate_from_cfg(conf_annot, input_pdf=pdf_bytes, week=snap.week,
+                                      date=annotator.attestation_date(snap.monday))
+    # instantané figé : le prochain run normal de cette semaine réimprimera depuis PASS
+    fingerprints.record(out, agenda=None, annot=fingerprints.config_fingerprint(conf_annot, snap.week))
+    return out
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Workflow PASS → PDF annoté")
+    ap.add_argument("-f", "--force", action="store_true",
+                    help="ignore le cache d’empreintes et régénère le PDF même si l’agenda n’a pas changé")
+    ap.add_argument("--weeks", metavar="SEMAINES",
+                    help="rattrape plusieurs semaines ISO en un seul login, ex. 36-40 ou 2025-W50-2026-W02")
+    ap.add_argument("--reprint", metavar="INSTANTANÉ",
+                    help="ré-imprime hors ligne un instantané d’agenda (.html/.mhtml) puis l’annote")
+    return ap.parse_args(argv)
 
 def main():
+    args = parse_args()
+
     # Première utilisation : créer les configs puis STOP
     if not CONF_PASS.exists() or not CONF_ANNOT.exists():
         ask_user_inputs()
         # Arrêt immédiat après création des fichiers de config
         sys.exit(0)
 
-    # Exécutions suivantes : lancer les deux scripts
-    export_script = BASE_DIR / "Dev-PDF_EDT.py"
-    annot_script = BASE_DIR / "refactor_pdf.py"  # adapte si ton fichier a un autre nom
+    # Exécutions suivantes : export puis annotation, en mémoire
+    with open(CONF_PASS, "r", encoding="utf-8") as f:
+        conf_pass = yaml.safe_load(f)
+    with open(CONF_ANNOT, "r", encoding="utf-8") as f:
+        conf_annot = yaml.safe_load(f)
+
+    if not args.force and not args.weeks and not args.reprint:
+        done = existing_output(conf_pass, conf_annot)
+        if done:
+            print(f"✅ Semaine déjà traitée, rien à faire → {done}")
+            sys.exit(0)
+
+    import tracing  # import local : tire inspect (~15 ms), inutile au chemin « rien à faire »
+    if args.reprint:
+        tracing.start("main_reprint", conf_pass)
+        try:
+            out_pdf = run_reprint_pipeline(conf_pass, conf_annot, args.reprint)
+        except Exception as e:
+            tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+            print(f"❌ Erreur pendant la ré-impression: {e}")
+            sys.exit(1)
+        tracing.finish(ok=True)
+        print(f"✅ Ré-impression hors ligne + annotation OK → {out_pdf}")
+        sys.exit(0)
+
+    if args.weeks:
+        tracing.start("main_weeks", conf_pass)
+        try:
+            outputs, failed = run_weeks_pipeline(conf_pass, conf_annot, args.weeks)
+        except Exception as e:
+            tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+            print(f"❌ Erreur pendant le workflow: {e}")
+            sys.exit(1)
+        tracing.finish(ok=not failed)
+        for out in outputs:
+            print(f"✅ {out}")
+        for err in failed:
+            print(f"❌ {err}")
+        sys.exit(1 if failed else 0)
 
-    run_script(export_script, [str(CONF_PASS)])
-    run_script(annot_script, [str(CONF_ANNOT)])
+    tracing.start("main", conf_pass)
+    try:
+        out_pdf = run_pipeline(conf_pass, conf_annot, force=args.force)
+    except Exception as e:
+        tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+        print(f"❌ Erreur pendant le workflow: {e}")
+        sys.exit(1)
+    tracing.finish(ok=True)
 
-    print("✅ Workflow terminé : export + annotation OK")
+    print(f"✅ Workflow terminé : export + annotation OK → {out_pdf}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
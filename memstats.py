@@ -0,0 +1,182 @@
+"""
+Mesure mémoire (RSS) du processus courant et de ses descendants (driver Playwright, Chromium…).
+
+Utilise psutil s’il est installé, sinon /proc (Linux). Ailleurs, sans psutil, les mesures
+valent 0 : le workflow n’en dépend jamais.
+
+La RSS cumulée compte les pages partagées (bibliothèques, mémoire partagée entre processus
+Chromium) une fois par processus : pratique pour comparer deux runs, mais bien au-dessus de
+ce que facture l’OOM killer. Pour une limite mémoire, charged_bytes() lit la consommation du
+cgroup (conteneur limité) ou, à défaut, somme la PSS de l’arbre (pages partagées réparties).
+"""
+import functools, os, threading
+
+MB = 1024 * 1024
+CGROUP_ROOT = "/sys/fs/cgroup"
+# au-delà, memory.limit_in_bytes (cgroup v1) signifie « pas de limite »
+_V1_UNLIMITED = 1 << 60
+
+def _proc_tree_rss_linux(root_pid, measure=None):
+    page = os.sysconf("SC_PAGE_SIZE")
+    children, rss = {}, {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode("utf-8", "replace")
+            # le nom du processus peut contenir des espaces : on coupe après la dernière ')'
+            fields = stat[stat.rindex(")") + 2:].split()
+            pid, ppid = int(entry), int(fields[1])
+            rss[pid] = int(fields[21]) * page
+            children.setdefault(ppid, []).append(pid)
+        except (OSError, ValueError, IndexError):
+            continue
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        # PSS illisible (smaps_rollup absent ou refusé) : RSS, par excès
+        total += (measure(pid) if measure else None) or rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+@functools.lru_cache(maxsize=None)
+def _psutil():
+    """psutil, importé au premier relevé seulement (≈ 20 ms épargnés aux runs qui ne mesurent rien)."""
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="ascii") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _stat_field(text, key):
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") == key:
+            return int(parts[1])
+    return 0
+
+def cgroup_usage_bytes(root=CGROUP_ROOT):
+    """
+    Mémoire facturée au cgroup (conteneur) hors cache de fichiers inactif, récupérable sans OOM
+    (même calcul que le « working set » de Docker/Kubernetes). None hors conteneur limité.
+    """
+    limit = _read(f"{root}/memory.max")                                    # cgroup v2
+    if limit is not None:
+        current = _read(f"{root}/memory.current")
+        if limit.strip() == "max" or current is None:
+            return None
+        return max(0, int(current) - _stat_field(_read(f"{root}/memory.stat"), "inactive_file"))
+    limit = _read(f"{root}/memory/memory.limit_in_bytes")                  # cgroup v1
+    usage = _read(f"{root}/memory/memory.usage_in_bytes")
+    if limit is None or usage is None or int(limit) >= _V1_UNLIMITED:
+        return None
+    stat = _read(f"{root}/memory/memory.stat")
+    return max(0, int(usage) - _stat_field(stat, "total_inactive_file"))
+
+def _pss_linux(pid):
+    rollup = _read(f"/proc/{pid}/smaps_rollup")
+    return _stat_field(rollup, "Pss") * 1024 if rollup else None
+
+def tree_pss_bytes(pid=None):
+    """PSS cumulée (octets) de `pid` et de ses descendants : chaque page partagée n’est comptée qu’une fois."""
+    pid = pid or os.getpid()
+    psutil = _psutil()
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_full_info().pss
+            except (psutil.Error, AttributeError):
+                # PSS illisible (autre utilisateur, OS sans smaps) : RSS, par excès
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    pass
+        return total
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss_linux(pid, measure=_pss_linux)
+    return 0
+
+def charged_bytes(pid=None):
+    """Mémoire vue par l’OOM killer : cgroup du conteneur s’il est limité, sinon PSS de l’arbre."""
+    usage = cgroup_usage_bytes()
+    return usage if usage is not None else tree_pss_bytes(pid)
+
+def tree_rss_bytes(pid=None):
+    """RSS cumulée (octets) du processus `pid` (défaut : courant) et de tous ses descendants."""
+    pid = pid or os.getpid()
+    psutil = _psutil()
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+            total = 0
+            for p in procs:
+                try:
+                    total += p.memory_info().rss
+                except psutil.Error:
+                    pass
+            return total
+        except psutil.Error:
+            return 0
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss_linux(pid)
+    return 0
+
+class RssSampler:
+    """
+    Échantillonne en tâche de fond la RSS de l’arbre de processus (ou `measure(pid)`, ex.
+    charged_bytes) et retient le pic.
+
+        with RssSampler() as s:
+            ...
+        print(s.peak_mb)
+    """
+    def __init__(self, interval=0.2, pid=None, measure=None):
+        self.interval = interval
+        self.pid = pid
+        self.measure = measure or tree_rss_bytes
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = self.measure(self.pid)
+        self.peak = max(self.peak, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+        return False
+
+    @property
+    def peak_mb(self):
+        return self.peak / MB
+
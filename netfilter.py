@@ -0,0 +1,137 @@
+"""
+Filtrage réseau des pages Playwright (interception de routes).
+
+Deux profils :
+  - "navigation" (login SSO/CAS, frameset PASS) : on bloque images, médias, polices et traceurs ;
+  - "print" (onglet imprimé en PDF) : on ne bloque que médias et traceurs, pour que le PDF
+    reste identique (images et polices de la grille conservées).
+
+Les requêtes bloquées n’atteignent jamais le réseau : on en compte le nombre, et on suit
+les octets effectivement transférés (Content-Length des réponses) pour comparer avec
+`enabled: false`. Les ressources statiques autorisées passent par le cache disque
+(asset_cache) s’il est activé, même quand le filtrage ne l’est pas.
+
+Conf (conf.yaml) :
+    request_filter:
+      enabled: true
+      navigation:
+        block_resource_types: [image, media, font]
+      print:
+        block_resource_types: [media]
+      block_url_patterns: [google-analytics, googletagmanager, matomo, piwik, hotjar, doubleclick]
+      block_frame_names: []      # frames du frameset inutiles à l’agenda
+"""
+from collections import Counter
+
+import asset_cache
+
+DEFAULTS = {
+    "enabled": True,
+    "navigation": {"block_resource_types": ["image", "media", "font"]},
+    "print": {"block_resource_types": ["media"]},
+    "block_url_patterns": ["google-analytics", "googletagmanager", "matomo", "piwik", "hotjar", "doubleclick"],
+    "block_frame_names": [],
+}
+
+class RequestFilter:
+    def __init__(self, opts=None, assets=None):
+        opts = {**DEFAULTS, **(opts or {})}
+        self.assets = assets
+        self.enabled = bool(opts["enabled"])
+        self.types = {
+            stage: set((opts.get(stage) or {}).get("block_resource_types") or [])
+            for stage in ("navigation", "print")
+        }
+        self.patterns = [p.lower() for p in opts.get("block_url_patterns") or []]
+        self.frames = set(opts.get("block_frame_names") or [])
+        self.blocked = Counter()
+        self.allowed = 0
+        self.bytes_in = 0
+
+    # -------- décision --------
+    def reason(self, request, stage):
+        """Motif de blocage de la requête (ou None si elle passe)."""
+        if not self.enabled:
+            return None
+        url = request.url.lower()
+        for p in self.patterns:
+            if p in url:
+                return f"url:{p}"
+        if request.resource_type in self.types.get(stage, ()):
+            return f"type:{request.resource_type}"
+        if self.frames and request.is_navigation_request():
+            try:
+                if request.frame.name in self.frames:
+                    return f"frame:{request.frame.name}"
+            except Exception:
+                pass
+        return None
+
+    def handler_async(self, stage="navigation"):
+        async def handle(route):
+            why = self.reason(route.request, stage)
+            if why:
+                self.blocked[why] += 1
+                await route.abort("blockedbyclient")
+            elif self.assets and self.assets.cacheable(route.request):
+                self.allowed += 1
+                await self._serve_cached_async(route)
+            else:
+                self.allowed += 1
+                await route.continue_()
+        return handle
+
+    # -------- cache des ressources statiques --------
+    # Entrée fraîche : servie telle quelle. Périmée : requête conditionnelle, un 304 la resert.
+    # Échec réseau pendant route.fetch() : la requête repart au navigateur (route.continue_()),
+    # qui gère l’erreur comme sans cache, plutôt que de rester suspendue jusqu’au timeout.
+    async def _serve_cached_async(self, route):
+        request = route.request
+        entry = self.assets.lookup(request)
+        if entry and entry.fresh:
+            self.assets.hit(request, entry)
+            return await route.fulfill(status=200, headers=entry.headers, body=entry.body)
+        try:
+            headers = {**request.headers, **entry.validators()} if entry else None
+            response = await route.fetch(headers=headers)
+            if entry and response.status == 304:
+                self.assets.revalidated(request, entry, response.headers)
+                return await route.fulfill(status=200, headers=entry.headers, body=entry.body)
+            body = await response.body()
+        except Exception as e:
+            print(f"[WARN] Cache ressources: {request.url} non récupérée ({e}) → réseau du navigateur.")
+            return await route.continue_()
+        self.assets.miss()
+        self.assets.store(request, response.status, response.headers, body)
+        await route.fulfill(response=response, body=body)
+
+    def on_response(self, response):
+        try:
+            self.bytes_in += int(response.headers.get("content-length") or 0)
+        except ValueError:
+            pass
+
+    # -------- bilan --------
+    def report(self, tag=""):
+        total = sum(self.blocked.values())
+        bytes_in = self.bytes_in
+        if self.assets:
+            # les réponses servies depuis le cache disque déclenchent aussi "response"
+            bytes_in = max(0, bytes_in - self.assets.bytes_saved)
+        detail = ", ".join(f"{k}={v}" for k, v in self.blocked.most_common())
+        print(f"[INFO]{tag} Filtre réseau: {total} requête(s) bloquée(s), {self.allowed} autorisée(s), "
+              f"{bytes_in / 1024:.0f} Ko transférés" + (f" | {detail}" if detail else ""))
+        stats = {"blocked": total, "blocked_by_reason": dict(self.blocked),
+                 "allowed": self.allowed, "bytes_in": bytes_in}
+        if self.assets:
+            stats["asset_cache"] = self.assets.report(tag)
+        return stats
+
+def from_cfg(cfg):
+    """
+    Filtre configuré (clé 'request_filter') avec son cache de ressources (clé 'asset_cache'),
+    ou None si ni l’un ni l’autre n’est activé.
+    """
+    opts = (cfg or {}).get("request_filter") or {}
+    f = RequestFilter(opts, assets=asset_cache.from_cfg(cfg))
+    return f if f.enabled or f.assets else None
@@ -0,0 +1,241 @@
+"""
+Serveur local imitant les pages PASS / CAS / Shibboleth utilisées par Dev-PDF_EDT.py,
+pour mesurer l’export hors ligne.
+
+Parcours servi :
+  /OpDotNet/Noyau/Login.aspx   page SSO (#remoteAuth .provider) — ou frameset si session valide
+  /cas/login                   formulaire CAS (#username, #password, "Se connecter")
+  /idp/profile/SAML2/POST/SSO  consentement "Transmission de données" (_eventId_proceed)
+  /OpDotNet/Noyau/Default.aspx frameset : frames 'opentop' et 'content'
+  /opentop.html                lien "Agenda" (target=content)
+  /agenda/container.html       conteneur avec l’iframe agenda interne
+  /agenda/week.html            grille de la semaine (?date=jj/mm/aaaa), créneaux chargés en XHR
+  /agenda/slots.json           créneaux (réponse retardée)
+
+Lancement autonome :
+    python pass_stub.py --port 8765 --delay-ms 50 --xhr-delay-ms 300
+puis, dans la conf d’export :
+    pass_url: http://127.0.0.1:8765/OpDotNet/Noyau/Login.aspx
+    cas_login_url_marker: /cas/login
+    preflight_hosts: []
+"""
+import argparse, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE = "PASSSTUB"
+
+SLOTS = [
+    {"day": 0, "start": "08:00", "end": "10:00", "title": "Réseaux", "room": "B01-102"},
+    {"day": 0, "start": "10:15", "end": "12:15", "title": "Systèmes embarqués", "room": "B02-015"},
+    {"day": 1, "start": "13:30", "end": "17:00", "title": "Projet", "room": "Fablab"},
+    {"day": 3, "start": "08:00", "end": "12:15", "title": "Anglais", "room": "B03-210"},
+    {"day": 4, "start": "14:00", "end": "16:00", "title": "Gestion de projet", "room": "Amphi 1"},
+]
+
+PAGES = {
+    "login": """<!doctype html><html><head><title>PASS - Connexion</title></head><body>
+<div id="remoteAuth">
+  <a class="provider" href="/local">Compte local</a>
+  <a class="provider" href="/cas/login?service=/OpDotNet/Noyau/Default.aspx">Connexion SSO</a>
+</div></body></html>""",
+    "cas": """<!doctype html><html><head><title>CAS - Central Authentication Service</title></head><body>
+<form method="post" action="/cas/login">
+  <input id="username" name="username"><input id="password" name="password" type="password">
+  <button type="submit">Se connecter</button>
+</form></body></html>""",
+    "cas_error": """<!doctype html><html><head><title>CAS - Erreur</title></head><body>
+<p class="error">Identifiants invalides.</p></body></html>""",
+    "consent": """<!doctype html><html><head><title>Transmission de données</title></head><body>
+<form method="post" action="/idp/profile/SAML2/POST/SSO">
+  <input type="radio" name="_shib_idp_consentOptions" id="_shib_idp_doNotRememberConsent">
+  <input type="radio" name="_shib_idp_consentOptions" id="_shib_idp_rememberConsent" checked>
+  <input type="radio" name="_shib_idp_consentOptions" id="_shib_idp_globalConsent">
+  <input type="submit" name="_eventId_proceed" value="Accepter">
+</form></body></html>""",
+    "frameset": """<!doctype html><html><head><title>PASS</title></head>
+<frameset rows="60,*">
+  <frame name="opentop" src="/opentop.html">
+  <frame name="content" src="/blank.html">
+</frameset></html>""",
+    "opentop": """<!doctype html><html><body>
+<a href="/agenda/container.html" target="content"><span>Agenda</span></a>
+<a href="/notes.html" target="content"><span>Notes</span></a>
+</body></html>""",
+    "blank": "<!doctype html><html><body></body></html>",
+    "container": """<!doctype html><html><head><title>Agenda</title></head><body>
+<iframe src="/agenda/week.html" style="width:100%;height:900px;border:0"></iframe>
+</body></html>""",
+    "week": """<!doctype html><html><head><title>Agenda - Semaine</title>
+<style>table{border-collapse:collapse;width:100%}td,th{border:1px solid #999;height:28px;font:11px sans-serif}
+.slot{background:#cfe3ff}</style></head><body>
+<h3 id="week-label"></h3>
+<table id="grid"><thead><tr><th></th><th>Lundi</th><th>Mardi</th><th>Mercredi</th><th>Jeudi</th><th>Vendredi</th></tr></thead>
+<tbody id="rows"></tbody></table>
+<script>
+// ?date=jj/mm/aaaa : semaine demandée (navigation par paramètre d’URL, cf. week_navigation)
+const day = new URLSearchParams(location.search).get('date');
+const d = day ? new Date(day.split('/').reverse().join('-') + 'T12:00:00') : new Date();
+d.setDate(d.getDate() - (d.getDay() + 6) % 7);
+const pad = n => String(n).padStart(2, '0');
+document.getElementById('week-label').textContent =
+  'Semaine du ' + pad(d.getDate()) + '/' + pad(d.getMonth() + 1) + '/' + d.getFullYear();
+const rows = document.getElementById('rows');
+for (let h = 8; h < 19; h++) {
+  const tr = document.createElement('tr');
+  tr.innerHTML = '<th>' + h + 'h</th>' + '<td></td>'.repeat(5);
+  rows.appendChild(tr);
+}
+fetch('/agenda/slots.json').then(r => r.json()).then(slots => {
+  for (const s of slots) {
+    const h = parseInt(s.start, 10);
+    const td = rows.children[h - 8].children[s.day + 1];
+    td.className = 'slot';
+    td.textContent = s.start + '-' + s.end + ' ' + s.title + ' (' + s.room + ')';
+  }
+});
+</script></body></html>""",
+}
+
+class StubState:
+    """Réglages et journal des hits (horodatés) partagés entre les requêtes."""
+    def __init__(self, delay_ms=0, xhr_delay_ms=300, username=None, password=None):
+        self.delay_ms = delay_ms
+        self.xhr_delay_ms = xhr_delay_ms
+        self.username = username
+        self.password = password
+        self.hits = []
+        self.lock = threading.Lock()
+
+    def log(self, name):
+        with self.lock:
+            self.hits.append((name, time.perf_counter()))
+
+    def reset(self):
+        with self.lock:
+            self.hits = []
+
+    def first_hit(self, name):
+        with self.lock:
+            return next((t for n, t in self.hits if n == name), None)
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, body, ctype="text/html; charset=utf-8", status=200, headers=None):
+            time.sleep(state.delay_ms / 1000)
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _redirect(self, location, headers=None):
+            time.sleep(state.delay_ms / 1000)
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+
+        def _has_session(self):
+            return f"{SESSION_COOKIE}=ok" in (self.headers.get("Cookie") or "")
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/OpDotNet/Noyau/Login.aspx":
+                state.log("login")
+                return self._send(PAGES["frameset"] if self._has_session() else PAGES["login"])
+            if path == "/cas/login":
+                state.log("cas")
+                return self._send(PAGES["cas"])
+            if path == "/idp/profile/SAML2/POST/SSO":
+                state.log("consent")
+                return self._send(PAGES["consent"])
+            if path == "/OpDotNet/Noyau/Default.aspx":
+                if not self._has_session():
+                    return self._redirect("/OpDotNet/Noyau/Login.aspx")
+                state.log("frameset")
+                return self._send(PAGES["frameset"])
+            if path == "/opentop.html":
+                return self._send(PAGES["opentop"])
+            if path in ("/blank.html", "/notes.html", "/local"):
+                return self._send(PAGES["blank"])
+            if path == "/agenda/container.html":
+                state.log("agenda")
+                return self._send(PAGES["container"])
+            if path == "/agenda/week.html":
+                state.log("week")
+                return self._send(PAGES["week"])
+            if path == "/agenda/slots.json":
+                time.sleep(state.xhr_delay_ms / 1000)
+                state.log("slots")
+                return self._send(json.dumps(SLOTS), ctype="application/json")
+            self._send("not found", ctype="text/plain", status=404)
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            if path == "/cas/login":
+                state.log("cas_submit")
+                user = (form.get("username") or [""])[0]
+                pwd = (form.get("password") or [""])[0]
+                if state.username is not None and (user, pwd) != (state.username, state.password):
+                    return self._send(PAGES["cas_error"], status=401)
+                return self._redirect("/idp/profile/SAML2/POST/SSO")
+            if path == "/idp/profile/SAML2/POST/SSO":
+                state.log("consent_submit")
+                return self._redirect("/OpDotNet/Noyau/Default.aspx",
+                                      headers={"Set-Cookie": f"{SESSION_COOKIE}=ok; Path=/; HttpOnly"})
+            self._send("not found", ctype="text/plain", status=404)
+
+    return Handler
+
+def start_stub(port=0, host="127.0.0.1", **settings):
+    """Démarre le serveur dans un thread ; renvoie (serveur, état, URL de base)."""
+    state = StubState(**settings)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, name="pass-stub", daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, state, base_url
+
+def stub_export_cfg(base_url, **overrides):
+    """Conf d’export pointant sur le serveur local (à fusionner avec une conf.yaml réelle au besoin)."""
+    cfg = {
+        "pass_url": f"{base_url}/OpDotNet/Noyau/Login.aspx",
+        "username": "etudiant",
+        "password": "secret",
+        "cas_login_url_marker": "/cas/login",
+        "preflight_hosts": [],
+        "headless": True,
+        "session_cache": {"enabled": False},
+        # cherché dans la frame agenda (week.html, iframe de container.html), cf. agenda_frame
+        "readiness": {"grid_selector": "#grid td.slot"},
+        "week_navigation": {"param": "date", "label_selector": "#week-label"},
+        "events": {"event_selector": "#grid td.slot", "day_header_selector": "#grid thead th"},
+    }
+    cfg.update(overrides)
+    return cfg
+
+def main():
+    ap = argparse.ArgumentParser(description="Serveur local PASS/CAS de test")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay-ms", type=int, default=0, help="délai ajouté à chaque réponse")
+    ap.add_argument("--xhr-delay-ms", type=int, default=300, help="délai de la requête des créneaux")
+    args = ap.parse_args()
+    server, _, base_url = start_stub(args.port, delay_ms=args.delay_ms, xhr_delay_ms=args.xhr_delay_ms)
+    print(f"[INFO] Serveur PASS local: {base_url}/OpDotNet/Noyau/Login.aspx (Ctrl+C pour arrêter)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Détection de stabilité de l’agenda, pilotée par événements (remplace les tempos fixes).
+
+Un script d’init (installé sur chaque contexte) suit :
+  - les mutations DOM (horodatage de la dernière mutation),
+  - les requêtes XHR/fetch en vol.
+La page est jugée prête quand : document chargé, grille présente (si sélecteur fourni),
+aucune requête en vol et aucune mutation depuis `quiet_ms`. Borne haute : `max_ms`.
+
+Conf (conf.yaml) :
+    readiness:
+      max_ms: 8000          # borne haute d’une attente
+      quiet_ms: 400         # silence DOM/réseau exigé
+      grid_selector: null   # ex. "table.agenda" pour exiger la présence de la grille (cherché dans
+                            # la frame agenda, iframe interne de 'content', pas dans le conteneur)
+"""
+import time
+from collections import deque
+
+import retries
+
+DEFAULTS = {"max_ms": 8000, "quiet_ms": 400, "grid_selector": None}
+
+class NotStable(RuntimeError):
+    """Borne max_ms atteinte sans stabilité (attente stricte) : le DOM lu serait transitoire."""
+
+# dernières attentes (label, durée ms, stable ?) : bench_export vérifie qu’aucune n’atteint max_ms
+WAITS = deque(maxlen=50)
+
+INIT_JS = """
+(() => {
+  if (window.__rtt) return;
+  const st = window.__rtt = { inflight: 0, lastMutation: performance.now() };
+  const bump = () => { st.lastMutation = performance.now(); };
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function (...a) {
+    st.inflight++;
+    this.addEventListener('loadend', () => { st.inflight--; bump(); }, { once: true });
+    return send.apply(this, a);
+  };
+  if (window.fetch) {
+    const f = window.fetch;
+    window.fetch = function (...a) {
+      st.inflight++;
+      return f.apply(this, a).finally(() => { st.inflight--; bump(); });
+    };
+  }
+  new MutationObserver(bump).observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+})();
+"""
+
+# Si le script d’init n’a pas été injecté (page ouverte hors contexte instrumenté),
+# on l’installe à la volée : seules les mutations postérieures seront suivies.
+READY_JS = """
+({ selector, quietMs }) => {
+  if (!window.__rtt) { %s }
+  const st = window.__rtt;
+  if (document.readyState !== 'complete') return false;
+  if (selector && !document.querySelector(selector)) return false;
+  if (st.inflight > 0) return false;
+  return performance.now() - st.lastMutation >= quietMs;
+}
+""" % INIT_JS.strip().rstrip(";")
+
+def settings(cfg):
+    """Paramètres de stabilité (clé 'readiness' de la conf) complétés par les défauts."""
+    return {**DEFAULTS, **((cfg or {}).get("readiness") or {})}
+
+def _args(opts):
+    return {"selector": opts.get("grid_selector"), "quietMs": int(opts["quiet_ms"])}
+
+def _log(label, ok, t0, opts):
+    elapsed = (time.time() - t0) * 1000
+    status = "stable" if ok else "borne atteinte"
+    print(f"[INFO] Stabilité {label}: {status} en {elapsed:.0f} ms (max {opts['max_ms']} ms)")
+    WAITS.append((label, elapsed, ok))
+    return elapsed
+
+async def wait_until_stable_async(target, label="agenda", opts=None, strict=False):
+    """
+    Attend la stabilité d’une page/frame ; renvoie la durée (ms). À la borne haute, l’attente
+    rend la main (impression quand même) ou, si strict=True, lève NotStable : à réserver aux
+    lectures du DOM dont le résultat est mémorisé ou certifié (empreinte, créneaux).
+    """
+    from playwright.async_api import TimeoutError as PWTimeout
+
+    # max_ms raccourci à ce qu’il reste de l’échéance de l’étape en cours (cf. retries.stage)
+    opts = {**DEFAULTS, **(opts or {})}
+    opts["max_ms"] = retries.timeout_ms(opts["max_ms"])
+    t0 = time.time()
+    try:
+        await target.wait_for_function(READY_JS, arg=_args(opts), timeout=opts["max_ms"], polling=50)
+        ok = True
+    except PWTimeout:
+        ok = False
+    elapsed = _log(label, ok, t0, opts)
+    if strict and not ok:
+        raise NotStable(f"{label}: pas de stabilité en {opts['max_ms']} ms")
+    return elapsed
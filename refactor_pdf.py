@@ -1,27 +1,36 @@
+import io
+import os
+import re
 import sys
+import json
+import mmap
+import time
+import hashlib
 import pathlib
+import argparse
+import functools
 import datetime as dt
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import yaml
+import tracing
 
 from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject,
+                           IndirectObject, NameObject, NumberObject, StreamObject,
+                           create_string_object)
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.utils import ImageReader
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab.lib.pagesizes import A4, landscape
 
-try:
-    from zoneinfo import ZoneInfo
-    TZ = ZoneInfo("Europe/Paris")
-except Exception:
-    import pytz
-    TZ = pytz.timezone("Europe/Paris")
+from weeks import (SEMESTER_START_WEEKS, TZ, WEEK_RANGE, WEEK_TOKEN, attestation_date,
+                   check_distinct_week_numbers, dossier_path, iso_week_now_paris, monday_now_paris,
+                   output_filename, output_path, parse_weeks, semester_mondays)
 
 # ---------- utilitaires ----------
-def iso_week_now_paris():
-    today = dt.datetime.now(TZ).date()
-    return today.isocalendar().week
-
 def safe_mkdir(p: pathlib.Path):
     p.mkdir(parents=True, exist_ok=True)
 
@@ -29,26 +38,50 @@ def load_cfg(path="conf_annot.yaml"):
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)
 
-def output_filename(nom, prenom, site_lettre, week):
-    site = (site_lettre or "").strip().upper()
-    return f"{nom.strip()} {prenom.strip()} – FIPA3{site} – S{week}.pdf"
-
+@functools.lru_cache(maxsize=None)
 def register_font():
+    """Enregistre DejaVu une seule fois par processus (le parsing du TTF est coûteux)."""
     try:
         pdfmetrics.registerFont(TTFont("DejaVu", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"))
         return "DejaVu"
     except Exception:
         return "Helvetica"
 
-def make_overlay(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville,
-                 date_str, margin_bottom_mm, overlay_path,
-                 signature_path=None, signature_height_pt=14,
-                 sig_x_offset=0, sig_y_offset=0):
-    font_name = register_font()
-    c = canvas.Canvas(str(overlay_path), pagesize=(page_width_pt, page_height_pt))
+def file_mtime(path):
+    try:
+        return pathlib.Path(path).stat().st_mtime if path else None
+    except OSError:
+        return None
+
+@functools.lru_cache(maxsize=16)
+def _signature_reader(path, mtime):
+    return ImageReader(path)
+
+def signature_reader(path):
+    """ImageReader mémoïsé (le PNG n’est décodé qu’une fois, tant que le fichier ne change pas)."""
+    return _signature_reader(str(path), file_mtime(path))
+
+def preload(cfg):
+    """
+    Prépare police et signature de la conf d’annotation `cfg` dans les caches du processus
+    (appelé pendant l’export, pour que l’annotation n’ait plus que la fusion à faire).
+    """
+    register_font()
+    path = cfg.get("signature_image")
+    if path and pathlib.Path(path).exists():
+        signature_reader(path).getSize()  # force le décodage du PNG
 
+def draw_certification(c, page_width_pt, texte_certif, nom_prenom, ville, date_str,
+                       margin_bottom_mm, signature_path=None, signature_height_pt=14,
+                       sig_x_offset=0, sig_y_offset=0):
+    """
+    Dessine le bloc de certification (texte, mention « Fait à … », encadré, signature) sur le
+    canvas `c` ; renvoie l’ordonnée du haut de la zone occupée (encadré ou signature).
+    """
+    font_name = register_font()
     margin = 12 * mm
     y = float(margin_bottom_mm) * mm
+    top = y + 20
 
     # bloc texte
     c.setFont(font_name, 10)
@@ -64,7 +97,7 @@ def make_overlay(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville,
     # image signature
     if signature_path and pathlib.Path(signature_path).exists():
         try:
-            sig = ImageReader(signature_path)
+            sig = signature_reader(signature_path)
             sig_h = signature_height_pt
             sig_w = sig_h * sig.getSize()[0] / sig.getSize()[1]
             # position par défaut = à droite de l’encadré
@@ -72,66 +105,401 @@ def make_overlay(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville,
             y_pos = y - 12 + sig_y_offset
             print(f"[INFO] Insertion signature ({sig_w:.1f}x{sig_h:.1f} pt) → x={x_pos:.1f}, y={y_pos:.1f}")
             c.drawImage(sig, x_pos, y_pos, width=sig_w, height=sig_h, mask="auto")
+            top = max(top, y_pos + sig_h)
         except Exception as e:
             print(f"[WARN] Impossible d’insérer la signature: {e}")
     else:
         if signature_path:
             print(f"[WARN] Signature non trouvée: {signature_path}")
+    return top
 
+def make_overlay(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville,
+                 date_str, margin_bottom_mm, overlay_path,
+                 signature_path=None, signature_height_pt=14,
+                 sig_x_offset=0, sig_y_offset=0):
+    """overlay_path : chemin du PDF d’overlay, ou flux binaire (io.BytesIO) pour un rendu en mémoire."""
+    target = overlay_path if hasattr(overlay_path, "write") else str(overlay_path)
+    c = canvas.Canvas(target, pagesize=(page_width_pt, page_height_pt))
+    draw_certification(c, page_width_pt, texte_certif, nom_prenom, ville, date_str,
+                       margin_bottom_mm, signature_path, signature_height_pt,
+                       sig_x_offset, sig_y_offset)
     c.showPage()
     c.save()
 
+@contextmanager
+def source_stream(input_pdf):
+    """Flux de lecture du PDF source : octets en mémoire, ou fichier mappé (mmap) sans copie."""
+    if isinstance(input_pdf, (bytes, bytearray)):
+        yield io.BytesIO(input_pdf)
+        return
+    with open(input_pdf, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # fichier vide : PdfReader lèvera une erreur explicite
+            yield f
+            return
+        with mapped:
+            yield mapped
+
+@tracing.traced()
 def annotate_pdf(input_pdf, output_pdf, texte_certif, nom_prenom, ville="Brest",
                  margin_bottom_mm=18, signature_path=None,
-                 signature_height_pt=14, sig_x_offset=0, sig_y_offset=0):
-    reader = PdfReader(input_pdf)
-    writer = PdfWriter()
-    date_str = dt.datetime.now(TZ).strftime("%d/%m/%Y")
-
-    tmp_overlays = []
-    for i, page in enumerate(reader.pages):
-        # seulement la 2ᵉ page (i == 1)
-        if i == 1:
-            pw = float(page.mediabox.width)
-            ph = float(page.mediabox.height)
-            tmp_path = pathlib.Path(output_pdf).with_suffix(f".overlay.p{i}.pdf")
-            make_overlay(pw, ph, texte_certif, nom_prenom, ville, date_str,
-                         margin_bottom_mm, tmp_path,
-                         signature_path, signature_height_pt,
-                         sig_x_offset, sig_y_offset)
-            ov_reader = PdfReader(str(tmp_path))
-            page.merge_page(ov_reader.pages[0])
-            tmp_overlays.append(tmp_path)
-        writer.add_page(page)
-
-    with open(output_pdf, "wb") as f:
-        writer.write(f)
-
-    for p in tmp_overlays:
-        try:
-            p.unlink()
-        except Exception:
-            pass
+                 signature_height_pt=14, sig_x_offset=0, sig_y_offset=0, date=None,
+                 incremental=False):
+    """
+    input_pdf : chemin ou octets du PDF exporté (hand-off en mémoire depuis l’export).
+    date : date de la mention « Fait à …, le … » (défaut : aujourd’hui, Europe/Paris).
+    incremental=True : l’overlay est ajouté en mise à jour incrémentale ; les octets d’origine
+    sont recopiés tels quels et seuls la page modifiée, l’overlay et la nouvelle xref sont écrits.
+    """
+    date_str = (date or dt.datetime.now(TZ).date()).strftime("%d/%m/%Y")
 
-# ---------- main ----------
-def main():
-    cfg_path = "conf_annot.yaml" if len(sys.argv) < 2 else sys.argv[1]
-    cfg = load_cfg(cfg_path)
+    def overlay_for(pw, ph):
+        return overlay_page(pw, ph, texte_certif, nom_prenom, ville, date_str,
+                            margin_bottom_mm, signature_path, file_mtime(signature_path),
+                            signature_height_pt, sig_x_offset, sig_y_offset)
 
-    input_pdf = pathlib.Path(cfg["input_pdf"]).resolve()
-    if not input_pdf.exists():
-        print(f"❌ PDF introuvable: {input_pdf}")
-        sys.exit(1)
+    with source_stream(input_pdf) as src:
+        reader = PdfReader(src)
+        with open(output_pdf, "wb") as f:
+            if incremental and increment_supported(src, reader):
+                # seulement la 2ᵉ page
+                write_overlay_increment(src, reader, 1, overlay_for, f)
+            else:
+                if incremental:
+                    writer = PdfWriter(reader, incremental=True)
+                    if len(writer.pages) > 1:
+                        page = writer.pages[1]
+                        page.merge_page(overlay_for(float(page.mediabox.width), float(page.mediabox.height)))
+                else:
+                    writer = PdfWriter()
+                    for i, page in enumerate(reader.pages):
+                        # seulement la 2ᵉ page (i == 1)
+                        if i == 1:
+                            page.merge_page(overlay_for(float(page.mediabox.width), float(page.mediabox.height)))
+                        writer.add_page(page)
+                writer.write(f)
+            tracing.add_bytes("annotated_pdf", f.tell())
+
+# ---------- mise à jour incrémentale ----------
+# Seuls l’arbre de pages jusqu’à la page visée et les objets de l’overlay sont lus ;
+# le reste du document (flux de contenu, polices, images) n’est jamais parsé.
+OVERLAY_XOBJECT = "/RTTOverlay"
+
+def _startxref(src):
+    """Offset de la dernière table xref (mot-clé startxref en fin de fichier)."""
+    src.seek(0, 2)
+    size = src.tell()
+    src.seek(max(0, size - 2048))
+    tail = src.read()
+    m = re.search(rb"startxref\s+(\d+)\s+%%EOF\s*$", tail)
+    if not m:
+        raise ValueError("startxref introuvable")
+    return int(m.group(1)), size, tail.endswith((b"\n", b"\r"))
+
+def increment_supported(src, reader):
+    """Écriture incrémentale « maison » possible : table xref classique, document non chiffré."""
+    if reader.is_encrypted:
+        return False
+    try:
+        offset, _, _ = _startxref(src)
+    except ValueError:
+        return False
+    src.seek(offset)
+    return src.read(4) == b"xref"
+
+def _nth_page_ref(node, index):
+    """Référence de la page `index` en ne descendant que dans les branches utiles (via /Count)."""
+    for kid_ref in node["/Kids"]:
+        kid = kid_ref.get_object()
+        if kid.get("/Type") == "/Pages":
+            count = int(kid["/Count"])
+            if index < count:
+                return _nth_page_ref(kid, index)
+            index -= count
+        elif index == 0:
+            return kid_ref
+        else:
+            index -= 1
+    raise IndexError("page absente")
+
+def _inherited(page, key):
+    node = page
+    while node is not None:
+        if key in node:
+            return node[key]
+        node = node.get("/Parent")
+    return None
 
-    out_dir = pathlib.Path(cfg.get("output_dir", "./sorties")).resolve()
-    safe_mkdir(out_dir)
+def _remap(obj, mapping, pending, alloc):
+    """Copie `obj` (issu du PDF d’overlay) en renumérotant ses références vers de nouveaux objets."""
+    if isinstance(obj, IndirectObject):
+        if obj.idnum not in mapping:
+            mapping[obj.idnum] = alloc()
+            pending.append(obj)
+        return IndirectObject(mapping[obj.idnum], 0, None)
+    if isinstance(obj, StreamObject):
+        new = obj.__class__()
+        new._data = obj._data
+        for k, v in obj.items():
+            new[NameObject(k)] = _remap(v, mapping, pending, alloc)
+        return new
+    if isinstance(obj, DictionaryObject):
+        return DictionaryObject({NameObject(k): _remap(v, mapping, pending, alloc) for k, v in obj.items()})
+    if isinstance(obj, ArrayObject):
+        return ArrayObject(_remap(v, mapping, pending, alloc) for v in obj)
+    return obj
+
+def write_overlay_increment(src, reader, page_index, overlay_for, out):
+    """
+    Écrit dans `out` : les octets de `src` tels quels, puis une mise à jour incrémentale qui
+    dessine l’overlay (Form XObject) sur la page `page_index`. Sans cette page, copie seule.
+    """
+    prev_xref, size, ends_with_eol = _startxref(src)
+    src.seek(0)
+    while True:
+        block = src.read(1 << 20)
+        if not block:
+            break
+        out.write(block)
+    if not ends_with_eol:
+        out.write(b"\n")
+
+    root = reader.trailer["/Root"]
+    pages = root["/Pages"]
+    if int(pages["/Count"]) <= page_index:
+        return
+    page_ref = _nth_page_ref(pages, page_index)
+    page = page_ref.get_object()
+    box = [float(x) for x in _inherited(page, "/MediaBox")]
+    overlay = overlay_for(box[2] - box[0], box[3] - box[1])
+
+    next_num = [int(reader.trailer["/Size"])]
+    def alloc():
+        next_num[0] += 1
+        return next_num[0] - 1
+
+    objects = {}   # numéro -> objet PDF à écrire dans l’incrément
+    mapping, pending = {}, []
+    form = DecodedStreamObject()
+    form.set_data(overlay.get_contents().get_data())
+    form.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject(FloatObject(v) for v in overlay.mediabox),
+        NameObject("/Resources"): _remap(overlay.get("/Resources", DictionaryObject()).get_object(),
+                                         mapping, pending, alloc),
+    })
+    form_num = alloc()
+    objects[form_num] = form.flate_encode()
+    while pending:
+        ref = pending.pop()
+        objects[mapping[ref.idnum]] = _remap(ref.get_object(), mapping, pending, alloc)
+
+    # ressources de la page (copiées, jamais modifiées sur place : elles peuvent être partagées)
+    resources = _inherited(page, "/Resources")
+    resources = resources.get_object() if resources is not None else DictionaryObject()
+    new_res = DictionaryObject({NameObject(k): v for k, v in resources.items()})
+    xobjects = new_res.get("/XObject")
+    new_xo = DictionaryObject({NameObject(k): v for k, v in (xobjects.items() if xobjects else [])})
+    name, n = OVERLAY_XOBJECT, 1
+    while name in new_xo:  # PDF déjà annoté : un nom neuf pour ne pas remplacer l’overlay précédent
+        n += 1
+        name = f"{OVERLAY_XOBJECT}{n}"
+    new_xo[NameObject(name)] = IndirectObject(form_num, 0, None)
+    new_res[NameObject("/XObject")] = new_xo
+
+    # flux d’encadrement : contenu d’origine isolé (q … Q), puis l’overlay
+    head_num, tail_num = alloc(), alloc()
+    head, tail = DecodedStreamObject(), DecodedStreamObject()
+    head.set_data(b"q\n")
+    tail.set_data(f"\nQ\nq {name} Do Q\n".encode("ascii"))
+    objects[head_num], objects[tail_num] = head, tail
+
+    contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+    if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+        contents = contents.get_object()
+    items = list(contents) if isinstance(contents, ArrayObject) else [contents]
+
+    new_page = DictionaryObject({NameObject(k): v for k, v in page.items()})
+    new_page[NameObject("/Contents")] = ArrayObject(
+        [IndirectObject(head_num, 0, None)] + items + [IndirectObject(tail_num, 0, None)])
+    new_page[NameObject("/Resources")] = new_res
+    new_page[NameObject("/MediaBox")] = ArrayObject(FloatObject(v) for v in box)
+
+    # corps de l’incrément + xref (une sous-section par objet) + trailer chaîné (/Prev)
+    offsets = {}
+    base = size + (0 if ends_with_eol else 1)
+    body = io.BytesIO()
+    entries = [(page_ref.idnum, page_ref.generation, new_page)] + [(n, 0, o) for n, o in sorted(objects.items())]
+    for num, gen, obj in entries:
+        offsets[num] = (base + body.tell(), gen)
+        body.write(f"{num} {gen} obj\n".encode("ascii"))
+        obj.write_to_stream(body)
+        body.write(b"\nendobj\n")
+    xref_offset = base + body.tell()
+    body.write(b"xref\n0 1\n0000000000 65535 f\r\n")  # tête de liste libre : xref « indexée à 0 »
+    for num in sorted(offsets):
+        off, gen = offsets[num]
+        body.write(f"{num} 1\n{off:010d} {gen:05d} n\r\n".encode("ascii"))
+    trailer = DictionaryObject({
+        NameObject("/Size"): NumberObject(next_num[0]),
+        NameObject("/Root"): reader.trailer.raw_get("/Root"),
+        NameObject("/Prev"): NumberObject(prev_xref),
+    })
+    for key in ("/Info", "/ID"):
+        if key in reader.trailer:
+            trailer[NameObject(key)] = reader.trailer.raw_get(key)
+    body.write(b"trailer\n")
+    trailer.write_to_stream(body)
+    body.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii"))
+    out.write(body.getbuffer())
+
+def original_preserved(input_pdf, output_pdf, chunk=1 << 20):
+    """Vrai si `output_pdf` commence exactement par les octets de `input_pdf` (mise à jour incrémentale)."""
+    with source_stream(input_pdf) as src, open(output_pdf, "rb") as out:
+        h_src, h_out = hashlib.sha256(), hashlib.sha256()
+        size = 0
+        while True:
+            block = src.read(chunk)
+            if not block:
+                break
+            size += len(block)
+            h_src.update(block)
+            h_out.update(out.read(len(block)))
+        return size > 0 and h_src.digest() == h_out.digest()
+
+# ---------- optimisation de la sortie ----------
+SUBSET_PREFIX = re.compile(r"^/?[A-Z]{6}\+")
+
+def _compress_streams(writer, level=9):
+    """FlateDecode sur les flux de contenu des pages (API publique de pypdf) ; renvoie leur nombre."""
+    count = 0
+    for page in writer.pages:
+        if page.get_contents() is not None:
+            page.compress_content_streams(level=level)
+            count += 1
+    return count
+
+def _size(writer):
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.tell()
+
+def _dedupe(writer, passes=4):
+    """
+    Fusion des objets identiques, répétée tant qu’elle réduit le fichier : fusionner les
+    masques (/SMask) rend à leur tour identiques les images de signature qui les portent.
+    Renvoie la taille écrite après la dernière passe.
+    """
+    size = _size(writer)
+    for _ in range(passes):
+        writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+        smaller = _size(writer)
+        if smaller >= size:
+            break
+        size = smaller
+    return size
+
+def _fonts(resources, seen):
+    """Descripteurs de police des ressources, y compris celles des XObjects formulaires."""
+    resources = resources.get_object() if resources is not None else None
+    if not isinstance(resources, DictionaryObject):
+        return
+    for font in (resources.get("/Font") or DictionaryObject()).get_object().values():
+        font = font.get_object()
+        for desc in [font.get("/FontDescriptor")] + [f.get_object().get("/FontDescriptor")
+                                                     for f in font.get("/DescendantFonts") or []]:
+            if desc is not None:
+                yield desc.get_object()
+    for xobj in (resources.get("/XObject") or DictionaryObject()).get_object().values():
+        key = xobj.idnum if isinstance(xobj, IndirectObject) else id(xobj)
+        xobj = xobj.get_object()
+        if key in seen or xobj.get("/Subtype") != "/Form":
+            continue
+        seen.add(key)
+        yield from _fonts(xobj.get("/Resources"), seen)
+
+def _full_fonts(writer):
+    """Polices embarquées en entier (sans préfixe de sous-ensemble « ABCDEF+ »)."""
+    names, seen = set(), set()
+    for page in writer.pages:
+        for desc in _fonts(page.get("/Resources"), seen):
+            if (any(k in desc for k in ("/FontFile", "/FontFile2", "/FontFile3"))
+                    and not SUBSET_PREFIX.match(str(desc.get("/FontName", "")))):
+                names.add(str(desc.get("/FontName")))
+    return sorted(names)
+
+@tracing.traced()
+def optimize_pdf(path):
+    """
+    Réécrit `path` en plus compact : flux bruts compressés, objets identiques fusionnés (la
+    signature devient un seul XObject partagé, polices et images communes ne sont gardées
+    qu’une fois) et objets orphelins retirés. Le fichier n’est remplacé que s’il rétrécit.
+    Renvoie (octets avant, octets après).
+    """
+    path = pathlib.Path(path)
+    before = path.stat().st_size
+    try:
+        with source_stream(str(path)) as src:
+            writer = PdfWriter(clone_from=PdfReader(src))
+            streams = _compress_streams(writer)
+            _dedupe(writer)
+            buf = io.BytesIO()
+            writer.write(buf)
+        full_fonts = _full_fonts(writer)
+    except Exception as e:
+        # étape facultative : la sortie annotée reste valide, seulement non optimisée
+        print(f"[WARN] Optimisation impossible ({type(e).__name__}: {e}) : sortie gardée telle quelle.")
+        return before, before
+    for name in full_fonts:
+        print(f"[WARN] Police embarquée en entier (non sous-ensemblée) : {name}")
+    after = buf.tell()
+    if after < before:
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(buf.getbuffer())
+        os.replace(tmp, path)
+    else:
+        after = before
+    tracing.add_bytes("optimized_pdf", after)
+    print(f"[INFO] Optimisation : {before} → {after} octets "
+          f"({100 * (after - before) / before:+.1f} %, {streams} flux compressé(s))")
+    return before, after
+
+@functools.lru_cache(maxsize=64)
+def overlay_page(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville, date_str,
+                 margin_bottom_mm, signature_path, signature_mtime,
+                 signature_height_pt, sig_x_offset, sig_y_offset):
+    """
+    Page d’overlay compilée, rendue en mémoire et mise en cache pour tout le processus
+    (clé : format de page, textes, date et paramètres de signature, dont la date de modif du PNG).
+    """
+    buf = io.BytesIO()
+    make_overlay(page_width_pt, page_height_pt, texte_certif, nom_prenom, ville, date_str,
+                 margin_bottom_mm, buf, signature_path, signature_height_pt,
+                 sig_x_offset, sig_y_offset)
+    return PdfReader(io.BytesIO(buf.getvalue())).pages[0]
+
+def annotate_from_cfg(cfg, input_pdf=None, week=None, date=None):
+    """
+    Annote à partir d’un dict de conf (format conf_annot.yaml) et renvoie le chemin de sortie.
+    `input_pdf` remplace cfg["input_pdf"] : chemin, ou octets du PDF (aucun fichier intermédiaire).
+    `week` remplace la semaine ISO courante, `date` la date de signature.
+    """
+    if isinstance(input_pdf, (bytes, bytearray)):
+        source = bytes(input_pdf)
+        input_pdf = f"<mémoire: {len(source)} octets>"
+    else:
+        input_pdf = pathlib.Path(input_pdf or cfg["input_pdf"]).resolve()
+        if not input_pdf.exists():
+            raise FileNotFoundError(f"PDF introuvable: {input_pdf}")
+        source = str(input_pdf)
 
     nom = cfg["nom"]
     prenom = cfg["prenom"]
-    site_lettre = cfg.get("site_lettre", "B")
-    week = iso_week_now_paris()
-    out_name = output_filename(nom, prenom, site_lettre, week)
-    out_pdf = out_dir / out_name
+    week = week or iso_week_now_paris()
+    out_pdf = output_path(cfg, week)
+    safe_mkdir(out_pdf.parent)
 
     texte = cfg.get("texte_certif", "Certifie sur l’honneur avoir été présent(e) sur les créneaux indiqués dans le planning")
     ville = cfg.get("ville", "Brest")
@@ -140,14 +508,16 @@ def main():
     sig_h_pt = int(cfg.get("signature_height_pt", 14))
     sig_x_offset = int(cfg.get("signature_x_offset", 0))
     sig_y_offset = int(cfg.get("signature_y_offset", 0))
+    incremental = bool(cfg.get("incremental", False))
+    optimize = bool(cfg.get("optimize", True))
 
-    print(f"[INFO] Semaine ISO courante (Europe/Paris): S{week}")
+    print(f"[INFO] Semaine ISO (Europe/Paris): S{week}")
     print(f"[INFO] Entrée : {input_pdf}")
     print(f"[INFO] Sortie : {out_pdf}")
     print(f"[DEBUG] Signature path: {signature_path}, hauteur: {sig_h_pt}pt, x_offset: {sig_x_offset}, y_offset: {sig_y_offset}")
 
     annotate_pdf(
-        input_pdf=str(input_pdf),
+        input_pdf=source,
         output_pdf=str(out_pdf),
         texte_certif=texte,
         nom_prenom=f"{prenom} {nom}",
@@ -157,9 +527,537 @@ def main():
         signature_height_pt=sig_h_pt,
         sig_x_offset=sig_x_offset,
         sig_y_offset=sig_y_offset,
+        date=date,
+        incremental=incremental,
     )
+    if incremental:
+        if not original_preserved(source, out_pdf):
+            raise RuntimeError(f"Mise à jour incrémentale : l’export d’origine a été altéré ({out_pdf}).")
+        print("[INFO] Annotation incrémentale : octets de l’export d’origine intacts.")
+    elif optimize:
+        # pas en incrémental : réécrire le fichier casserait le préfixe d’origine
+        optimize_pdf(out_pdf)
+    return out_pdf
+
+# ---------- rendu natif (sans impression Chromium) ----------
+DAY_NAMES = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+SLOT_FILL = (0.81, 0.89, 1.0)  # bleu clair des créneaux de l’agenda PASS
+
+def _minutes(hhmm):
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+def _fit_lines(lines, font_name, size, width, max_lines):
+    """Lignes coupées à la largeur du créneau, tronquées au nombre de lignes disponibles."""
+    out = []
+    for line in lines:
+        out += simpleSplit(line, font_name, size, width) if line else []
+    return out[:max(0, max_lines)]
+
+@tracing.traced()
+def render_week_pdf(events, monday, output_pdf, texte_certif, nom_prenom, ville="Brest",
+                    margin_bottom_mm=18, signature_path=None, signature_height_pt=14,
+                    sig_x_offset=0, sig_y_offset=0, date=None):
+    """
+    Agenda de la semaine dessiné directement (A4 paysage) à partir des créneaux extraits
+    (cf. agenda_events), bloc de certification et signature compris : un seul rendu, ni
+    impression Chromium ni fusion d’overlay.
+    output_pdf : chemin, ou flux binaire (io.BytesIO).
+    """
+    font_name = register_font()
+    page_w, page_h = landscape(A4)
+    date_str = (date or dt.datetime.now(TZ).date()).strftime("%d/%m/%Y")
+    target = output_pdf if hasattr(output_pdf, "write") else str(output_pdf)
+    c = canvas.Canvas(target, pagesize=(page_w, page_h))
+    c.setTitle(f"Agenda S{monday.isocalendar().week:02d}")
+
+    cert_top = draw_certification(c, page_w, texte_certif, nom_prenom, ville, date_str,
+                                  margin_bottom_mm, signature_path, signature_height_pt,
+                                  sig_x_offset, sig_y_offset)
+
+    # titre
+    margin = 12 * mm
+    sunday = monday + dt.timedelta(days=6)
+    c.setFont(font_name, 13)
+    c.drawString(margin, page_h - margin - 10,
+                 f"Agenda — semaine {monday.isocalendar().week} "
+                 f"(du {monday:%d/%m/%Y} au {sunday:%d/%m/%Y})")
+
+    # grille : lundi–vendredi (+ week-end s’il y a cours), heures couvrant tous les créneaux
+    days = 7 if any(ev["day"] >= 5 for ev in events) else 5
+    first_h = min([8] + [_minutes(ev["start"]) // 60 for ev in events])
+    last_h = max([19] + [-(-_minutes(ev["end"]) // 60) for ev in events])
+    left, right = margin + 10 * mm, page_w - margin
+    top, bottom = page_h - margin - 22, cert_top + 6 * mm
+    header_h = 18
+    col_w = (right - left) / days
+    per_min = (top - header_h - bottom) / ((last_h - first_h) * 60)
+
+    def y_of(minutes):
+        return top - header_h - (minutes - first_h * 60) * per_min
+
+    c.setLineWidth(0.4)
+    c.setFont(font_name, 9)
+    for d in range(days):
+        x = left + d * col_w
+        c.rect(x, bottom, col_w, top - bottom, stroke=1, fill=0)
+        c.drawCentredString(x + col_w / 2, top - 12,
+                            f"{DAY_NAMES[d]} {monday + dt.timedelta(days=d):%d/%m}")
+    c.setFont(font_name, 7)
+    c.setStrokeGray(0.8)
+    for h in range(first_h, last_h + 1):
+        yy = y_of(h * 60)
+        c.line(left, yy, right, yy)
+        c.drawRightString(left - 3, yy - 2.5, f"{h:02d}:00")
+    c.setStrokeGray(0)
+
+    # créneaux
+    for ev in events:
+        x = left + ev["day"] * col_w + 1.5
+        y_top, y_bot = y_of(_minutes(ev["start"])), y_of(_minutes(ev["end"]))
+        c.setFillColorRGB(*SLOT_FILL)
+        c.rect(x, y_bot, col_w - 3, y_top - y_bot, stroke=1, fill=1)
+        c.setFillGray(0)
+        size = 7
+        lines = _fit_lines([f"{ev['start']}–{ev['end']}", ev["title"], ev["room"]],
+                           font_name, size, col_w - 8, int((y_top - y_bot - 3) // (size + 1.5)))
+        c.setFont(font_name, size)
+        for i, line in enumerate(lines):
+            c.drawString(x + 2.5, y_top - 2 - (i + 1) * (size + 1.5) + 1.5, line)
+
+    c.showPage()
+    c.save()
+    if not hasattr(output_pdf, "write"):
+        tracing.add_bytes("rendered_pdf", pathlib.Path(output_pdf).stat().st_size)
+
+def render_from_cfg(cfg, events, monday, week=None, date=None):
+    """
+    Équivalent de annotate_from_cfg pour le rendu natif : dessine l’agenda certifié à partir
+    des créneaux extraits. cfg["events_export"] (ex. ["json", "ics"]) écrit aussi les mêmes
+    créneaux à côté du PDF.
+    """
+    import agenda_events
+
+    if not events:
+        raise ValueError("Aucun créneau : rendu natif refusé (la certification porterait sur une semaine vide).")
+    week = week or monday.isocalendar().week
+    out_pdf = output_path(cfg, week)
+    safe_mkdir(out_pdf.parent)
+    print(f"[INFO] Semaine ISO (Europe/Paris): S{week}")
+    print(f"[INFO] Rendu natif : {len(events)} créneau(x) → {out_pdf}")
+
+    render_week_pdf(
+        events, monday, str(out_pdf),
+        texte_certif=cfg.get("texte_certif", "Certifie sur l’honneur avoir été présent(e) sur les créneaux indiqués dans le planning"),
+        nom_prenom=f"{cfg['prenom']} {cfg['nom']}",
+        ville=cfg.get("ville", "Brest"),
+        margin_bottom_mm=int(cfg.get("marge_bas_mm", 18)),
+        signature_path=cfg.get("signature_image"),
+        signature_height_pt=int(cfg.get("signature_height_pt", 14)),
+        sig_x_offset=int(cfg.get("signature_x_offset", 0)),
+        sig_y_offset=int(cfg.get("signature_y_offset", 0)),
+        date=date,
+    )
+    for fmt in cfg.get("events_export") or []:
+        path = agenda_events.write(out_pdf.with_suffix(f".{fmt.lower()}"), events, monday)
+        print(f"[INFO] Export {fmt.upper()} : {path}")
+    if cfg.get("optimize", True):
+        optimize_pdf(out_pdf)
+    return out_pdf
+
+# ---------- dossier de semestre ----------
+# Les PDF hebdomadaires sont recopiés un par un dans le dossier, objet par objet, directement
+# dans le fichier de sortie : la mémoire ne dépend que du plus gros objet et du nombre d’objets
+# (empreintes et table xref), jamais du nombre de semaines. Un objet identique à un objet déjà
+# écrit (police DejaVu, image de signature, XObject d’overlay…) n’est pas réécrit : ses
+# références pointent vers la première copie.
+PAGE_INHERITED = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+class _DossierWriter:
+    def __init__(self, out):
+        self.out = out
+        self.offsets = {}
+        self.next_num = 1
+        self.seen = {}      # empreinte du corps sérialisé -> numéro d’objet déjà écrit
+        self.deduped = 0
+        out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def alloc(self):
+        self.next_num += 1
+        return self.next_num - 1
+
+    def write(self, num, obj):
+        self.offsets[num] = self.out.tell()
+        self.out.write(f"{num} 0 obj\n".encode("ascii"))
+        obj.write_to_stream(self.out)
+        self.out.write(b"\nendobj\n")
+
+    def write_deduped(self, obj):
+        """Écrit `obj` sauf s’il est identique à un objet déjà écrit ; renvoie son numéro."""
+        body = io.BytesIO()
+        obj.write_to_stream(body)
+        key = hashlib.sha256(body.getbuffer()).digest()
+        if key in self.seen:
+            self.deduped += 1
+            return self.seen[key]
+        num = self.alloc()
+        self.offsets[num] = self.out.tell()
+        self.out.write(f"{num} 0 obj\n".encode("ascii"))
+        self.out.write(body.getbuffer())
+        self.out.write(b"\nendobj\n")
+        self.seen[key] = num
+        return num
+
+    def finish(self, root_num, info_num):
+        xref = self.out.tell()
+        self.out.write(f"xref\n0 {self.next_num}\n0000000000 65535 f\r\n".encode("ascii"))
+        for num in range(1, self.next_num):
+            self.out.write(f"{self.offsets[num]:010d} 00000 n\r\n".encode("ascii"))
+        trailer = DictionaryObject({
+            NameObject("/Size"): NumberObject(self.next_num),
+            NameObject("/Root"): IndirectObject(root_num, 0, None),
+            NameObject("/Info"): IndirectObject(info_num, 0, None),
+        })
+        self.out.write(b"trailer\n")
+        trailer.write_to_stream(self.out)
+        self.out.write(f"\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+
+class _SourceCopier:
+    """Copie des objets d’un PDF source, enfants d’abord (pour que les doublons soient repérés)."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.mapping = {}      # numéro source -> numéro de sortie
+        self.in_progress = {}  # numéros source en cours de copie -> numéro réservé (cycle) ou None
+
+    def ref(self, ref):
+        idnum = ref.idnum
+        if idnum in self.mapping:
+            return IndirectObject(self.mapping[idnum], 0, None)
+        if idnum in self.in_progress:
+            # cycle (ex. annotation → page) : numéro réservé, objet écrit sans déduplication
+            if self.in_progress[idnum] is None:
+                self.in_progress[idnum] = self.writer.alloc()
+            return IndirectObject(self.in_progress[idnum], 0, None)
+        self.in_progress[idnum] = None
+        copy = self.value(ref.get_object())
+        reserved = self.in_progress.pop(idnum)
+        if reserved is None:
+            num = self.writer.write_deduped(copy)
+        else:
+            num = reserved
+            self.writer.write(num, copy)
+        self.mapping[idnum] = num
+        return IndirectObject(num, 0, None)
+
+    def value(self, obj, skip=()):
+        if isinstance(obj, IndirectObject):
+            return self.ref(obj)
+        if isinstance(obj, StreamObject):
+            new = obj.__class__()
+            new._data = obj._data
+            for k, v in obj.items():
+                new[NameObject(k)] = self.value(v)
+            return new
+        if isinstance(obj, DictionaryObject):
+            return DictionaryObject({NameObject(k): self.value(v) for k, v in obj.items() if k not in skip})
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self.value(v) for v in obj)
+        return obj
+
+def dossier_inputs(cfg, weeks_spec=None, today=None):
+    """
+    PDF hebdomadaires de `cfg` (./sorties, suffixe S{semaine}) dans l’ordre chronologique des
+    semaines de `weeks_spec` (ex. "2025-W36-2026-W05"), ou par défaut du semestre en cours
+    (cf. weeks.semester_mondays, début réglable par `semester_start_weeks`).
+    Les noms n’ont pas d’année : un PDF écrit avant le lundi de sa semaine vient d’une autre
+    année et est écarté.
+    """
+    if weeks_spec:
+        mondays = parse_weeks(weeks_spec, today=today)
+    else:
+        mondays = semester_mondays(today, cfg.get("semester_start_weeks") or SEMESTER_START_WEEKS)
+    check_distinct_week_numbers(mondays)
+    inputs, missing, stale = [], [], []
+    for monday in mondays:
+        week = monday.isocalendar().week
+        path = output_path(cfg, week)
+        if not path.exists():
+            missing.append(week)
+            continue
+        written = dt.datetime.fromtimestamp(path.stat().st_mtime, TZ).date()
+        if written < monday:
+            stale.append(week)
+            continue
+        inputs.append((week, path))
+    if missing:
+        print(f"[WARN] Semaine(s) sans PDF dans {output_path(cfg, 0).parent}: "
+              + ", ".join(f"S{w}" for w in missing))
+    if stale:
+        print("[WARN] PDF écrit(s) avant leur semaine (autre année ?), écarté(s): "
+              + ", ".join(f"S{w}" for w in stale))
+    return inputs
+
+@tracing.traced()
+def build_dossier(inputs, output_pdf, title="Dossier de présence"):
+    """
+    Dossier unique à partir de [(semaine, chemin PDF)], dans cet ordre, avec un signet par
+    semaine. Écriture en flux (un PDF source ouvert à la fois), objets identiques partagés.
+    Renvoie un résumé (pages, semaines, objets dédupliqués, octets).
+    """
+    output_pdf = pathlib.Path(output_pdf)
+    safe_mkdir(output_pdf.parent)
+    tmp = output_pdf.with_suffix(".tmp")
+    marks, kids = [], []
+    with open(tmp, "wb") as f:
+        writer = _DossierWriter(f)
+        root_num, pages_num = writer.alloc(), writer.alloc()
+        pages_ref = IndirectObject(pages_num, 0, None)
+        for week, path in inputs:
+            with source_stream(str(path)) as src:
+                reader = PdfReader(src)
+                if reader.is_encrypted:
+                    raise ValueError(f"PDF chiffré, impossible à fusionner: {path}")
+                copier = _SourceCopier(writer)
+                first = len(kids)
+                for page in reader.pages:
+                    num = writer.alloc()
+                    if page.indirect_reference is not None:  # annotations /P → cette page
+                        copier.mapping[page.indirect_reference.idnum] = num
+                    copy = copier.value(page, skip=("/Parent",) + PAGE_INHERITED)
+                    for key in PAGE_INHERITED:
+                        value = _inherited(page, key)
+                        if value is not None:
+                            copy[NameObject(key)] = copier.value(value)
+                    copy[NameObject("/Parent")] = pages_ref
+                    writer.write(num, copy)
+                    kids.append(IndirectObject(num, 0, None))
+                if len(kids) > first:
+                    marks.append((week, kids[first]))
+            print(f"[INFO] Dossier : S{week} ajoutée ({len(kids) - first} page(s)) ← {pathlib.Path(path).name}")
+
+        writer.write(pages_num, DictionaryObject({
+            NameObject("/Type"): NameObject("/Pages"),
+            NameObject("/Kids"): ArrayObject(kids),
+            NameObject("/Count"): NumberObject(len(kids)),
+        }))
+
+        # signets : un par semaine, à plat
+        outlines_num = writer.alloc()
+        item_nums = [writer.alloc() for _ in marks]
+        for i, (week, page_ref) in enumerate(marks):
+            item = DictionaryObject({
+                NameObject("/Title"): create_string_object(f"Semaine {week}"),
+                NameObject("/Parent"): IndirectObject(outlines_num, 0, None),
+                NameObject("/Dest"): ArrayObject([page_ref, NameObject("/Fit")]),
+            })
+            if i > 0:
+                item[NameObject("/Prev")] = IndirectObject(item_nums[i - 1], 0, None)
+            if i + 1 < len(marks):
+                item[NameObject("/Next")] = IndirectObject(item_nums[i + 1], 0, None)
+            writer.write(item_nums[i], item)
+        outlines = DictionaryObject({NameObject("/Type"): NameObject("/Outlines"),
+                                     NameObject("/Count"): NumberObject(len(marks))})
+        if item_nums:
+            outlines[NameObject("/First")] = IndirectObject(item_nums[0], 0, None)
+            outlines[NameObject("/Last")] = IndirectObject(item_nums[-1], 0, None)
+        writer.write(outlines_num, outlines)
+
+        writer.write(root_num, DictionaryObject({
+            NameObject("/Type"): NameObject("/Catalog"),
+            NameObject("/Pages"): pages_ref,
+            NameObject("/Outlines"): IndirectObject(outlines_num, 0, None),
+            NameObject("/PageMode"): NameObject("/UseOutlines"),
+        }))
+        info_num = writer.alloc()
+        writer.write(info_num, DictionaryObject({NameObject("/Title"): create_string_object(title)}))
+        writer.finish(root_num, info_num)
+        size = f.tell()
+    os.replace(tmp, output_pdf)
+    tracing.add_bytes("dossier_pdf", size)
+    summary = {"output": str(output_pdf), "weeks": [w for w, _ in marks], "pages": len(kids),
+               "deduplicated_objects": writer.deduped, "bytes": size}
+    print(f"[INFO] Dossier : {len(marks)} semaine(s), {len(kids)} page(s), "
+          f"{writer.deduped} objet(s) partagé(s), {size} octets → {output_pdf}")
+    return summary
+
+def dossier_from_cfg(cfg, weeks_spec=None):
+    """Dossier de semestre de la conf d’annotation `cfg` (à côté des PDF hebdomadaires)."""
+    inputs = dossier_inputs(cfg, weeks_spec)
+    if not inputs:
+        raise FileNotFoundError(f"Aucun PDF hebdomadaire dans {output_path(cfg, 0).parent}")
+    out = dossier_path(cfg)
+    return build_dossier(inputs, out, title=f"Dossier de présence — {cfg['prenom']} {cfg['nom']}")
+
+# ---------- batch (répertoire / manifeste) ----------
+WEEK_IN_NAME = re.compile(r"(?:^|[\s_\-–])S(\d{1,2})$", re.IGNORECASE)
+
+def week_for_input(path):
+    """Semaine ISO d’un PDF : suffixe 'S{week}' du nom si présent, sinon date de modif (Europe/Paris)."""
+    p = pathlib.Path(path)
+    m = WEEK_IN_NAME.search(p.stem)
+    if m:
+        return int(m.group(1))
+    return dt.datetime.fromtimestamp(p.stat().st_mtime, TZ).date().isocalendar().week
+
+def jobs_from_dir(cfg, folder):
+    """Un job par PDF du dossier, tous annotés avec le même profil `cfg`."""
+    pdfs = sorted(pathlib.Path(folder).glob("*.pdf"))
+    return [{"input_pdf": str(p), "annot": cfg, "week": week_for_input(p)} for p in pdfs]
+
+def jobs_from_manifest(cfg, manifest_path):
+    """
+    Manifeste YAML :
+        defaults: {...}            # optionnel, fusionné au-dessus de la conf passée en argument
+        jobs:
+          - input_pdf: exports/dupont.pdf
+            profile: profils/dupont.yaml   # ou 'annot: {...}' en ligne
+            week: 12                       # optionnel (sinon déduit du fichier)
+    Une entrée sans input_pdf, nom ou prenom (après fusion) est un job en échec
+    (« job N : champ 'nom' manquant »), le reste du batch tourne.
+    """
+    manifest = load_cfg(manifest_path)
+    base_dir = pathlib.Path(manifest_path).resolve().parent
+    base = {**(cfg or {}), **(manifest.get("defaults") or {})}
+    jobs = []
+    for i, entry in enumerate(manifest.get("jobs") or []):
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError(f"job {i} : entrée invalide (mapping attendu)")
+            annot = dict(base)
+            if entry.get("profile"):
+                annot.update(load_cfg(base_dir / entry["profile"]))
+            annot.update(entry.get("annot") or {})
+            for key, value in (("input_pdf", entry.get("input_pdf")), ("nom", annot.get("nom")),
+                               ("prenom", annot.get("prenom"))):
+                if not isinstance(value, str) or not value.strip():
+                    raise ValueError(f"job {i} : champ '{key}' manquant")
+            src = pathlib.Path(entry["input_pdf"])
+            src = src if src.is_absolute() else base_dir / src
+            week = entry.get("week") or (week_for_input(src) if src.exists() else None)
+            jobs.append({"input_pdf": str(src), "annot": annot, "week": week})
+        except Exception as e:
+            # entrée invalide : échec de ce job seulement, le reste du batch tourne
+            src = entry.get("input_pdf") if isinstance(entry, dict) else None
+            jobs.append({"input_pdf": str(src or f"<job {i}>"), "annot": None, "week": None,
+                         "error": str(e) if isinstance(e, ValueError) else f"{type(e).__name__}: {e}"})
+    return jobs
+
+def _annotate_job(job):
+    """Exécuté dans un processus du pool : annote un fichier et renvoie son bilan."""
+    t0 = time.perf_counter()
+    try:
+        out = annotate_from_cfg(job["annot"], input_pdf=job["input_pdf"], week=job["week"])
+        pages = len(PdfReader(str(out)).pages)
+        return {"input": job["input_pdf"], "output": str(out), "ok": True, "pages": pages,
+                "seconds": round(time.perf_counter() - t0, 4)}
+    except Exception as e:
+        return {"input": job["input_pdf"], "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": round(time.perf_counter() - t0, 4)}
+
+def annotate_batch(jobs, workers=None):
+    """Répartit les annotations sur un pool de processus ; renvoie le résumé (débit, échecs, durées)."""
+    # Noms de sortie déterministes : deux jobs visant le même fichier sont une erreur de config
+    seen, results, todo = {}, [], []
+    for job in jobs:
+        try:
+            if job.get("error"):
+                raise ValueError(job["error"])
+            name = output_path(job["annot"], job["week"] or iso_week_now_paris())
+        except Exception as e:
+            # conf de job incomplète (nom/prénom manquants…) : ce job échoue, pas tout le batch
+            error = job.get("error") or f"{type(e).__name__}: {e}"
+            print(f"[ERROR] {job['input_pdf']}: {error}")
+            results.append({"input": job["input_pdf"], "ok": False, "seconds": 0.0, "error": error})
+            continue
+        if name in seen:
+            results.append({"input": job["input_pdf"], "ok": False, "seconds": 0.0,
+                            "error": f"sortie en collision avec {seen[name]}: {name.name}"})
+        else:
+            seen[name] = job["input_pdf"]
+            todo.append(job)
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_annotate_job, job) for job in todo]
+        for fut in as_completed(futures):
+            res = fut.result()
+            print(f"[INFO] {'OK' if res['ok'] else 'KO'} {res['seconds']:.2f}s {res.get('output') or res['error']}")
+            results.append(res)
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r["ok"]]
+    pages = sum(r["pages"] for r in ok)
+    return {
+        "files": len(results),
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "workers": workers,
+        "wall_seconds": round(wall, 3),
+        "files_per_second": round(len(ok) / wall, 2) if wall else None,
+        "pages_per_second": round(pages / wall, 2) if wall else None,
+        "results": sorted(results, key=lambda r: r["input"]),
+    }
+
+# ---------- main ----------
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Annotation + signature du PDF d’agenda")
+    ap.add_argument("config", nargs="?", default="conf_annot.yaml")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--batch-dir", metavar="DOSSIER", help="annote tous les PDF du dossier avec la conf donnée")
+    src.add_argument("--manifest", metavar="YAML", help="manifeste associant PDF et profils d’annotation")
+    src.add_argument("--dossier", nargs="?", const="", metavar="SEMAINES",
+                     help="fusionne les PDF hebdomadaires de la conf en un dossier : semestre en cours, "
+                          "ou SEMAINES ex. 2025-W36-2026-W05")
+    ap.add_argument("--workers", type=int, default=None, help="taille du pool de processus (défaut: nb de CPU)")
+    ap.add_argument("--summary-json", metavar="FICHIER", help="écrit le résumé du batch en JSON")
+    ap.add_argument("--incremental", action="store_true",
+                    help="ajoute l’overlay en mise à jour incrémentale (export d’origine recopié tel quel)")
+    return ap.parse_args(argv)
+
+def main():
+    args = parse_args()
+    # avec un manifeste, la conf de base est optionnelle (les profils peuvent tout porter)
+    cfg = {} if args.manifest and not pathlib.Path(args.config).exists() else load_cfg(args.config)
+    if args.incremental:
+        cfg["incremental"] = True
+
+    if args.dossier is not None:
+        tracing.start("dossier", cfg)
+        try:
+            summary = dossier_from_cfg(cfg, args.dossier or None)
+        except Exception as e:
+            tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+            print(f"❌ {e}")
+            sys.exit(1)
+        tracing.finish(ok=True)
+        if args.summary_json:
+            pathlib.Path(args.summary_json).write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print("✅ Terminé.")
+        return
+
+    if args.batch_dir or args.manifest:
+        jobs = jobs_from_dir(cfg, args.batch_dir) if args.batch_dir else jobs_from_manifest(cfg, args.manifest)
+        print(f"[INFO] Batch: {len(jobs)} fichier(s), workers={args.workers or 'auto'}")
+        summary = annotate_batch(jobs, workers=args.workers)
+        if args.summary_json:
+            pathlib.Path(args.summary_json).write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[INFO] {summary['ok']}/{summary['files']} OK en {summary['wall_seconds']}s "
+              f"({summary['files_per_second']} fichiers/s, {summary['pages_per_second']} pages/s)")
+        for r in summary["results"]:
+            if not r["ok"]:
+                print(f"[ERROR] {r['input']}: {r['error']}")
+        sys.exit(0 if not summary["failed"] else 1)
+
+    tracing.start("annotate", cfg)
+    try:
+        annotate_from_cfg(cfg)
+    except Exception as e:
+        tracing.finish(ok=False, error=f"{type(e).__name__}: {e}")
+        print(f"❌ {e}")
+        sys.exit(1)
+    tracing.finish(ok=True)
 
     print("✅ Terminé.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
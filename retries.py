@@ -0,0 +1,215 @@
+"""
+Politique de relance des navigations : backoff exponentiel avec jitter, échéances par étape
+et second essai « couvert » (hedged) dans un nouvel onglet quand le premier n’a
+toujours pas répondu au-delà d’un percentile de latence appris sur les runs précédents.
+
+    with retries.stage("login", cfg):       # ouvre l’échéance de l’étape (et sa politique)
+        page = await retries.goto_async(page, url)   # peut renvoyer l’onglet du second essai
+        await page.wait_for_selector(sel, timeout=retries.timeout_ms(15000))
+
+Hors stage(), les valeurs par défaut s’appliquent, sans échéance.
+
+Conf (conf.yaml) :
+    retry:
+      attempts: 3
+      base_s: 1.0               # 1er délai entre tentatives, doublé à chaque échec…
+      max_backoff_s: 8          # … plafonné, puis tiré dans [d/2, d] (jitter)
+      attempt_timeout_ms: 30000
+      deadlines_s: {pass: 60, login: 60, agenda: 45, print: 60}
+      hedge:
+        enabled: false
+        percentile: 0.9         # 2e essai si pas de réponse au-delà du p90 observé…
+        min_samples: 5          # … dès que l’historique compte assez de mesures
+        min_ms: 1000
+        history: ~/.cache/autotimetable/latency.json
+"""
+import asyncio, contextvars, json, os, pathlib, random, time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import tracing
+
+DEFAULTS = {
+    "attempts": 3,
+    "base_s": 1.0,
+    "max_backoff_s": 8.0,
+    "attempt_timeout_ms": 30000,
+    "deadlines_s": {"pass": 60, "login": 60, "agenda": 45, "print": 60},
+    "hedge": {
+        "enabled": False,
+        "percentile": 0.9,
+        "min_samples": 5,
+        "min_ms": 1000,
+        "history": "~/.cache/autotimetable/latency.json",
+    },
+}
+HISTORY_SIZE = 50
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+# étape courante : (nom, réglages, échéance time.monotonic() ou None)
+_stage = contextvars.ContextVar("retry_stage", default=(None, None, None))
+
+def settings(cfg):
+    rc = (cfg or {}).get("retry") or {}
+    return {
+        **DEFAULTS, **rc,
+        "deadlines_s": {**DEFAULTS["deadlines_s"], **(rc.get("deadlines_s") or {})},
+        "hedge": {**DEFAULTS["hedge"], **(rc.get("hedge") or {})},
+    }
+
+def current():
+    name, st, deadline = _stage.get()
+    return name, st or settings(None), deadline
+
+@contextmanager
+def stage(name, cfg):
+    """Ouvre l’étape `name` : sa politique et son échéance valent pour toutes les attentes du bloc."""
+    st = settings(cfg)
+    limit = st["deadlines_s"].get(name)
+    deadline = time.monotonic() + float(limit) if limit else None
+    outer = _stage.get()[2]
+    if outer is not None:
+        deadline = outer if deadline is None else min(deadline, outer)
+    token = _stage.set((name, st, deadline))
+    try:
+        yield st
+    finally:
+        _stage.reset(token)
+
+def remaining_s():
+    name, _, deadline = current()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded(f"Échéance de l’étape '{name}' dépassée.")
+    return left
+
+def timeout_ms(default_ms):
+    """Timeout d’une attente Playwright, raccourci à ce qu’il reste de l’échéance de l’étape."""
+    left = remaining_s()
+    return int(default_ms) if left is None else max(1, int(min(default_ms, left * 1000)))
+
+def backoff_s(attempt, st):
+    """Délai avant la tentative attempt+1 : exponentiel plafonné, jitter dans [d/2, d]."""
+    d = min(float(st["max_backoff_s"]), float(st["base_s"]) * 2 ** (attempt - 1))
+    return random.uniform(d / 2, d)
+
+def _sleep_budget(attempt, st):
+    """Délai de backoff, ou None si l’échéance ne laisse pas la place à une nouvelle tentative."""
+    delay = backoff_s(attempt, st)
+    left = remaining_s()
+    return None if left is not None and left <= delay else delay
+
+# =========================
+# Historique de latence (pour le hedge)
+# =========================
+def _history_path(st):
+    return pathlib.Path(os.path.expanduser(st["hedge"]["history"]))
+
+def _load_history(st):
+    try:
+        return json.loads(_history_path(st).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def latency_key(url):
+    name, _, _ = current()
+    return f"{name or '-'}|{urlsplit(url).netloc}"
+
+def record_latency(st, key, ms):
+    if not st["hedge"]["enabled"]:
+        return
+    data = _load_history(st)
+    data[key] = (data.get(key) or [])[-(HISTORY_SIZE - 1):] + [round(ms, 1)]
+    path = _history_path(st)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+def hedge_after_ms(st, key):
+    """Seuil de déclenchement du second essai (percentile appris), ou None si pas de hedge."""
+    h = st["hedge"]
+    if not h["enabled"]:
+        return None
+    samples = sorted(_load_history(st).get(key) or [])
+    if len(samples) < int(h["min_samples"]):
+        return None
+    idx = min(len(samples) - 1, int(float(h["percentile"]) * len(samples)))
+    return max(float(h["min_ms"]), samples[idx])
+
+# =========================
+# Navigation
+# =========================
+async def _commit_async(page, url, timeout):
+    await page.goto(url, wait_until="commit", timeout=timeout)
+    return page
+
+async def _attempt_async(page, url, st, key, hedge, tag):
+    """Une tentative ; avec hedge, 2e onglet si pas de commit au-delà du seuil. Renvoie l’onglet gagnant."""
+    t0 = time.perf_counter()
+    first = asyncio.ensure_future(_commit_async(page, url, timeout_ms(st["attempt_timeout_ms"])))
+    tasks, pages = {first}, [page]
+    threshold = hedge_after_ms(st, key) if hedge else None
+    if threshold is not None:
+        done, _ = await asyncio.wait(tasks, timeout=threshold / 1000)
+        if not done:
+            tracing.count("goto.hedged")
+            print(f"[INFO]{tag} Pas de réponse après {threshold:.0f} ms : second essai en parallèle.")
+            pages.append(await page.context.new_page())
+            tasks.add(asyncio.ensure_future(_commit_async(pages[1], url, timeout_ms(st["attempt_timeout_ms"]))))
+
+    winner, error = None, None
+    while tasks and winner is None:
+        done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            if t.exception() is None:
+                winner = winner or t.result()
+            else:
+                error = t.exception()
+    for t in tasks:
+        t.cancel()
+    for p in pages:
+        if p is not winner and p is not page:
+            await p.close()
+    if winner is None:
+        raise error
+    if winner is not page:
+        tracing.count("goto.hedge_wins")
+        await page.close()
+    record_latency(st, key, (time.perf_counter() - t0) * 1000)
+    await winner.wait_for_load_state("load", timeout=timeout_ms(st["attempt_timeout_ms"]))
+    return winner
+
+async def goto_async(page, url, tag="", hedge=True):
+    """
+    page.goto avec relances (backoff + jitter) bornées par l’échéance de l’étape courante ; renvoie
+    l’onglet qui a abouti (celui du second essai si le hedge a gagné : l’onglet d’origine est alors
+    fermé). hedge=False pour un onglet déjà routé/préparé.
+    """
+    _, st, _ = current()
+    attempts = int(st["attempts"])
+    key = latency_key(url)
+    last_err = None
+    with tracing.span("goto_with_retry", url=url, tag=tag) as sp:
+        for i in range(1, attempts + 1):
+            print(f"[INFO]{tag} Navigation tentative {i}/{attempts} -> {url}")
+            sp["attempts"] = i
+            try:
+                page = await _attempt_async(page, url, st, key, hedge, tag)
+                print(f"[INFO]{tag} Page chargée: {page.url}")
+                return page
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                last_err = e
+                tracing.count("goto.retries")
+                print(f"[WARN]{tag} Échec goto (tentative {i}): {e}")
+                delay = _sleep_budget(i, st) if i < attempts else None
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+        raise last_err
@@ -0,0 +1,102 @@
+"""
+Cache disque des sessions authentifiées (storage_state Playwright : cookies + localStorage).
+
+Un fichier par utilisateur/portail, chiffré (Fernet, clé dérivée du mot de passe PASS)
+et daté : au-delà de `ttl_hours` la session est considérée expirée et le login complet
+SSO → CAS → Shibboleth est rejoué.
+
+Conf (conf.yaml) :
+    session_cache:
+      enabled: true
+      dir: ~/.cache/autotimetable/sessions
+      ttl_hours: 8
+"""
+import base64, hashlib, json, os, pathlib, time
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:  # pas de chiffrement dispo → pas de cache (jamais de session en clair)
+    Fernet = None
+
+DEFAULT_DIR = "~/.cache/autotimetable/sessions"
+DEFAULT_TTL_HOURS = 8
+KDF_ITERATIONS = 200_000
+
+# =========================
+# Configuration
+# =========================
+def cache_settings(cfg):
+    """Renvoie (enabled, dossier, ttl_secondes) à partir de la conf d’export."""
+    sc = cfg.get("session_cache") or {}
+    enabled = bool(sc.get("enabled", True)) and Fernet is not None
+    folder = pathlib.Path(os.path.expanduser(sc.get("dir", DEFAULT_DIR)))
+    ttl = float(sc.get("ttl_hours", DEFAULT_TTL_HOURS)) * 3600
+    return enabled, folder, ttl
+
+def session_path(cfg):
+    """Fichier de session propre au couple (portail, identifiant)."""
+    _, folder, _ = cache_settings(cfg)
+    key = f"{cfg.get('pass_url', '')}|{cfg.get('username', '')}"
+    return folder / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}.session"
+
+def _fernet(password, salt):
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive((password or "").encode("utf-8"))))
+
+# =========================
+# Lecture / écriture
+# =========================
+def load_session(cfg):
+    """storage_state déchiffré si présent et non expiré, sinon None."""
+    enabled, _, ttl = cache_settings(cfg)
+    if not enabled:
+        return None
+    path = session_path(cfg)
+    if not path.exists():
+        return None
+    try:
+        blob = json.loads(path.read_text(encoding="utf-8"))
+        salt = base64.b64decode(blob["salt"])
+        payload = json.loads(_fernet(cfg.get("password"), salt).decrypt(blob["token"].encode("ascii")))
+    except (InvalidToken, ValueError, KeyError) as e:
+        print(f"[WARN] Session en cache illisible ({type(e).__name__}), ignorée.")
+        clear_session(cfg)
+        return None
+    age = time.time() - payload.get("saved_at", 0)
+    if age > ttl:
+        print(f"[INFO] Session en cache expirée ({age/3600:.1f} h > {ttl/3600:.1f} h).")
+        clear_session(cfg)
+        return None
+    print(f"[INFO] Session en cache trouvée (âge {age/60:.0f} min).")
+    return payload["storage_state"]
+
+def save_session(cfg, storage_state):
+    enabled, folder, _ = cache_settings(cfg)
+    if not enabled:
+        if Fernet is None:
+            print("[WARN] Module 'cryptography' absent : session non mise en cache.")
+        return None
+    folder.mkdir(parents=True, exist_ok=True)
+    try:
+        os.chmod(folder, 0o700)
+    except OSError:
+        pass
+    salt = os.urandom(16)
+    payload = json.dumps({"saved_at": time.time(), "storage_state": storage_state}).encode("utf-8")
+    token = _fernet(cfg.get("password"), salt).encrypt(payload)
+    path = session_path(cfg)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"v": 1, "salt": base64.b64encode(salt).decode("ascii"),
+                               "token": token.decode("ascii")}), encoding="utf-8")
+    os.chmod(tmp, 0o600)
+    os.replace(tmp, path)
+    print(f"[INFO] Session sauvegardée (chiffrée): {path}")
+    return path
+
+def clear_session(cfg):
+    try:
+        session_path(cfg).unlink()
+    except FileNotFoundError:
+        pass
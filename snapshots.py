@@ -0,0 +1,204 @@
+"""
+Instantané autonome de la frame agenda (celle que pick_inner_frame trouve), écrit au moment
+de l’impression, pour ré-imprimer le PDF plus tard (retouche de mise en page, autre taille
+@page, signature corrigée…) sans refaire SSO/CAS ni solliciter PASS.
+
+Deux formats :
+  - html  : DOM courant de la frame (grille déjà rendue), scripts et champs cachés retirés,
+            feuilles de style, images et url() CSS inlinées en data: ; rejoué sous son URL
+            d’origine (en-têtes/pieds de page.pdf() identiques) ;
+  - mhtml : archive Chromium (CDP Page.captureSnapshot), plus fidèle mais réservée à Chromium,
+            rouverte en file://.
+Les métadonnées (URL, titre, viewport, semaine, PDF d’origine) vont dans <nom>.snapshot.json.
+Emplacement : à côté du PDF exporté (agenda.pdf → agenda.html), ou dans `dir` pour un export
+en mémoire (snapshots/agenda_2025-S36.html).
+
+    await snapshots.capture_async(page, opts, pdf_path)     # pendant l’impression
+    python Dev-PDF_EDT.py --reprint snapshots/agenda_2025-S36.html
+    python main.py --reprint snapshots/agenda_2025-S36.html # ré-impression + annotation
+
+Conf (conf.yaml) :
+    snapshot:
+      enabled: false
+      format: html             # html | mhtml
+      dir: ./snapshots         # exports en mémoire (main.py, démon)
+      pdf_options: {}          # surcharges de page.pdf() à la ré-impression (ex. format: A3)
+      extra_css: ""            # CSS ajouté à la ré-impression (ex. "@page { size: A3 landscape; }")
+"""
+import datetime as dt
+import json, pathlib, time
+from types import SimpleNamespace
+from urllib.parse import urldefrag
+
+import tracing
+import weeks
+
+DEFAULTS = {
+    "enabled": False,
+    "format": "html",
+    "dir": "./snapshots",
+    "pdf_options": {},
+    "extra_css": "",
+}
+SUFFIXES = {"html": ".html", "mhtml": ".mhtml"}
+
+# DOM courant + ressources inlinées (fetch depuis la page : mêmes cookies, mêmes routes)
+INLINE_HTML_JS = """
+async () => {
+  const toData = async (url) => {
+    try {
+      const r = await fetch(url, { credentials: 'include' });
+      if (!r.ok) return null;
+      const blob = await r.blob();
+      return await new Promise(res => {
+        const fr = new FileReader();
+        fr.onload = () => res(fr.result);
+        fr.onerror = () => res(null);
+        fr.readAsDataURL(blob);
+      });
+    } catch (e) { return null; }
+  };
+  const inlineUrls = async (css, base) => {
+    let out = css;
+    for (const m of [...css.matchAll(/url\\(\\s*(['"]?)([^'")]+)\\1\\s*\\)/g)]) {
+      if (m[2].startsWith('data:')) continue;
+      const data = await toData(new URL(m[2], base).href);
+      if (data) out = out.split(m[0]).join(`url("${data}")`);
+    }
+    return out;
+  };
+  let css = '';
+  for (const sheet of Array.from(document.styleSheets)) {
+    let rules;
+    try { rules = Array.from(sheet.cssRules).map(r => r.cssText).join('\\n'); } catch (e) { continue; }
+    css += await inlineUrls(rules, sheet.href || document.baseURI) + '\\n';
+  }
+  const root = document.documentElement.cloneNode(true);
+  root.querySelectorAll('script, noscript, style, link[rel~=stylesheet], link[rel~=preload], base, input[type=hidden]')
+      .forEach(n => n.remove());
+  for (const img of root.querySelectorAll('img[src]')) {
+    const data = await toData(new URL(img.getAttribute('src'), document.baseURI).href);
+    if (data) img.setAttribute('src', data);
+    img.removeAttribute('srcset');
+  }
+  for (const el of root.querySelectorAll('[style]')) {
+    el.setAttribute('style', await inlineUrls(el.getAttribute('style'), document.baseURI));
+  }
+  let head = root.querySelector('head');
+  if (!head) head = root.insertBefore(document.createElement('head'), root.firstChild);
+  const style = document.createElement('style');
+  style.textContent = css;
+  head.appendChild(style);
+  return '<!DOCTYPE html>\\n' + root.outerHTML;
+}
+"""
+
+def settings(cfg):
+    return {**DEFAULTS, **((cfg or {}).get("snapshot") or {})}
+
+def enabled(opts):
+    return bool(opts and opts.get("enabled"))
+
+def path_for(opts, pdf_path=None, monday=None):
+    """agenda.pdf → agenda.html ; export en mémoire → <dir>/agenda_2025-S36.html (semaine de `monday`)."""
+    suffix = SUFFIXES.get(opts["format"], ".html")
+    if pdf_path:
+        return pathlib.Path(pdf_path).with_suffix(suffix)
+    year, week, _ = (monday or weeks.monday_now_paris()).isocalendar()
+    return pathlib.Path(opts["dir"]) / f"agenda_{year}-S{week:02d}{suffix}"
+
+def meta_path(snapshot_path):
+    snapshot_path = pathlib.Path(snapshot_path)
+    return snapshot_path.with_name(f"{snapshot_path.stem}.snapshot.json")
+
+def _write(path, body, meta):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(body, encoding="utf-8")
+    tmp.replace(path)
+    meta_path(path).write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+    tracing.add_bytes("snapshot", len(body.encode("utf-8")))
+
+def _meta(url, title, viewport, fmt, pdf_path, monday):
+    year, week, _ = monday.isocalendar()
+    return {"url": url, "title": title, "viewport": viewport, "format": fmt,
+            "pdf": str(pathlib.Path(pdf_path).resolve()) if pdf_path else None,
+            "monday": monday.isoformat(), "year": year, "week": week,
+            "captured_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+def _format(page, opts, tag):
+    fmt = opts["format"]
+    browser = page.context.browser
+    if fmt == "mhtml" and browser and browser.browser_type.name != "chromium":
+        print(f"[WARN]{tag} Instantané MHTML réservé à Chromium → HTML.")
+        return "html"
+    return fmt if fmt in SUFFIXES else "html"
+
+async def capture_async(page, opts, pdf_path=None, monday=None, tag=""):
+    """
+    Écrit l’instantané de `page` (agenda prêt à imprimer) si opts['enabled'] ; renvoie son
+    chemin, ou None. Un échec n’interrompt pas l’export (avertissement seulement).
+    """
+    if not enabled(opts):
+        return None
+    monday = monday or weeks.monday_now_paris()
+    try:
+        with tracing.span("snapshot"):
+            fmt = _format(page, opts, tag)
+            path = path_for({**opts, "format": fmt}, pdf_path, monday)
+            if fmt == "mhtml":
+                cdp = await page.context.new_cdp_session(page)
+                body = (await cdp.send("Page.captureSnapshot", {"format": "mhtml"}))["data"]
+                await cdp.detach()
+            else:
+                body = await page.evaluate(INLINE_HTML_JS)
+            _write(path, body, _meta(page.url, await page.title(), page.viewport_size, fmt, pdf_path, monday))
+    except Exception as e:
+        print(f"[WARN]{tag} Instantané de l’agenda non écrit: {e}")
+        return None
+    print(f"[INFO]{tag} Instantané agenda ({fmt}): {path}")
+    return path
+
+def load(snapshot_path):
+    """
+    Instantané + métadonnées : namespace (path, body, url, format, viewport, monday, week, pdf).
+    `pdf` : PDF d’origine, ou <instantané>.pdf pour un export fait en mémoire.
+    """
+    path = pathlib.Path(snapshot_path).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"Instantané introuvable: {path}")
+    try:
+        meta = json.loads(meta_path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Métadonnées d’instantané introuvables: {meta_path(path)}") from None
+    return SimpleNamespace(
+        path=path,
+        body=path.read_text(encoding="utf-8"),
+        url=meta["url"],
+        format=meta.get("format") or ("mhtml" if path.suffix == ".mhtml" else "html"),
+        viewport=meta.get("viewport"),
+        monday=dt.date.fromisoformat(meta["monday"]),
+        week=meta["week"],
+        pdf=meta.get("pdf") or str(path.with_suffix(".pdf")),
+    )
+
+def offline_handler_async(snap):
+    """
+    Route Playwright de la ré-impression : sert l’instantané HTML sous son URL d’origine,
+    laisse passer data:/blob: et bloque tout le reste (aucune requête vers PASS).
+    Le nombre de requêtes bloquées est dans handler.blocked[0].
+    """
+    url = urldefrag(snap.url).url
+    blocked = [0]
+
+    async def handle(route):
+        request = route.request
+        if snap.format == "html" and request.resource_type == "document" and urldefrag(request.url).url == url:
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=snap.body)
+        elif request.url.startswith(("data:", "blob:")):
+            await route.continue_()
+        else:
+            blocked[0] += 1
+            await route.abort("internetdisconnected")
+    handle.blocked = blocked
+    return handle
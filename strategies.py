@@ -0,0 +1,64 @@
+"""
+Mémoire des stratégies de navigation qui ont fonctionné, par portail (URL PASS sans requête).
+
+Au run suivant, la stratégie retenue est essayée en premier ; si elle échoue, la chaîne
+complète reprend dans l’ordre habituel et la nouvelle gagnante remplace l’ancienne.
+
+    strategies.first(cfg, "agenda", ["role_link", "ancestor_a", "js_click"])
+    strategies.remember(cfg, "agenda", "ancestor_a")
+
+Conf (conf.yaml) :
+    strategy_cache:
+      enabled: true
+      path: ~/.cache/autotimetable/strategies.json
+"""
+import json, os, pathlib
+from urllib.parse import urlsplit
+
+DEFAULT_PATH = "~/.cache/autotimetable/strategies.json"
+
+def settings(cfg):
+    """Renvoie (enabled, chemin du fichier) ; sans conf (cfg None), rien n’est mémorisé."""
+    if cfg is None:
+        return False, None
+    sc = cfg.get("strategy_cache") or {}
+    return bool(sc.get("enabled", True)), pathlib.Path(os.path.expanduser(sc.get("path", DEFAULT_PATH)))
+
+def portal_key(url):
+    parts = urlsplit(url or "")
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+def _load(path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def lookup(cfg, step):
+    """Choix mémorisé pour l’étape `step` de ce portail (ou None)."""
+    enabled, path = settings(cfg)
+    if not enabled:
+        return None
+    return (_load(path).get(portal_key(cfg.get("pass_url"))) or {}).get(step)
+
+def first(cfg, step, chain):
+    """`chain` réordonnée : stratégie mémorisée d’abord (si elle fait toujours partie de la chaîne)."""
+    cached = lookup(cfg, step)
+    if cached in chain:
+        return [cached] + [name for name in chain if name != cached]
+    return list(chain)
+
+def remember(cfg, step, value):
+    """Mémorise le choix gagnant (écriture atomique, seulement s’il a changé)."""
+    enabled, path = settings(cfg)
+    if not enabled:
+        return
+    data = _load(path)
+    portal = data.setdefault(portal_key(cfg.get("pass_url")), {})
+    if portal.get(step) == value:
+        return
+    portal[step] = value
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,194 @@
+"""
+Instrumentation légère par spans (durées, tentatives, octets écrits, pic RSS).
+
+    tracing.start("main", cfg)              # ouvre la trace du run
+    with tracing.span("cas_login"):         # ou @tracing.traced("cas_login")
+        ...
+    tracing.count("goto.retries")
+    tracing.add_bytes("pdf", 123456)
+    tracing.finish(ok=True)                 # écrit la trace JSON (+ textfile Prometheus)
+
+Sans trace ouverte, span()/count()/add_bytes() ne font rien : les fonctions instrumentées
+restent utilisables telles quelles depuis n’importe quel script.
+
+Conf :
+    tracing:
+      dir: ./traces                         # une trace JSON par run (null pour désactiver)
+      prometheus_textfile: null             # ex. /var/lib/node_exporter/textfile/autotimetable.prom
+"""
+import contextvars, functools, inspect, json, os, pathlib, time
+from collections import Counter
+from contextlib import contextmanager
+
+import memstats
+
+_current = None
+_parent = contextvars.ContextVar("tracing_parent", default=None)
+
+class Trace:
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.counters = Counter()
+        self.bytes = Counter()
+        self.rss = memstats.RssSampler(interval=0.25).__enter__()
+
+    def add_span(self, record):
+        self.spans.append(record)
+
+    def to_dict(self, ok, error=None):
+        return {
+            "run": self.name,
+            "started_at": self.started,
+            "duration_s": round(time.perf_counter() - self.t0, 4),
+            "ok": ok,
+            "error": error,
+            "peak_rss_mb": round(self.rss.peak_mb, 1),
+            "counters": dict(self.counters),
+            "bytes_written": dict(self.bytes),
+            "spans": self.spans,
+        }
+
+# =========================
+# API
+# =========================
+def settings_from_cfg(cfg):
+    return {"dir": "./traces", "prometheus_textfile": None, **((cfg or {}).get("tracing") or {})}
+
+def start(name, cfg=None):
+    """Ouvre la trace du run (une seule à la fois ; un 2e start() réutilise la trace ouverte)."""
+    global _current
+    if _current is None:
+        _current = Trace(name, settings_from_cfg(cfg))
+    return _current
+
+def current():
+    return _current
+
+@contextmanager
+def span(name, **attrs):
+    trace = _current
+    if trace is None:
+        yield {}
+        return
+    record = {"name": name, "parent": _parent.get(), "start_s": round(time.perf_counter() - trace.t0, 4),
+              "attrs": attrs, "ok": True}
+    token = _parent.set(name)
+    t = time.perf_counter()
+    try:
+        yield record["attrs"]
+    except BaseException as e:
+        record["ok"] = False
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_s"] = round(time.perf_counter() - t, 4)
+        _parent.reset(token)
+        trace.add_span(record)
+
+def traced(name=None):
+    """Décorateur : enveloppe une fonction (sync ou async) dans un span."""
+    def deco(fn):
+        label = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper_async(*a, **kw):
+                with span(label):
+                    return await fn(*a, **kw)
+            return wrapper_async
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            with span(label):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+def count(key, n=1):
+    if _current is not None:
+        _current.counters[key] += n
+
+def add_bytes(key, n):
+    if _current is not None:
+        _current.bytes[key] += int(n or 0)
+
+def finish(ok=True, error=None):
+    """Ferme la trace, écrit le JSON du run et, si configuré, le textfile Prometheus."""
+    global _current
+    trace = _current
+    if trace is None:
+        return None
+    _current = None
+    trace.rss.__exit__(None, None, None)
+    data = trace.to_dict(ok, error)
+
+    out_dir = trace.settings.get("dir")
+    path = None
+    if out_dir:
+        folder = pathlib.Path(out_dir)
+        folder.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(trace.started))
+        # ms + pid : deux runs dans la même seconde (batch, démon + CLI) ne s’écrasent pas
+        stamp += f".{int(trace.started * 1000) % 1000:03d}-{os.getpid()}"
+        path = folder / f"{trace.name}-{stamp}.json"
+        n = 1
+        while path.exists():
+            path, n = folder / f"{trace.name}-{stamp}-{n}.json", n + 1
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"[INFO] Trace écrite: {path} ({data['duration_s']:.2f} s, pic RSS {data['peak_rss_mb']} Mo)")
+    if trace.settings.get("prometheus_textfile"):
+        write_prometheus(trace.settings["prometheus_textfile"], data)
+    return path
+
+# =========================
+# Export Prometheus (node_exporter textfile collector)
+# =========================
+def write_prometheus(path, data):
+    """
+    Jauges du dernier run + compteurs cumulés (runs / échecs), persistés dans un .state
+    à côté du textfile pour survivre aux exécutions successives.
+    """
+    path = pathlib.Path(path)
+    state_path = path.with_suffix(".state.json")
+    try:
+        totals = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        totals = {"runs": 0, "failures": 0}
+    totals["runs"] += 1
+    totals["failures"] += 0 if data["ok"] else 1
+
+    run = data["run"]
+    lines = [
+        "# HELP autotimetable_run_duration_seconds Durée du dernier run.",
+        "# TYPE autotimetable_run_duration_seconds gauge",
+        f'autotimetable_run_duration_seconds{{run="{run}"}} {data["duration_s"]}',
+        "# HELP autotimetable_run_success 1 si le dernier run a réussi.",
+        "# TYPE autotimetable_run_success gauge",
+        f'autotimetable_run_success{{run="{run}"}} {1 if data["ok"] else 0}',
+        "# HELP autotimetable_peak_rss_bytes Pic RSS (python + navigateurs) du dernier run.",
+        "# TYPE autotimetable_peak_rss_bytes gauge",
+        f'autotimetable_peak_rss_bytes{{run="{run}"}} {int(data["peak_rss_mb"] * memstats.MB)}',
+        "# HELP autotimetable_stage_duration_seconds Durée cumulée par étape (dernier run).",
+        "# TYPE autotimetable_stage_duration_seconds gauge",
+    ]
+    per_stage = Counter()
+    for s in data["spans"]:
+        per_stage[s["name"]] += s["duration_s"]
+    for stage, secs in sorted(per_stage.items()):
+        lines.append(f'autotimetable_stage_duration_seconds{{run="{run}",stage="{stage}"}} {round(secs, 4)}')
+    lines += [
+        "# HELP autotimetable_runs_total Nombre de runs.",
+        "# TYPE autotimetable_runs_total counter",
+        f'autotimetable_runs_total{{run="{run}"}} {totals["runs"]}',
+        "# HELP autotimetable_failures_total Nombre de runs en échec.",
+        "# TYPE autotimetable_failures_total counter",
+        f'autotimetable_failures_total{{run="{run}"}} {totals["failures"]}',
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+    state_path.write_text(json.dumps(totals), encoding="utf-8")
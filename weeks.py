@@ -0,0 +1,128 @@
+"""
+Semaines ISO (Europe/Paris) et nom des PDF de sortie par semaine.
+
+Module volontairement léger (stdlib seule) : main.py s’en sert pour savoir si la sortie
+de la semaine existe déjà, avant tout import de pypdf, reportlab ou Playwright.
+"""
+import datetime as dt
+import pathlib, re
+
+try:
+    from zoneinfo import ZoneInfo
+    TZ = ZoneInfo("Europe/Paris")
+except Exception:
+    import pytz
+    TZ = pytz.timezone("Europe/Paris")
+
+def iso_week_now_paris():
+    today = dt.datetime.now(TZ).date()
+    return today.isocalendar().week
+
+def monday_now_paris():
+    today = dt.datetime.now(TZ).date()
+    return today - dt.timedelta(days=today.weekday())
+
+WEEK_TOKEN = r"(?:\d{4}-?W)?\d{1,2}"
+WEEK_RANGE = re.compile(rf"({WEEK_TOKEN})(?:-({WEEK_TOKEN}))?", re.IGNORECASE)
+
+def parse_weeks(spec, today=None):
+    """
+    Semaines ISO demandées, sous forme de lundis (dt.date) triés et sans doublon.
+    spec : "36", "36-40", "36,38,40", "2025-W50-2026-W02" (année omise = année ISO courante).
+    """
+    today = today or dt.datetime.now(TZ).date()
+    year_now = today.isocalendar().year
+
+    def monday(token):
+        year, _, week = token.upper().rpartition("W")
+        return dt.date.fromisocalendar(int(year.rstrip("-") or year_now), int(week), 1)
+
+    mondays = set()
+    for part in str(spec).split(","):
+        m = WEEK_RANGE.fullmatch(part.strip())
+        if not m:
+            raise ValueError(f"Semaine invalide: {part!r} (attendu: 36, 36-40 ou 2025-W50-2026-W02)")
+        start = monday(m.group(1))
+        end = monday(m.group(2) or m.group(1))
+        if end < start:
+            raise ValueError(f"Plage de semaines inversée: {part!r}")
+        while start <= end:
+            mondays.add(start)
+            start += dt.timedelta(weeks=1)
+    return sorted(mondays)
+
+def check_distinct_week_numbers(mondays):
+    """
+    Les noms de sortie ne portent que le numéro de semaine (S36) : deux semaines de même numéro
+    (ex. 2025-W36 et 2026-W36) s’écraseraient. Lève ValueError dans ce cas.
+    """
+    seen = {}
+    for m in mondays:
+        year, week, _ = m.isocalendar()
+        if week in seen:
+            raise ValueError(f"S{week} demandée deux fois ({seen[week]}-W{week:02d} et {year}-W{week:02d}) : "
+                             f"les noms de sortie n’ont pas d’année, réduire la plage à moins d’un an.")
+        seen[week] = year
+    return mondays
+
+SHOWN_DATE = re.compile(r"\b(\d{1,2})[/.](\d{1,2})(?:[/.](\d{4}|\d{2}))?\b")
+
+def dates_shown(text, monday):
+    """
+    Dates jj/mm[/aaaa] lues dans `text` (ex. en-tête de l’agenda). Année omise : celle de la
+    semaine de `monday` (lundi de décembre, dimanche de janvier compris). Dates impossibles ignorées.
+    """
+    sunday = monday + dt.timedelta(days=6)
+    years = sorted({monday.year, sunday.year})
+    found = []
+    for d, m, y in SHOWN_DATE.findall(text or ""):
+        candidates = []
+        for year in ([int(y) + (2000 if len(y) == 2 else 0)] if y else years):
+            try:
+                candidates.append(dt.date(year, int(m), int(d)))
+            except ValueError:
+                continue
+        if candidates:
+            found.append(next((c for c in candidates if monday <= c <= sunday), candidates[0]))
+    return found
+
+def shows_week(text, monday):
+    """Vrai si `text` porte au moins une date et que toutes tombent dans la semaine de `monday`."""
+    dates = dates_shown(text, monday)
+    return bool(dates) and all(monday <= d <= monday + dt.timedelta(days=6) for d in dates)
+
+SEMESTER_START_WEEKS = (35, 6)  # rentrée fin août ; second semestre début février
+
+def semester_mondays(today=None, start_weeks=SEMESTER_START_WEEKS):
+    """Lundis du semestre en cours, de sa première semaine jusqu’à la semaine courante incluse."""
+    today = today or dt.datetime.now(TZ).date()
+    monday = today - dt.timedelta(days=today.weekday())
+    starts = {int(w) for w in start_weeks}
+    first = monday
+    for _ in range(53):
+        if first.isocalendar().week in starts:
+            break
+        first -= dt.timedelta(weeks=1)
+    else:
+        raise ValueError(f"Semaines de début de semestre invalides: {sorted(starts)}")
+    return [first + dt.timedelta(weeks=i) for i in range((monday - first).days // 7 + 1)]
+
+def attestation_date(monday, today=None):
+    """Date d’attestation d’une semaine passée : son vendredi (ou aujourd’hui si pas encore atteint)."""
+    today = today or dt.datetime.now(TZ).date()
+    return min(monday + dt.timedelta(days=4), today)
+
+def output_filename(nom, prenom, site_lettre, week):
+    site = (site_lettre or "").strip().upper()
+    return f"{nom.strip()} {prenom.strip()} – FIPA3{site} – S{week}.pdf"
+
+def output_path(cfg, week):
+    """Chemin final attendu pour la conf d’annotation `cfg` et la semaine `week`."""
+    out_dir = pathlib.Path(cfg.get("output_dir", "./sorties")).resolve()
+    return out_dir / output_filename(cfg["nom"], cfg["prenom"], cfg.get("site_lettre", "B"), week)
+
+def dossier_path(cfg):
+    """Dossier de semestre, à côté des PDF hebdomadaires (sans suffixe S{semaine})."""
+    out_dir = pathlib.Path(cfg.get("output_dir", "./sorties")).resolve()
+    site = (cfg.get("site_lettre", "B") or "").strip().upper()
+    return out_dir / f"{cfg['nom'].strip()} {cfg['prenom'].strip()} – FIPA3{site} – dossier.pdf"